@@ -3,14 +3,137 @@ import json
 import subprocess
 import tempfile
 import re
-from flask import Flask, render_template, request, jsonify
+import hashlib
+import threading
+import queue
+import atexit
+import itertools
+import time
+from contextlib import contextmanager
+from flask import Flask, Response, g, render_template, request, jsonify
+
+from riscv_simulator import (PERF_COUNTERS, FunctionalSimulator, PagedMemory, RISCVSimulator,
+                             parse_program)
+from run_store import RunStore
+from trace_format import (TRACE_RECORD_WORDS, cycle_to_record, decode_packed_line, decode_packed_trace,
+                          iter_packed_cycles, record_writes, word_array)
+from assembler import AssemblyError, assemble
+from result_cache import ResultCache, cache_key
+import riscv_simulator
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
 
+SIMULATION_DIR = 'simulation'
+BUILD_DIR = os.path.join(SIMULATION_DIR, 'build')
+# Compiled models: 'batch' runs one program and exits, 'server' is the
+# resident simulator that accepts programs on stdin.
+VERILOG_MODELS = {
+    'batch': [
+        os.path.join(SIMULATION_DIR, 'processor.v'),
+        os.path.join(SIMULATION_DIR, 'testbench.v'),
+    ],
+    'server': [
+        os.path.join(SIMULATION_DIR, 'processor.v'),
+        os.path.join(SIMULATION_DIR, 'testbench_server.v'),
+    ],
+}
+# Included by the testbenches; hashed but not passed to iverilog directly
+VERILOG_INCLUDES = [
+    os.path.join(SIMULATION_DIR, 'trace.vh'),
+    os.path.join(SIMULATION_DIR, 'state.vh'),
+]
+
+# Tool probe and compiled models are shared by every request in this process;
+# the build directory is shared across gunicorn workers.
+_verilog_tools = None
+_verilog_tools_lock = threading.Lock()
+_compiled_models = {}
+_compiled_models_lock = threading.Lock()
+
+# Limits for concurrent vvp runs in this process
+SIM_MAX_WORKERS = int(os.environ.get('SIM_MAX_WORKERS', os.cpu_count() or 1))
+SIM_MAX_QUEUE = int(os.environ.get('SIM_MAX_QUEUE', SIM_MAX_WORKERS * 4))
+SIM_QUEUE_TIMEOUT = float(os.environ.get('SIM_QUEUE_TIMEOUT', 10))
+SIM_RUN_TIMEOUT = float(os.environ.get('SIM_RUN_TIMEOUT', 30))
+SIM_WORKSPACE_DIR = os.environ.get('SIM_WORKSPACE_DIR') or None
+SIM_CYCLES = 20
+SIM_MAX_CYCLES = int(os.environ.get('SIM_MAX_CYCLES', 100000))
+# Upper bound on functionally executed instructions before detailed tracing
+SIM_MAX_FAST_FORWARD = int(os.environ.get('SIM_MAX_FAST_FORWARD', 50000000))
+
+# Traces are kept server-side and fetched in windows of at most SIM_MAX_WINDOW
+# cycles; /simulate returns the first SIM_PAGE_CYCLES of them inline
+SIM_PAGE_CYCLES = int(os.environ.get('SIM_PAGE_CYCLES', 256))
+SIM_MAX_WINDOW = int(os.environ.get('SIM_MAX_WINDOW', 2000))
+# Cycles carry only the memory words they wrote; windows also materialize a
+# range of memory (the first SIM_MEMORY_VIEW_WORDS words by default)
+SIM_MEMORY_VIEW_WORDS = int(os.environ.get('SIM_MEMORY_VIEW_WORDS', 64))
+SIM_MAX_MEMORY_VIEW = 4096
+run_store = RunStore(
+    max_runs=int(os.environ.get('SIM_RUN_STORE_MAX_RUNS', 64)),
+    ttl=float(os.environ.get('SIM_RUN_STORE_TTL', 3600)),
+    keyframe_interval=int(os.environ.get('SIM_KEYFRAME_INTERVAL', 256))
+)
+
+# Finished results are memoized by program, cycle budget and engine version.
+# Bump RESULT_FORMAT_VERSION whenever the trace record layout or the
+# serialized run format changes.
+RESULT_FORMAT_VERSION = 4
+result_cache = ResultCache(
+    max_bytes=int(os.environ.get('SIM_RESULT_CACHE_BYTES', 64 * 1024 * 1024)),
+    disk_dir=os.environ.get('SIM_RESULT_CACHE_DIR') or None
+)
+with open(riscv_simulator.__file__, 'rb') as _engine_source:
+    PYTHON_ENGINE_VERSION = hashlib.sha256(_engine_source.read()).hexdigest()[:16]
+
+# Data_Memory depth in words, passed to iverilog as -DDMEM_WORDS. Its
+# initial block preloads word 10; addresses wrap at this size.
+SIM_DMEM_WORDS = int(os.environ.get('SIM_DMEM_WORDS', 4096))
+RTL_INITIAL_MEMORY = {10: 123}
+
+# 'packed' uses the compact fixed-width trace records; 'text' is the
+# human-readable $display trace, kept for debugging
+SIM_TRACE_FORMAT = os.environ.get('SIM_TRACE_FORMAT', 'packed')
+
+# Keep up to SIM_MAX_WORKERS long-lived vvp processes instead of spawning per run
+SIM_RESIDENT = os.environ.get('SIM_RESIDENT', '0') == '1'
+
+# Requests may ask for a cProfile dump (?profile=1 or X-Profile: 1) only when
+# this directory is configured
+SIM_PROFILE_DIR = os.environ.get('SIM_PROFILE_DIR') or None
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.profiler = None
+    metrics.begin_request()
+    if SIM_PROFILE_DIR and '1' in (request.args.get('profile'), request.headers.get('X-Profile')):
+        g.profiler = metrics.start_profile()
+
+@app.after_request
+def finish_request_metrics(response):
+    endpoint = request.endpoint or 'unknown'
+    if g.get('profiler') is not None:
+        response.headers['X-Profile'] = metrics.save_profile(g.profiler, SIM_PROFILE_DIR, endpoint)
+        g.profiler = None
+    timings = metrics.end_request()
+    if timings:
+        response.headers['Server-Timing'] = metrics.server_timing(timings)
+    metrics.http_requests.inc(endpoint=endpoint, status=response.status_code)
+    if 'request_started' in g:
+        metrics.request_seconds.observe(time.perf_counter() - g.request_started, endpoint=endpoint)
+    return response
+
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', sim_cycles=SIM_CYCLES, sim_max_cycles=SIM_MAX_CYCLES)
 
 @app.route('/guide')
 def guide():
@@ -22,112 +145,1014 @@ def simulate():
         data = request.get_json() or {}
         instructions = data.get('instructions', '')
         
-        # Create instructions file
-        instructions_path = os.path.join('simulation', 'instructions.hex')
-        os.makedirs('simulation', exist_ok=True)
-        
         # Process instructions - convert assembly to hex if needed
         hex_instructions = process_instructions(instructions)
+        cycles, fast_forward = parse_run_options(data)
+        cycle_counters = bool(data.get('cycle_counters'))
         
-        with open(instructions_path, 'w') as f:
-            f.write(hex_instructions)
+        # Identical requests on the same engine share one result. The ETag
+        # also covers how the response presents it.
+        backend = simulation_backend()
+        key = result_cache_key(hex_instructions, cycles, fast_forward, backend)
+        etag = f'{key}-c{int(cycle_counters)}'
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
         
-        # Run Python-based RISC-V simulation
-        simulation_data = run_riscv_simulation(hex_instructions)
+        run = get_run(key)
+        served_by = 'cache'
+        if run is None:
+            # Run the simulation in an isolated workspace
+            run_info = {}
+            trace = run_riscv_simulation(hex_instructions, cycles, fast_forward, run_info)
+            served_by = run_info.get('backend')
+            run = store_result(key, backend, trace, run_info)
+            if run.run_id != key:
+                etag = None
+        metrics.simulations.inc(endpoint='simulate', backend=served_by)
         
-        return jsonify({
+        result = {
             'success': True,
-            'data': simulation_data
-        })
+            'run_id': run.run_id,
+            'total_cycles': len(run),
+            'counters': run_performance(run),
+            'data': run.window(0, SIM_PAGE_CYCLES, (0, SIM_MEMORY_VIEW_WORDS), cycle_counters)
+        }
+        if 'fast_forward' in run.metadata:
+            result['fast_forward'] = run.metadata['fast_forward']
+        with metrics.phase('serialize'):
+            response = jsonify(result)
+        if etag is not None:
+            response.set_etag(etag)
+        return response
         
+    except AssemblyError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'line': e.line
+        })
+    except SimulatorBusyError as e:
+        response = jsonify({
+            'success': False,
+            'error': str(e)
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(int(SIM_QUEUE_TIMEOUT))
+        return response
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         })
 
-def process_instructions(instructions):
-    """Process assembly instructions or hex values"""
-    lines = instructions.strip().split('\n')
-    hex_lines = []
+@app.route('/simulate/stream', methods=['POST'])
+def simulate_stream():
+    """Stream cycles as NDJSON, or as Server-Sent Events if the client asks for them"""
+    use_sse = 'text/event-stream' in request.headers.get('Accept', '')
     
-    for line in lines:
-        line = line.strip()
-        if not line or line.startswith('//') or line.startswith('#'):
-            continue
-            
-        # If it's already hex (starts with 0x or is 8 hex digits)
-        if line.startswith('0x') or (len(line) == 8 and all(c in '0123456789abcdefABCDEF' for c in line)):
-            hex_lines.append(line.replace('0x', ''))
-        else:
-            # For now, add default NOP instruction for assembly
-            hex_lines.append('00000013')  # NOP instruction
+    def format_event(event_type, payload):
+        if use_sse:
+            return f"event: {event_type}\ndata: {json.dumps(payload)}\n\n"
+        return json.dumps({'type': event_type, 'data': payload}) + '\n'
     
-    return '\n'.join(hex_lines)
+    try:
+        data = request.get_json() or {}
+        hex_instructions = process_instructions(data.get('instructions', ''))
+        num_cycles, fast_forward = parse_run_options(data)
+        cycle_counters = bool(data.get('cycle_counters'))
+        run_info = {}
+        cycles = stream_riscv_simulation(hex_instructions, num_cycles, fast_forward, run_info)
+        # Start the run now so a busy server can still answer with 503
+        first_cycle = next(cycles, None)
+        metrics.simulations.inc(endpoint='stream', backend=run_info.get('backend'))
+    except AssemblyError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'line': e.line
+        })
+    except SimulatorBusyError as e:
+        response = jsonify({
+            'success': False,
+            'error': str(e)
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(int(SIM_QUEUE_TIMEOUT))
+        return response
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+    
+    def cycle_event(cycle):
+        # Per-cycle counters are opt-in; the done event carries the totals
+        if not cycle_counters:
+            cycle.pop('counters', None)
+        return cycle
+    
+    def generate():
+        # Encode into the run store as we go so the trace can be revisited
+        run = run_store.create(metadata=run_info)
+        try:
+            if 'fast_forward' in run_info:
+                yield format_event('fast_forward', run_info['fast_forward'])
+            if first_cycle is not None:
+                run.append(first_cycle)
+                yield format_event('cycle', cycle_event(first_cycle))
+            for cycle in cycles:
+                run.append(cycle)
+                yield format_event('cycle', cycle_event(cycle))
+            run_store.add(run)
+            yield format_event('done', {'cycles': len(run), 'run_id': run.run_id,
+                                        'counters': run_performance(run)})
+        except Exception as e:
+            yield format_event('error', {'error': str(e)})
+        finally:
+            cycles.close()
+    
+    mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    return Response(generate(), mimetype=mimetype, headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
-def run_riscv_simulation(hex_instructions):
-    """Run a Verilog-based RISC-V pipeline simulation using iverilog and vvp"""
+@app.route('/batch', methods=['POST'])
+def simulate_batch():
+    """Simulate many programs across worker processes, streaming NDJSON summaries"""
+    # Imported here because batch.py builds on this module
+    from batch import parse_batch_request, run_batch
+    
     try:
-        # Check if iverilog and vvp are installed
+        data = request.get_json() or {}
+        programs = parse_batch_request(data)
+        cycles, fast_forward = parse_run_options(data)
+        results = run_batch(programs, cycles, data.get('backend', 'auto'), fast_forward=fast_forward)
+        first_event = next(results)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+    
+    def generate():
         try:
-            # Test if iverilog is available
-            subprocess.run(['iverilog', '-v'], capture_output=True, check=True)
-            # Test if vvp is available
-            subprocess.run(['vvp', '-v'], capture_output=True, check=True)
-        except (subprocess.SubprocessError, FileNotFoundError):
-            print("Icarus Verilog (iverilog/vvp) not found. Please install it to use Verilog simulation.")
-            print("Falling back to Python simulation.")
-            return fallback_python_simulation(hex_instructions)
-        
-        # Ensure simulation directory exists
-        os.makedirs('simulation', exist_ok=True)
-        
-        # Create a file to capture simulation output
-        output_file_path = os.path.join('simulation', 'simulation_output.txt')
-        
-        # Compile the Verilog code using iverilog
-        compile_cmd = ['iverilog', '-o', 'simulation/processor_sim', 'simulation/processor.v', 'simulation/testbench.v']
-        compile_process = subprocess.run(compile_cmd, capture_output=True, text=True, check=False)
-        
-        if compile_process.returncode != 0:
-            print(f"Verilog compilation failed: {compile_process.stderr}")
-            print("Falling back to Python simulation.")
-            return fallback_python_simulation(hex_instructions)
-        
-        # Run the simulation using vvp and capture the output
-        run_cmd = ['vvp', 'simulation/processor_sim', '+INSTRUCTION_FILE']
-        with open(output_file_path, 'w') as output_file:
-            run_process = subprocess.run(run_cmd, stdout=output_file, stderr=subprocess.PIPE, text=True, check=False)
-        
-        if run_process.returncode != 0:
-            print(f"Verilog simulation failed: {run_process.stderr}")
+            for event_type, payload in itertools.chain([first_event], results):
+                if event_type == 'program':
+                    metrics.simulations.inc(endpoint='batch', backend=payload.get('backend') or 'error')
+                yield json.dumps({'type': event_type, 'data': payload}) + '\n'
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'data': {'error': str(e)}}) + '\n'
+        finally:
+            results.close()
+    
+    return Response(generate(), mimetype='application/x-ndjson', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/cosim', methods=['POST'])
+def simulate_cosim():
+    """Run the Verilog and Python engines in lockstep and report the first divergence"""
+    # Imported here because cosim.py builds on this module
+    from cosim import CosimUnavailableError, cosimulate, parse_cosim_request
+
+    try:
+        data = request.get_json() or {}
+        with metrics.phase('assemble'):
+            hex_instructions = process_instructions(data.get('instructions', ''))
+        cycles, fast_forward, mode = parse_cosim_request(data)
+        report = cosimulate(hex_instructions, cycles, fast_forward, mode)
+        metrics.simulations.inc(endpoint='cosim', backend='verilog')
+        return jsonify(dict(report, success=True))
+
+    except AssemblyError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'line': e.line
+        })
+    except (CosimUnavailableError, SimulatorBusyError) as e:
+        response = jsonify({
+            'success': False,
+            'error': str(e)
+        })
+        response.status_code = 503
+        if isinstance(e, SimulatorBusyError):
+            response.headers['Retry-After'] = str(int(SIM_QUEUE_TIMEOUT))
+        return response
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue a simulation to run in the background and return its job ID at once"""
+    # Imported here because jobs.py builds on this module
+    from jobs import job_queue
+
+    try:
+        data = request.get_json() or {}
+        hex_instructions = process_instructions(data.get('instructions', ''))
+        cycles, fast_forward = parse_run_options(data)
+        job = job_queue.submit(hex_instructions, cycles, fast_forward, data.get('timeout'))
+        return jsonify(dict(job.info(), success=True)), 202
+
+    except AssemblyError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'line': e.line
+        })
+    except SimulatorBusyError as e:
+        response = jsonify({
+            'success': False,
+            'error': str(e)
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(int(SIM_QUEUE_TIMEOUT))
+        return response
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+@app.route('/jobs/<job_id>', methods=['GET', 'DELETE'])
+def job_status(job_id):
+    """State and progress of a job; DELETE cancels it"""
+    from jobs import job_queue
+
+    job = job_queue.cancel(job_id) if request.method == 'DELETE' else job_queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found or expired'}), 404
+    return jsonify(dict(job.info(), success=True))
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Stream a job's progress as NDJSON, or as Server-Sent Events, until it finishes"""
+    from jobs import job_queue
+
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found or expired'}), 404
+    use_sse = 'text/event-stream' in request.headers.get('Accept', '')
+
+    def format_event(event_type, payload):
+        if use_sse:
+            return f"event: {event_type}\ndata: {json.dumps(payload)}\n\n"
+        return json.dumps({'type': event_type, 'data': payload}) + '\n'
+
+    def generate():
+        version = None
+        while True:
+            # Read the version first so a change during info() is not missed
+            current = job.version
+            info = job.info()
+            if job.is_finished:
+                yield format_event('done', info)
+                return
+            if current != version:
+                yield format_event('progress', info)
+                version = current
+            # Wake up periodically so idle connections still see heartbeats
+            if job.wait(version, 15) == version:
+                yield format_event('progress', job.info())
+
+    mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    return Response(generate(), mimetype=mimetype, headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/runs/<run_id>')
+def run_info(run_id):
+    run = get_run(run_id)
+    if run is None:
+        return jsonify({'success': False, 'error': 'Run not found or expired'}), 404
+    return jsonify(dict(run.info(), counters=run_performance(run), success=True))
+
+@app.route('/runs/<run_id>/cycles')
+def run_cycles(run_id):
+    """Rebuild cycles from (inclusive) to (exclusive), counted from the start of the run"""
+    run = get_run(run_id)
+    if run is None:
+        return jsonify({'success': False, 'error': 'Run not found or expired'}), 404
+    try:
+        start = int(request.args.get('from', 0))
+        stop = int(request.args.get('to', start + SIM_PAGE_CYCLES))
+        # Word addresses to materialize as each cycle's 'memory'
+        mem_from = int(request.args.get('mem_from', 0))
+        mem_to = int(request.args.get('mem_to', mem_from + SIM_MEMORY_VIEW_WORDS))
+        counters = request.args.get('counters', '0').lower() in ('1', 'true')
+    except ValueError:
+        return jsonify({'success': False, 'error': "'from', 'to', 'mem_from' and 'mem_to' must be integers"}), 400
+    stop = min(stop, start + SIM_MAX_WINDOW)
+    mem_to = min(mem_to, mem_from + SIM_MAX_MEMORY_VIEW)
+    return jsonify({
+        'success': True,
+        'run_id': run_id,
+        'from': start,
+        'total_cycles': len(run),
+        'data': run.window(start, stop, (mem_from, mem_to), counters)
+    })
+
+@app.route('/runs/<run_id>/export')
+def export_run(run_id):
+    """Download a whole run as columns: an .npz archive (default) or a VCD waveform"""
+    import trace_export
+
+    run = get_run(run_id)
+    if run is None:
+        return jsonify({'success': False, 'error': 'Run not found or expired'}), 404
+    fmt = request.args.get('format', 'npz').lower()
+    if fmt not in ('npz', 'vcd'):
+        return jsonify({'success': False, 'error': "format must be 'npz' or 'vcd'"}), 400
+    if fmt == 'npz' and trace_export.np is None:
+        return jsonify({'success': False, 'error': 'NumPy is not installed; use format=vcd'}), 503
+
+    with metrics.phase('export'):
+        columns = trace_export.run_columns(run)
+    metadata = dict(run.metadata, run_id=run_id)
+    headers = {'Content-Disposition': f'attachment; filename=run-{run_id}.{fmt}'}
+    if fmt == 'vcd':
+        return Response(trace_export.iter_vcd(columns, metadata), mimetype='text/plain', headers=headers)
+    return Response(trace_export.npz_bytes(columns, metadata), mimetype='application/octet-stream',
+                    headers=headers)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Counters and latency histograms in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def get_run(run_id):
+    """Stored run by ID, reloading cached results the run store has evicted"""
+    run = run_store.get(run_id)
+    if run is None:
+        cached = result_cache.get(run_id)
+        if cached is not None:
+            with metrics.phase('cache_load'):
+                run_store.load(cached, run_id)
+            run = run_store.get(run_id)
+    return run
+
+def performance_summary(counters, cycles):
+    """Counter totals over the given number of clock cycles, with CPI"""
+    summary = dict(counters or dict.fromkeys(PERF_COUNTERS, 0))
+    summary['cycles'] = cycles
+    summary['cpi'] = round(cycles / summary['retired'], 4) if summary['retired'] else None
+    return summary
+
+def run_performance(run):
+    """Performance summary of a stored run.
+
+    A cycle's counters cover the clock edges before it, so the last cycle's
+    counters cover one cycle fewer than the run traced.
+    """
+    return performance_summary(run.final_counters(), max(len(run) - 1, 0))
+
+def simulation_backend():
+    """Identify the engine that will serve a request, including its version"""
+    try:
+        model_path = get_compiled_model('server' if SIM_RESIDENT else 'batch')
+    except VerilogCompileError:
+        model_path = None
+    if model_path is not None:
+        # The model file name carries the hash of the RTL and iverilog version
+        return 'verilog:' + os.path.basename(model_path)
+    return 'python:' + PYTHON_ENGINE_VERSION
+
+def result_cache_key(hex_instructions, cycles, fast_forward, backend):
+    program = '\n'.join(line.strip().upper() for line in hex_instructions.splitlines() if line.strip())
+    limits = json.dumps(fast_forward, sort_keys=True)
+    return cache_key(RESULT_FORMAT_VERSION, backend, cycles, limits, program)
+
+def store_result(key, backend, trace, run_info):
+    """Publish a finished trace (an unpublished StoredRun), memoizing it under key if backend served it.
+
+    The client fetches further windows of the returned run lazily.
+    """
+    trace.metadata = dict(run_info)
+    # A fallback result is not what the key describes; don't memoize it
+    if run_info.get('backend') == backend.split(':')[0]:
+        trace.run_id = key
+        with metrics.phase('cache_store'):
+            result_cache.put(key, trace.to_bytes())
+    run_store.add(trace)
+    return trace
+
+def process_instructions(instructions):
+    """Assemble instructions into hex words; hex lines pass through unchanged.
+
+    Raises AssemblyError with the offending line number. Results are
+    memoized by source text, so resubmitting a program costs nothing.
+    """
+    with metrics.phase('assemble'):
+        return assemble(instructions)
+
+class VerilogCompileError(Exception):
+    """Raised when iverilog fails to build the processor model"""
+
+
+def probe_verilog_tools():
+    """Check once per process whether iverilog and vvp are installed.
+
+    Returns the iverilog version string, or None if either tool is missing.
+    """
+    global _verilog_tools
+    with _verilog_tools_lock:
+        if _verilog_tools is None:
+            try:
+                iverilog = subprocess.run(['iverilog', '-V'], capture_output=True, text=True, check=False)
+                subprocess.run(['vvp', '-V'], capture_output=True, text=True, check=False)
+                output = (iverilog.stdout or iverilog.stderr).strip()
+                _verilog_tools = {'available': True, 'version': output.splitlines()[0] if output else 'unknown'}
+            except (subprocess.SubprocessError, OSError):
+                _verilog_tools = {'available': False, 'version': None}
+        return _verilog_tools['version'] if _verilog_tools['available'] else None
+
+def _source_signature(sources):
+    """Cheap stat-based signature used to skip re-hashing unchanged sources"""
+    return tuple((path, os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in sources)
+
+def _model_hash(sources, tool_version):
+    """Content hash of the Verilog sources and the compiler version"""
+    digest = hashlib.sha256(tool_version.encode())
+    for path in sources:
+        with open(path, 'rb') as f:
+            digest.update(path.encode())
+            digest.update(b'\0')
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+def _compile_model(sources, model_path):
+    """Compile sources into model_path, serialized across worker processes"""
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    with open(os.path.join(BUILD_DIR, '.lock'), 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            # Another worker may have finished the build while we waited
+            if os.path.exists(model_path):
+                return
+            tmp_path = f"{model_path}.{os.getpid()}.tmp"
+            compile_cmd = (['iverilog', '-I', SIMULATION_DIR, f'-DDMEM_WORDS={SIM_DMEM_WORDS}', '-o', tmp_path]
+                           + list(sources))
+            with metrics.phase('compile'):
+                compile_process = subprocess.run(compile_cmd, capture_output=True, text=True, check=False)
+            if compile_process.returncode != 0:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise VerilogCompileError(compile_process.stderr)
+            os.replace(tmp_path, model_path)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def get_compiled_model(model='batch'):
+    """Return the path of a compiled processor model, building it if needed.
+
+    Models are cached in simulation/build keyed by a hash of the Verilog
+    sources and the iverilog version, so they are only rebuilt when the RTL
+    or the toolchain changes.
+    """
+    tool_version = probe_verilog_tools()
+    if tool_version is None:
+        return None
+
+    sources = VERILOG_MODELS[model]
+    with _compiled_models_lock:
+        cached = _compiled_models.setdefault(model, {'signature': None, 'path': None})
+        signature = _source_signature(sources + VERILOG_INCLUDES)
+        model_path = cached['path']
+        if signature != cached['signature'] or not (model_path and os.path.exists(model_path)):
+            model_hash = _model_hash(sources + VERILOG_INCLUDES, f"{tool_version} DMEM_WORDS={SIM_DMEM_WORDS}")
+            model_path = os.path.join(BUILD_DIR, f"processor_sim-{model}-{model_hash}.vvp")
+            if not os.path.exists(model_path):
+                _compile_model(sources, model_path)
+            cached['signature'] = signature
+            cached['path'] = model_path
+        return model_path
+
+@app.cli.command('build-sim')
+def build_sim_command():
+    """Compile the Verilog models ahead of time (e.g. before starting gunicorn)"""
+    for model in VERILOG_MODELS:
+        try:
+            model_path = get_compiled_model(model)
+        except VerilogCompileError as e:
+            print(f"Verilog compilation failed: {e}")
+            raise SystemExit(1)
+        if model_path is None:
+            print("Icarus Verilog (iverilog/vvp) not found.")
+            raise SystemExit(1)
+        print(f"Compiled {model} model: {model_path}")
+
+class SimulatorBusyError(Exception):
+    """Raised when the simulation queue is full or a slot cannot be acquired in time"""
+
+
+class SimulationStopped(Exception):
+    """Raised by a run's check callback to abandon it; never triggers the Python fallback"""
+
+
+class SimulationPool:
+    """Bounded pool of concurrent vvp processes with a capped wait queue.
+
+    At most max_workers simulations run at once; up to max_queue further
+    requests wait for a slot for at most queue_timeout seconds. Anything
+    beyond that is rejected with SimulatorBusyError so callers can shed load.
+    """
+
+    def __init__(self, max_workers, max_queue, queue_timeout):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._lock = threading.Lock()
+        self._waiting = 0
+    
+    @property
+    def waiting(self):
+        return self._waiting
+
+    @contextmanager
+    def slot(self):
+        """Hold one simulator slot for the duration of the block"""
+        acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                if self._waiting >= self.max_queue:
+                    metrics.busy_rejections.inc(reason='queue_full')
+                    raise SimulatorBusyError("Simulation queue is full, please retry shortly")
+                self._waiting += 1
+            try:
+                with metrics.phase('queue_wait'):
+                    acquired = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+        if not acquired:
+            metrics.busy_rejections.inc(reason='timeout')
+            raise SimulatorBusyError("Timed out waiting for a free simulator, please retry shortly")
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+
+simulation_pool = SimulationPool(SIM_MAX_WORKERS, SIM_MAX_QUEUE, SIM_QUEUE_TIMEOUT)
+
+metrics.Sampled('sim_queue_waiting', "Requests waiting for a simulator slot",
+                lambda: simulation_pool.waiting)
+metrics.Sampled('sim_stored_runs', "Traces held in the run store", lambda: len(run_store))
+metrics.Sampled('sim_result_cache_hits_total', "Result cache hits", lambda: result_cache.hits, 'counter')
+metrics.Sampled('sim_result_cache_misses_total', "Result cache misses", lambda: result_cache.misses, 'counter')
+
+@contextmanager
+def simulation_workspace(hex_instructions):
+    """Private directory holding one run's program and trace files"""
+    with tempfile.TemporaryDirectory(prefix='riscv-run-', dir=SIM_WORKSPACE_DIR) as workspace:
+        instructions_path = os.path.join(workspace, 'instructions.hex')
+        with open(instructions_path, 'w') as f:
+            f.write(hex_instructions + '\n')
+        yield workspace, instructions_path
+
+class VerilogRun:
+    """Everything needed to trace one program on the Verilog model"""
+
+    def __init__(self, model_path, workspace, instructions_path, cycles=SIM_CYCLES,
+                 state_path=None, cycle_offset=0, initial_memory=None, timeout=SIM_RUN_TIMEOUT):
+        self.model_path = model_path
+        self.workspace = workspace
+        self.instructions_path = os.path.abspath(instructions_path)
+        self.cycles = cycles
+        self.state_path = os.path.abspath(state_path) if state_path else None
+        self.cycle_offset = cycle_offset
+        # Data memory the run starts from; reported as writes in its first cycle
+        self.initial_memory = RTL_INITIAL_MEMORY if initial_memory is None else initial_memory
+        self.packed = SIM_TRACE_FORMAT == 'packed'
+        # Seconds before the vvp run is killed
+        self.timeout = timeout
+
+    def plusargs(self):
+        """Arguments for testbench.v"""
+        args = [f'+INSTRUCTION_FILE={self.instructions_path}', f'+CYCLES={self.cycles}']
+        if self.packed:
+            args.append('+TRACE_PACKED')
+        if self.state_path:
+            args += [f'+STATE_FILE={self.state_path}', f'+CYCLE_OFFSET={self.cycle_offset}']
+        return args
+
+    def server_command(self):
+        """RUN command for testbench_server.v"""
+        return (f"RUN {self.instructions_path} {self.cycles} {int(self.packed)} "
+                f"{self.state_path or '-'} {self.cycle_offset}\n")
+
+
+class ResidentSimulatorError(Exception):
+    """Raised when a resident vvp process dies or stops responding"""
+
+
+class ResidentSimulator:
+    """A long-lived vvp process running testbench_server.v.
+
+    Programs are sent as RUN commands on stdin; the processor is reset and
+    its memories reloaded in place, so no process is spawned per run.
+    """
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self.process = subprocess.Popen(
+            ['vvp', '-n', model_path],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, bufsize=1
+        )
+        self._read_until('READY')
+
+    def _read_until(self, marker):
+        """Collect stdout lines up to (not including) the marker line"""
+        lines = []
+        for line in iter(self.process.stdout.readline, ''):
+            if line.strip() == marker:
+                return lines
+            lines.append(line)
+        raise ResidentSimulatorError("Resident simulator exited unexpectedly")
+
+    def iter_run(self, run):
+        """Simulate one VerilogRun, yielding trace lines as vvp prints them"""
+        timed_out = threading.Event()
+
+        def kill():
+            # Killing the process unblocks readline, which then ends the loop
+            timed_out.set()
+            self.process.kill()
+
+        watchdog = threading.Timer(run.timeout, kill)
+        watchdog.start()
+        try:
+            self.process.stdin.write(run.server_command())
+            self.process.stdin.flush()
+            for line in iter(self.process.stdout.readline, ''):
+                if line.strip() == 'DONE':
+                    return
+                yield line
+        except (OSError, ValueError) as e:
+            if not timed_out.is_set():
+                raise ResidentSimulatorError(str(e))
+        finally:
+            watchdog.cancel()
+        if timed_out.is_set():
+            raise VerilogTimeoutError(f"Verilog simulation exceeded {run.timeout}s time limit.")
+        raise ResidentSimulatorError("Resident simulator exited unexpectedly")
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def close(self):
+        if self.alive():
+            try:
+                self.process.stdin.write("QUIT\n")
+                self.process.stdin.flush()
+                self.process.wait(timeout=1)
+            except (OSError, ValueError, subprocess.TimeoutExpired):
+                self.process.kill()
+
+
+class ResidentSimulatorPool:
+    """Idle resident simulators handed out one per request.
+
+    Used inside simulation_pool.slot(), so at most SIM_MAX_WORKERS
+    simulators are ever checked out. Instances are started lazily and
+    replaced when they die or the Verilog model is rebuilt.
+    """
+
+    def __init__(self):
+        self._idle = queue.LifoQueue()
+
+    @contextmanager
+    def acquire(self, model_path):
+        simulator = None
+        while simulator is None:
+            try:
+                candidate = self._idle.get_nowait()
+            except queue.Empty:
+                simulator = ResidentSimulator(model_path)
+                break
+            if candidate.alive() and candidate.model_path == model_path:
+                simulator = candidate
+            else:
+                candidate.close()
+
+        healthy = False
+        try:
+            yield simulator
+            healthy = True
+        finally:
+            if healthy and simulator.alive():
+                self._idle.put(simulator)
+            else:
+                simulator.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+resident_pool = ResidentSimulatorPool()
+atexit.register(resident_pool.close_all)
+
+class VerilogRunError(Exception):
+    """Raised when vvp exits with an error or exceeds its time limit"""
+
+
+class VerilogTimeoutError(VerilogRunError):
+    """Raised when the watchdog kills vvp for exceeding its time limit"""
+
+
+def iter_vvp_lines(run):
+    """Spawn vvp for one VerilogRun and yield its stdout lines as they arrive"""
+    timeout = run.timeout
+    run_cmd = ['vvp', '-n', run.model_path] + run.plusargs()
+    with open(os.path.join(run.workspace, 'vvp_stderr.txt'), 'w+') as stderr_file:
+        process = subprocess.Popen(run_cmd, stdout=subprocess.PIPE, stderr=stderr_file, text=True, bufsize=1)
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            process.kill()
+
+        watchdog = threading.Timer(timeout, kill)
+        watchdog.start()
+        try:
+            for line in process.stdout:
+                yield line
+            process.wait()
+        finally:
+            watchdog.cancel()
+            # Also reached when the consumer stops reading early
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+
+        if timed_out.is_set():
+            raise VerilogTimeoutError(f"Verilog simulation exceeded {timeout}s time limit.")
+        if process.returncode != 0:
+            stderr_file.seek(0)
+            raise VerilogRunError(f"Verilog simulation failed: {stderr_file.read()}")
+
+def iter_verilog_lines(run):
+    """Yield raw trace lines from a vvp run; the verilog_run it came from holds the simulator slot"""
+    if SIM_RESIDENT:
+        # Reuse a long-lived vvp process instead of spawning one
+        with resident_pool.acquire(run.model_path) as simulator:
+            yield from simulator.iter_run(run)
+    else:
+        yield from iter_vvp_lines(run)
+
+def iter_verilog_cycles(run):
+    """Yield parsed cycles from a vvp run as each one is traced"""
+    lines = iter_verilog_lines(run)
+    cycles = iter_packed_cycles(lines) if run.packed else iter_simulation_cycles(lines)
+    first = next(cycles, None)
+    if first is not None:
+        seed_initial_memory(first, run.initial_memory)
+        yield first
+        yield from cycles
+
+def iter_verilog_records(run):
+    """Yield (record, {address: value} writes) per cycle of a vvp run without building cycle dicts"""
+    lines = iter_verilog_lines(run)
+    if run.packed:
+        records = ((record, dict(record_writes(record))) for record in map(decode_packed_line, lines)
+                   if record is not None)
+    else:
+        records = ((cycle_to_record(cycle), cycle['memory_writes']) for cycle in iter_simulation_cycles(lines))
+    first = next(records, None)
+    if first is not None:
+        record, writes = first
+        yield record, {**run.initial_memory, **writes}
+        yield from records
+
+def seed_initial_memory(cycle, initial_memory):
+    """Report the memory image a run starts from as writes in its first cycle"""
+    cycle['memory_writes'] = {**initial_memory, **cycle['memory_writes']}
+
+def parse_run_options(data):
+    """Validate the cycle budget and fast-forward target of a request.
+
+    fast_forward may give 'pc' (stop before executing that address),
+    'instructions' or 'cycles' (the pipeline issues one instruction per
+    cycle, so both count executed instructions).
+    """
+    cycles = int(data.get('cycles', SIM_CYCLES))
+    if not 1 <= cycles <= SIM_MAX_CYCLES:
+        raise ValueError(f"cycles must be between 1 and {SIM_MAX_CYCLES}")
+    
+    fast_forward = data.get('fast_forward')
+    if not fast_forward:
+        return cycles, None
+    if not isinstance(fast_forward, dict):
+        raise ValueError("fast_forward must be an object with 'pc', 'instructions' or 'cycles'")
+    
+    limits = {'max_instructions': SIM_MAX_FAST_FORWARD, 'until_pc': None}
+    if 'pc' in fast_forward:
+        limits['until_pc'] = int(str(fast_forward['pc']), 0)
+    count = fast_forward.get('instructions', fast_forward.get('cycles'))
+    if count is not None:
+        count = int(count)
+        if not 0 <= count <= SIM_MAX_FAST_FORWARD:
+            raise ValueError(f"fast_forward count must be between 0 and {SIM_MAX_FAST_FORWARD}")
+        limits['max_instructions'] = count
+    elif limits['until_pc'] is None:
+        raise ValueError("fast_forward must give 'pc', 'instructions' or 'cycles'")
+    return cycles, limits
+
+def fast_forward_rtl_state(hex_instructions, fast_forward, workspace, check=None):
+    """Functionally execute a program prefix from the RTL reset state.
+
+    Writes the resulting state as a state.vh state file and returns its
+    path, a summary of the fast-forward and the resulting memory image.
+    check is called periodically during execution (see FunctionalSimulator.run).
+    """
+    memory = PagedMemory(SIM_DMEM_WORDS)
+    for index, value in RTL_INITIAL_MEMORY.items():
+        memory[index] = value
+    functional = FunctionalSimulator(parse_program(hex_instructions), [0] * 32, memory)
+    reason = functional.run(**fast_forward, check=check)
+    
+    # Only nonzero memory words are written, each at its @address
+    image = dict(memory.nonzero())
+    state_path = os.path.join(workspace, 'resume_state.hex')
+    with open(state_path, 'w') as f:
+        words = [functional.pc] + functional.registers[1:]
+        f.write('\n'.join(format(word, '08x') for word in words) + '\n')
+        f.writelines(f"@{32 + index:x}\n{value:08x}\n" for index, value in image.items())
+    return state_path, fast_forward_summary(functional.instructions, functional.pc, reason), image
+
+def fast_forward_summary(instructions, pc, reason):
+    return {'instructions': instructions, 'pc': pc, 'stop_reason': reason}
+
+@contextmanager
+def verilog_run(model_path, hex_instructions, cycles, fast_forward, run_info, timeout=SIM_RUN_TIMEOUT,
+                check=None):
+    """Workspace and VerilogRun for one program, fast-forwarding if requested.
+
+    A simulator slot is held throughout, so a busy pool is reported before
+    any fast-forwarding is done, and fast-forwarding counts as simulator work.
+    """
+    with simulation_pool.slot(), simulation_workspace(hex_instructions) as (workspace, instructions_path):
+        state_path = None
+        cycle_offset = 0
+        initial_memory = None
+        if fast_forward:
+            with metrics.phase('fast_forward'):
+                state_path, summary, initial_memory = fast_forward_rtl_state(hex_instructions, fast_forward,
+                                                                             workspace, check)
+            cycle_offset = summary['instructions']
+            run_info['fast_forward'] = summary
+        run_info['backend'] = 'verilog'
+        yield VerilogRun(model_path, workspace, instructions_path, cycles, state_path, cycle_offset,
+                         initial_memory, timeout)
+
+def get_simulation_model():
+    """Compiled model for the configured Verilog mode, or None to use Python"""
+    try:
+        model_path = get_compiled_model('server' if SIM_RESIDENT else 'batch')
+    except VerilogCompileError as e:
+        print(f"Verilog compilation failed: {e}")
+        metrics.fallbacks.inc(reason='compile_error')
+        return None
+
+    if model_path is None:
+        print("Icarus Verilog (iverilog/vvp) not found. Please install it to use Verilog simulation.")
+        metrics.fallbacks.inc(reason='tools_missing')
+    return model_path
+
+def run_riscv_simulation(hex_instructions, cycles=SIM_CYCLES, fast_forward=None, run_info=None):
+    """Run a Verilog-based RISC-V pipeline simulation using iverilog and vvp.
+
+    Returns the trace as an unpublished StoredRun; see store_result.
+    fast_forward takes the limits from parse_run_options. run_info, if
+    given, receives a summary of any fast-forward that was performed.
+    """
+    run_info = {} if run_info is None else run_info
+    try:
+        model_path = get_simulation_model()
+        if model_path is None:
             print("Falling back to Python simulation.")
-            return fallback_python_simulation(hex_instructions)
+            return fallback_python_simulation(hex_instructions, cycles, fast_forward, run_info)
         
-        # Parse the simulation output file to extract cycle data
-        simulation_data = parse_simulation_output(output_file_path)
+        trace = run_store.create()
+        with verilog_run(model_path, hex_instructions, cycles, fast_forward, run_info) as run:
+            if run.packed:
+                # Collect the whole trace and decode it in one pass, skipping
+                # anything vvp prints that is not a record (e.g. warnings)
+                record_length = 8 * TRACE_RECORD_WORDS
+                with metrics.phase('vvp_run'):
+                    text = ''.join(line for line in iter_verilog_lines(run) if len(line.strip()) == record_length)
+                with metrics.phase('parse'):
+                    # Records go into the store as words; cycle dicts are
+                    # only built for the windows that are read
+                    trace.extend_records(decode_packed_trace(text), initial_memory=run.initial_memory)
+            else:
+                # The text trace is parsed while vvp runs, so both count as the run
+                with metrics.phase('vvp_run'):
+                    for cycle in iter_verilog_cycles(run):
+                        trace.append(cycle)
         
         # If parsing failed or returned empty data, fall back to Python simulation
-        if not simulation_data:
+        if not len(trace):
             print("Failed to parse Verilog simulation output.")
+            metrics.fallbacks.inc(reason='empty_trace')
             print("Falling back to Python simulation.")
-            return fallback_python_simulation(hex_instructions)
+            return fallback_python_simulation(hex_instructions, cycles, fast_forward, run_info)
             
-        return simulation_data
+        return trace
         
+    except SimulatorBusyError:
+        # Shed load instead of running the fallback engine in the web worker
+        raise
     except Exception as e:
         # If there's an error with the Verilog simulation, fall back to Python simulation
         print(f"Error in Verilog simulation: {str(e)}")
+        metrics.fallbacks.inc(reason='timeout' if isinstance(e, VerilogTimeoutError) else 'verilog_error')
         print("Falling back to Python simulation.")
-        return fallback_python_simulation(hex_instructions)
+        return fallback_python_simulation(hex_instructions, cycles, fast_forward, run_info)
+
+def stream_riscv_simulation(hex_instructions, cycles=SIM_CYCLES, fast_forward=None, run_info=None,
+                            timeout=SIM_RUN_TIMEOUT, check=None):
+    """Yield cycles as the simulator produces them.
+
+    Falls back to the Python engine only if Verilog fails before the first
+    cycle; after that the error is raised to the caller. timeout bounds
+    the vvp run in seconds. check is called periodically while fast-forwarding
+    and may raise SimulationStopped to abandon the run.
+    """
+    return _stream_simulation(iter_verilog_cycles, stream_python_simulation, hex_instructions, cycles,
+                              fast_forward, run_info, timeout, check)
+
+def stream_riscv_records(hex_instructions, cycles=SIM_CYCLES, fast_forward=None, run_info=None,
+                         timeout=SIM_RUN_TIMEOUT, check=None):
+    """Like stream_riscv_simulation, but yield (record, {address: value} writes) pairs.
+
+    For callers that store the trace rather than show it: neither engine
+    builds cycle dicts on this path.
+    """
+    return _stream_simulation(iter_verilog_records, stream_python_records, hex_instructions, cycles,
+                              fast_forward, run_info, timeout, check)
+
+def _stream_simulation(verilog_trace, python_trace, hex_instructions, cycles, fast_forward, run_info,
+                       timeout, check):
+    run_info = {} if run_info is None else run_info
+    emitted = False
+    try:
+        model_path = get_simulation_model()
+        if model_path is not None:
+            with verilog_run(model_path, hex_instructions, cycles, fast_forward, run_info, timeout, check) as run:
+                for cycle in verilog_trace(run):
+                    emitted = True
+                    yield cycle
+            if emitted:
+                return
+            print("Failed to parse Verilog simulation output.")
+            metrics.fallbacks.inc(reason='empty_trace')
+    except (SimulatorBusyError, SimulationStopped):
+        raise
+    except Exception as e:
+        if emitted:
+            raise
+        print(f"Error in Verilog simulation: {str(e)}")
+        metrics.fallbacks.inc(reason='timeout' if isinstance(e, VerilogTimeoutError) else 'verilog_error')
+    
+    print("Falling back to Python simulation.")
+    yield from python_trace(hex_instructions, cycles, fast_forward, run_info, check)
 
 def parse_simulation_output(output_file_path):
     """Parse the Verilog simulation output file and convert to the expected format"""
-    cycles = []
+    try:
+        with open(output_file_path, 'r') as f:
+            lines = f.readlines()
+    except OSError as e:
+        print(f"Error reading simulation output: {str(e)}")
+        return []
+    return parse_simulation_lines(lines)
+
+def parse_simulation_lines(lines):
+    """Parse Verilog trace lines into the per-cycle format used by the frontend"""
+    try:
+        return list(iter_simulation_cycles(lines))
+    except Exception as e:
+        print(f"Error parsing simulation output: {str(e)}")
+        return []
+
+def iter_simulation_cycles(lines):
+    """Yield each cycle as soon as its trace block ("----") is complete.
+
+    lines may be any iterable, such as a vvp stdout pipe, so cycles can be
+    forwarded to the client while the simulation is still running.
+    """
     current_cycle = None
     registers = [0] * 32
-    memory = {}
-    pipeline = {}
     control_signals = {
         'regwrite': False,
         'memread': False,
@@ -137,362 +1162,197 @@ def parse_simulation_output(output_file_path):
         'memtoreg': False
     }
     
-    try:
-        with open(output_file_path, 'r') as f:
-            lines = f.readlines()
+    cycle_num = 0
+    for raw_line in lines:
+        line = raw_line.strip()
+        
+        # End of the current cycle block
+        if line == "----":
+            if current_cycle is not None:
+                current_cycle['registers'] = registers.copy()
+                yield current_cycle
+                current_cycle = None
         
-        cycle_num = 0
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
+        # Start of a new cycle
+        elif line.startswith("CYCLE"):
+            # Emit an unterminated previous cycle if there is one
+            if current_cycle is not None:
+                current_cycle['registers'] = registers.copy()
+                yield current_cycle
+                current_cycle = None
             
-            # Start of a new cycle
-            if line.startswith("CYCLE"):
-                # Save previous cycle data if it exists
-                if current_cycle is not None:
-                    cycles.append(current_cycle)
+            # Extract cycle number and PC
+            match = re.match(r"CYCLE (\d+): PC=0x([0-9a-fA-F]+)", line)
+            if match:
+                cycle_num = int(match.group(1))
+                pc = int(match.group(2), 16)
                 
-                # Extract cycle number and PC
-                match = re.match(r"CYCLE (\d+): PC=0x([0-9a-fA-F]+)", line)
-                if match:
-                    cycle_num = int(match.group(1))
-                    pc = int(match.group(2), 16)
-                    
-                    # Initialize new cycle data
-                    current_cycle = {
-                        'cycle': cycle_num,
-                        'pc': pc,
-                        'registers': registers.copy(),
-                        'pipeline': {
-                            'if_id': {'pc': 0, 'instruction': '00000013'},
-                            'id_ex': {
-                                'pc': 0, 
-                                'instruction': '00000013', 
-                                'rs1': 0,
-                                'rs2': 0,
-                                'rd': 0,
-                                'rs1_val': 0, 
-                                'rs2_val': 0,
-                                'imm': 0
-                            },
-                            'ex_mem': {
-                                'pc': 0, 
-                                'alu_result': 0, 
-                                'rd': 0,
-                                'zero_flag': 0
-                            },
-                            'mem_wb': {
-                                'pc': 0, 
-                                'result': 0, 
-                                'rd': 0
-                            }
+                # Initialize new cycle data
+                current_cycle = {
+                    'cycle': cycle_num,
+                    'pc': pc,
+                    'registers': registers.copy(),
+                    'pipeline': {
+                        'if_id': {'pc': 0, 'instruction': '00000013'},
+                        'id_ex': {
+                            'pc': 0, 
+                            'instruction': '00000013', 
+                            'rs1': 0,
+                            'rs2': 0,
+                            'rd': 0,
+                            'rs1_val': 0, 
+                            'rs2_val': 0,
+                            'imm': 0
                         },
-                        'memory': {},
-                        'control_signals': control_signals.copy()
-                    }
-            
-            # Parse register values
-            elif line.startswith("REG["):
-                # Extract register values
-                matches = re.findall(r"REG\[(\d+)\]=0x([0-9a-fA-F]+)", line)
-                for match in matches:
-                    reg_num = int(match[0])
-                    reg_val = int(match[1], 16)
-                    if reg_num < 32:
-                        registers[reg_num] = reg_val
-            
-            # Parse pipeline stage information
-            elif line.startswith("IF_ID_INSTR"):
-                match = re.match(r"IF_ID_INSTR=0x([0-9a-fA-F]+) IF_ID_PC=0x([0-9a-fA-F]+)", line)
-                if match and current_cycle is not None:
-                    current_cycle['pipeline']['if_id']['instruction'] = match.group(1)
-                    current_cycle['pipeline']['if_id']['pc'] = int(match.group(2), 16)
-            
-            elif line.startswith("ID_EX_INSTR"):
-                match = re.match(r"ID_EX_INSTR=0x([0-9a-fA-F]+) ID_EX_PC=0x([0-9a-fA-F]+)", line)
-                if match and current_cycle is not None:
-                    current_cycle['pipeline']['id_ex']['instruction'] = match.group(1)
-                    current_cycle['pipeline']['id_ex']['pc'] = int(match.group(2), 16)
-            
-            elif line.startswith("ID_EX_RS1="):
-                match = re.match(r"ID_EX_RS1=0x([0-9a-fA-F]+) ID_EX_RS1_VAL=0x([0-9a-fA-F]+)", line)
-                if match and current_cycle is not None:
-                    current_cycle['pipeline']['id_ex']['rs1'] = int(match.group(1), 16)
-                    current_cycle['pipeline']['id_ex']['rs1_val'] = int(match.group(2), 16)
-            
-            elif line.startswith("ID_EX_RS2="):
-                match = re.match(r"ID_EX_RS2=0x([0-9a-fA-F]+) ID_EX_RS2_VAL=0x([0-9a-fA-F]+)", line)
-                if match and current_cycle is not None:
-                    current_cycle['pipeline']['id_ex']['rs2'] = int(match.group(1), 16)
-                    current_cycle['pipeline']['id_ex']['rs2_val'] = int(match.group(2), 16)
-            
-            elif line.startswith("ID_EX_RD="):
-                match = re.match(r"ID_EX_RD=0x([0-9a-fA-F]+) ID_EX_IMM=0x([0-9a-fA-F]+)", line)
-                if match and current_cycle is not None:
-                    current_cycle['pipeline']['id_ex']['rd'] = int(match.group(1), 16)
-                    current_cycle['pipeline']['id_ex']['imm'] = int(match.group(2), 16)
-            
-            elif line.startswith("EX_MEM_ALU"):
-                match = re.match(r"EX_MEM_ALU=0x([0-9a-fA-F]+) EX_MEM_PC=0x([0-9a-fA-F]+)", line)
-                if match and current_cycle is not None:
-                    current_cycle['pipeline']['ex_mem']['alu_result'] = int(match.group(1), 16)
-                    current_cycle['pipeline']['ex_mem']['pc'] = int(match.group(2), 16)
-            
-            elif line.startswith("EX_MEM_RD="):
-                match = re.match(r"EX_MEM_RD=0x([0-9a-fA-F]+) EX_MEM_ZERO=(\d+)", line)
-                if match and current_cycle is not None:
-                    current_cycle['pipeline']['ex_mem']['rd'] = int(match.group(1), 16)
-                    current_cycle['pipeline']['ex_mem']['zero_flag'] = int(match.group(2))
-            
-            elif line.startswith("MEM_WB_DATA"):
-                match = re.match(r"MEM_WB_DATA=0x([0-9a-fA-F]+) MEM_WB_PC=0x([0-9a-fA-F]+)", line)
-                if match and current_cycle is not None:
-                    current_cycle['pipeline']['mem_wb']['result'] = int(match.group(1), 16)
-                    current_cycle['pipeline']['mem_wb']['pc'] = int(match.group(2), 16)
-            
-            elif line.startswith("MEM_WB_RD="):
-                match = re.match(r"MEM_WB_RD=0x([0-9a-fA-F]+)", line)
-                if match and current_cycle is not None:
-                    current_cycle['pipeline']['mem_wb']['rd'] = int(match.group(1), 16)
-            
-            # Parse control signals
-            elif line.startswith("CTRL_REGWRITE="):
-                match = re.match(r"CTRL_REGWRITE=(\d+) CTRL_MEMREAD=(\d+) CTRL_MEMWRITE=(\d+)", line)
-                if match and current_cycle is not None:
-                    current_cycle['control_signals']['regwrite'] = bool(int(match.group(1)))
-                    current_cycle['control_signals']['memread'] = bool(int(match.group(2)))
-                    current_cycle['control_signals']['memwrite'] = bool(int(match.group(3)))
-            
-            elif line.startswith("CTRL_BRANCH="):
-                match = re.match(r"CTRL_BRANCH=(\d+) CTRL_ALUSRC=(\d+) CTRL_MEMTOREG=(\d+)", line)
-                if match and current_cycle is not None:
-                    current_cycle['control_signals']['branch'] = bool(int(match.group(1)))
-                    current_cycle['control_signals']['alusrc'] = bool(int(match.group(2)))
-                    current_cycle['control_signals']['memtoreg'] = bool(int(match.group(3)))
-            
-            # Parse memory contents
-            elif line.startswith("MEM["):
-                matches = re.findall(r"MEM\[(\d+)\]=0x([0-9a-fA-F]+)", line)
-                for match in matches:
-                    mem_addr = int(match[0]) // 4  # Convert byte address to word address
-                    mem_val = int(match[1], 16)
-                    if mem_val != 0:  # Only store non-zero values
-                        current_cycle['memory'][mem_addr] = mem_val
-            
-            i += 1
+                        'ex_mem': {
+                            'pc': 0, 
+                            'alu_result': 0, 
+                            'rd': 0,
+                            'zero_flag': 0
+                        },
+                        'mem_wb': {
+                            'pc': 0, 
+                            'result': 0, 
+                            'rd': 0
+                        }
+                    },
+                    'memory_writes': {},
+                    'counters': dict.fromkeys(PERF_COUNTERS, 0),
+                    'control_signals': control_signals.copy()
+                }
         
-        # Add the last cycle
-        if current_cycle is not None:
-            cycles.append(current_cycle)
+        # Parse register values
+        elif line.startswith("REG["):
+            # Extract register values
+            matches = re.findall(r"REG\[(\d+)\]=0x([0-9a-fA-F]+)", line)
+            for match in matches:
+                reg_num = int(match[0])
+                reg_val = int(match[1], 16)
+                if reg_num < 32:
+                    registers[reg_num] = reg_val
         
-        return cycles
-    
-    except Exception as e:
-        print(f"Error parsing simulation output: {str(e)}")
-        return []
-
-def fallback_python_simulation(hex_instructions):
-    """Fallback to Python-based simulation if Verilog simulation fails"""
-    class RISCVSimulator:
-        def __init__(self):
-            self.registers = [0] * 32  # 32 general purpose registers
-            self.memory = [0] * 256    # Data memory
-            self.pc = 0
-            self.instruction_memory = []
-            self.cycles = []
-            
-            # Pipeline registers
-            self.if_id = {'pc': 0, 'instruction': 0x00000013}
-            self.id_ex = {'pc': 0, 'instruction': 0x00000013, 'rs1_val': 0, 'rs2_val': 0, 'imm': 0, 'rd': 0}
-            self.ex_mem = {'pc': 0, 'alu_result': 0, 'rd': 0, 'mem_write_data': 0}
-            self.mem_wb = {'pc': 0, 'result': 0, 'rd': 0}
-            
-            # Control signals
-            self.control = {
-                'reg_write': False,
-                'mem_read': False,
-                'mem_write': False,
-                'mem_to_reg': False,
-                'alu_src': False,
-                'branch': False
-            }
+        # Parse pipeline stage information
+        elif line.startswith("IF_ID_INSTR"):
+            match = re.match(r"IF_ID_INSTR=0x([0-9a-fA-F]+) IF_ID_PC=0x([0-9a-fA-F]+)", line)
+            if match and current_cycle is not None:
+                current_cycle['pipeline']['if_id']['instruction'] = match.group(1)
+                current_cycle['pipeline']['if_id']['pc'] = int(match.group(2), 16)
         
-        def load_instructions(self, hex_str):
-            """Load hex instructions into instruction memory"""
-            lines = hex_str.strip().split('\n')
-            for line in lines:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    try:
-                        instr = int(line, 16)
-                        self.instruction_memory.append(instr)
-                    except ValueError:
-                        self.instruction_memory.append(0x00000013)  # NOP
-            
-            # Pad with NOPs
-            while len(self.instruction_memory) < 64:
-                self.instruction_memory.append(0x00000013)
+        elif line.startswith("ID_EX_INSTR"):
+            match = re.match(r"ID_EX_INSTR=0x([0-9a-fA-F]+) ID_EX_PC=0x([0-9a-fA-F]+)", line)
+            if match and current_cycle is not None:
+                current_cycle['pipeline']['id_ex']['instruction'] = match.group(1)
+                current_cycle['pipeline']['id_ex']['pc'] = int(match.group(2), 16)
         
-        def decode_instruction(self, instr):
-            """Decode RISC-V instruction"""
-            opcode = instr & 0x7F
-            rd = (instr >> 7) & 0x1F
-            funct3 = (instr >> 12) & 0x7
-            rs1 = (instr >> 15) & 0x1F
-            rs2 = (instr >> 20) & 0x1F
-            funct7 = (instr >> 25) & 0x7F
-            
-            # Immediate generation
-            if opcode == 0x13 or opcode == 0x03:  # I-type
-                imm = (instr >> 20) & 0xFFF
-                if imm & 0x800:  # Sign extend
-                    imm |= 0xFFFFF000
-            elif opcode == 0x23:  # S-type
-                imm = ((instr >> 25) << 5) | ((instr >> 7) & 0x1F)
-                if imm & 0x800:  # Sign extend
-                    imm |= 0xFFFFF000
-            elif opcode == 0x63:  # B-type
-                imm = ((instr >> 31) << 12) | (((instr >> 7) & 0x1) << 11) | (((instr >> 25) & 0x3F) << 5) | (((instr >> 8) & 0xF) << 1)
-                if imm & 0x1000:  # Sign extend
-                    imm |= 0xFFFFE000
-            else:
-                imm = 0
-            
-            return {
-                'opcode': opcode,
-                'rd': rd,
-                'funct3': funct3,
-                'rs1': rs1,
-                'rs2': rs2,
-                'funct7': funct7,
-                'imm': imm & 0xFFFFFFFF
-            }
+        elif line.startswith("ID_EX_RS1="):
+            match = re.match(r"ID_EX_RS1=0x([0-9a-fA-F]+) ID_EX_RS1_VAL=0x([0-9a-fA-F]+)", line)
+            if match and current_cycle is not None:
+                current_cycle['pipeline']['id_ex']['rs1'] = int(match.group(1), 16)
+                current_cycle['pipeline']['id_ex']['rs1_val'] = int(match.group(2), 16)
         
-        def execute_alu(self, op1, op2, funct3, funct7, opcode):
-            """Execute ALU operation"""
-            if opcode == 0x33:  # R-type
-                if funct3 == 0:  # ADD/SUB
-                    if funct7 == 0x20:  # SUB
-                        return (op1 - op2) & 0xFFFFFFFF
-                    else:  # ADD
-                        return (op1 + op2) & 0xFFFFFFFF
-                elif funct3 == 7:  # AND
-                    return op1 & op2
-                elif funct3 == 6:  # OR
-                    return op1 | op2
-                elif funct3 == 4:  # XOR
-                    return op1 ^ op2
-                elif funct3 == 1:  # SLL
-                    return (op1 << (op2 & 0x1F)) & 0xFFFFFFFF
-            elif opcode == 0x13:  # I-type
-                if funct3 == 0:  # ADDI
-                    return (op1 + op2) & 0xFFFFFFFF
-                elif funct3 == 2:  # SLTI
-                    return 1 if (op1 < op2) else 0
-            elif opcode == 0x03 or opcode == 0x23:  # Load/Store
-                return (op1 + op2) & 0xFFFFFFFF
-            
-            return 0
+        elif line.startswith("ID_EX_RS2="):
+            match = re.match(r"ID_EX_RS2=0x([0-9a-fA-F]+) ID_EX_RS2_VAL=0x([0-9a-fA-F]+)", line)
+            if match and current_cycle is not None:
+                current_cycle['pipeline']['id_ex']['rs2'] = int(match.group(1), 16)
+                current_cycle['pipeline']['id_ex']['rs2_val'] = int(match.group(2), 16)
         
-        def simulate_cycle(self, cycle_num):
-            """Simulate one clock cycle"""
-            cycle_data = {
-                'cycle': cycle_num,
-                'pc': self.pc,
-                'registers': self.registers.copy(),
-                'pipeline': {
-                    'if_id': {
-                        'pc': self.if_id.get('pc', 0),
-                        'instruction': format(self.if_id.get('instruction', 0x00000013), '08X')
-                    },
-                    'id_ex': {
-                        'pc': self.id_ex.get('pc', 0),
-                        'instruction': format(self.id_ex.get('instruction', 0x00000013), '08X'),
-                        'rs1_val': self.id_ex.get('rs1_val', 0),
-                        'rs2_val': self.id_ex.get('rs2_val', 0)
-                    },
-                    'ex_mem': {
-                        'pc': self.ex_mem.get('pc', 0),
-                        'alu_result': self.ex_mem.get('alu_result', 0),
-                        'rd': self.ex_mem.get('rd', 0)
-                    },
-                    'mem_wb': {
-                        'pc': self.mem_wb.get('pc', 0),
-                        'result': self.mem_wb.get('result', 0),
-                        'rd': self.mem_wb.get('rd', 0)
-                    }
-                },
-                'memory': {i: self.memory[i] for i in range(16) if self.memory[i] != 0}
-            }
-            
-            # Write Back stage
-            if self.mem_wb['rd'] != 0 and cycle_num > 4:  # WB happens after 5 cycles
-                self.registers[self.mem_wb['rd']] = self.mem_wb['result']
-            
-            # Memory stage
-            if cycle_num > 3:  # MEM happens after 4 cycles
-                decoded = self.decode_instruction(self.ex_mem.get('instruction', 0x00000013))
-                if decoded['opcode'] == 0x03:  # Load
-                    addr = (self.ex_mem['alu_result'] // 4) % len(self.memory)
-                    self.mem_wb['result'] = self.memory[addr]
-                elif decoded['opcode'] == 0x23:  # Store
-                    addr = (self.ex_mem['alu_result'] // 4) % len(self.memory)
-                    self.memory[addr] = self.ex_mem['mem_write_data']
-                    self.mem_wb['result'] = self.ex_mem['alu_result']
-                else:
-                    self.mem_wb['result'] = self.ex_mem['alu_result']
-                
-                self.mem_wb['rd'] = self.ex_mem['rd']
-                self.mem_wb['pc'] = self.ex_mem['pc']
-            
-            # Execute stage
-            if cycle_num > 2:  # EX happens after 3 cycles
-                decoded = self.decode_instruction(self.id_ex.get('instruction', 0x00000013))
-                op2 = self.id_ex['imm'] if decoded['opcode'] in [0x13, 0x03, 0x23] else self.id_ex['rs2_val']
-                alu_result = self.execute_alu(self.id_ex['rs1_val'], op2, decoded['funct3'], decoded['funct7'], decoded['opcode'])
-                
-                self.ex_mem['alu_result'] = alu_result
-                self.ex_mem['rd'] = self.id_ex['rd']
-                self.ex_mem['pc'] = self.id_ex['pc']
-                self.ex_mem['mem_write_data'] = self.id_ex['rs2_val']
-                self.ex_mem['instruction'] = self.id_ex['instruction']
-            
-            # Decode stage
-            if cycle_num > 1:  # ID happens after 2 cycles
-                decoded = self.decode_instruction(self.if_id['instruction'])
-                self.id_ex['rs1_val'] = self.registers[decoded['rs1']] if decoded['rs1'] != 0 else 0
-                self.id_ex['rs2_val'] = self.registers[decoded['rs2']] if decoded['rs2'] != 0 else 0
-                self.id_ex['imm'] = decoded['imm']
-                self.id_ex['rd'] = decoded['rd']
-                self.id_ex['pc'] = self.if_id['pc']
-                self.id_ex['instruction'] = self.if_id['instruction']
-            
-            # Fetch stage
-            if self.pc // 4 < len(self.instruction_memory):
-                instruction = self.instruction_memory[self.pc // 4]
-                self.if_id['instruction'] = instruction
-                self.if_id['pc'] = self.pc
-                self.pc += 4
-            
-            return cycle_data
+        elif line.startswith("ID_EX_RD="):
+            match = re.match(r"ID_EX_RD=0x([0-9a-fA-F]+) ID_EX_IMM=0x([0-9a-fA-F]+)", line)
+            if match and current_cycle is not None:
+                current_cycle['pipeline']['id_ex']['rd'] = int(match.group(1), 16)
+                current_cycle['pipeline']['id_ex']['imm'] = int(match.group(2), 16)
         
-        def run(self, num_cycles=20):
-            """Run simulation for specified number of cycles"""
-            self.registers[2] = 100   # x2 = sp
-            self.registers[3] = 200   # x3 = some value
-            self.registers[17] = 50   # x17 = some value
-            self.memory[10] = 123     # Pre-load some test data
-            
-            for cycle in range(num_cycles):
-                cycle_data = self.simulate_cycle(cycle + 1)
-                self.cycles.append(cycle_data)
-            
-            return self.cycles
+        elif line.startswith("EX_MEM_ALU"):
+            match = re.match(r"EX_MEM_ALU=0x([0-9a-fA-F]+) EX_MEM_PC=0x([0-9a-fA-F]+)", line)
+            if match and current_cycle is not None:
+                current_cycle['pipeline']['ex_mem']['alu_result'] = int(match.group(1), 16)
+                current_cycle['pipeline']['ex_mem']['pc'] = int(match.group(2), 16)
+        
+        elif line.startswith("EX_MEM_RD="):
+            match = re.match(r"EX_MEM_RD=0x([0-9a-fA-F]+) EX_MEM_ZERO=(\d+)", line)
+            if match and current_cycle is not None:
+                current_cycle['pipeline']['ex_mem']['rd'] = int(match.group(1), 16)
+                current_cycle['pipeline']['ex_mem']['zero_flag'] = int(match.group(2))
+        
+        elif line.startswith("MEM_WB_DATA"):
+            match = re.match(r"MEM_WB_DATA=0x([0-9a-fA-F]+) MEM_WB_PC=0x([0-9a-fA-F]+)", line)
+            if match and current_cycle is not None:
+                current_cycle['pipeline']['mem_wb']['result'] = int(match.group(1), 16)
+                current_cycle['pipeline']['mem_wb']['pc'] = int(match.group(2), 16)
+        
+        elif line.startswith("MEM_WB_RD="):
+            match = re.match(r"MEM_WB_RD=0x([0-9a-fA-F]+)", line)
+            if match and current_cycle is not None:
+                current_cycle['pipeline']['mem_wb']['rd'] = int(match.group(1), 16)
+        
+        # Parse control signals
+        elif line.startswith("CTRL_REGWRITE="):
+            match = re.match(r"CTRL_REGWRITE=(\d+) CTRL_MEMREAD=(\d+) CTRL_MEMWRITE=(\d+)", line)
+            if match and current_cycle is not None:
+                current_cycle['control_signals']['regwrite'] = bool(int(match.group(1)))
+                current_cycle['control_signals']['memread'] = bool(int(match.group(2)))
+                current_cycle['control_signals']['memwrite'] = bool(int(match.group(3)))
+        
+        elif line.startswith("CTRL_BRANCH="):
+            match = re.match(r"CTRL_BRANCH=(\d+) CTRL_ALUSRC=(\d+) CTRL_MEMTOREG=(\d+)", line)
+            if match and current_cycle is not None:
+                current_cycle['control_signals']['branch'] = bool(int(match.group(1)))
+                current_cycle['control_signals']['alusrc'] = bool(int(match.group(2)))
+                current_cycle['control_signals']['memtoreg'] = bool(int(match.group(3)))
+        
+        # Parse the data memory word written since the previous cycle
+        elif line.startswith("MEM_WRITE="):
+            match = re.match(r"MEM_WRITE=(\d+) MEM_ADDR=0x([0-9a-fA-F]+) MEM_DATA=0x([0-9a-fA-F]+)", line)
+            if match and current_cycle is not None and match.group(1) == '1':
+                current_cycle['memory_writes'][int(match.group(2), 16)] = int(match.group(3), 16)
+        
+        # Parse performance counters
+        elif line.startswith("PERF_"):
+            if current_cycle is not None:
+                for name, value in re.findall(r"PERF_([A-Z_]+)=(\d+)", line):
+                    current_cycle['counters'][name.lower()] = int(value)
     
-    # Create and run simulation
+    # Add the last cycle if the trace was cut short
+    if current_cycle is not None:
+        current_cycle['registers'] = registers.copy()
+        yield current_cycle
+
+def fallback_python_simulation(hex_instructions, cycles=SIM_CYCLES, fast_forward=None, run_info=None):
+    """Fallback to Python-based simulation if Verilog simulation fails"""
+    trace = run_store.create()
+    with metrics.phase('python_fallback'):
+        sim = start_python_simulation(hex_instructions, fast_forward, run_info)
+        # Records go straight into the store; no per-cycle dicts are built
+        words = []
+        writes = {}
+        for index, (record, cycle_writes) in enumerate(sim.run_records(cycles)):
+            words.extend(record)
+            if cycle_writes:
+                writes[index] = cycle_writes.items()
+        trace.extend_records(word_array(words), writes)
+    return trace
+
+def start_python_simulation(hex_instructions, fast_forward=None, run_info=None, check=None):
+    """Python pipeline model loaded with the program and fast-forwarded, ready to trace"""
     sim = RISCVSimulator()
     sim.load_instructions(hex_instructions)
-    return sim.run()
+    if run_info is not None:
+        run_info['backend'] = 'python'
+    if fast_forward:
+        instructions, reason = sim.fast_forward(**fast_forward, check=check)
+        if run_info is not None:
+            run_info['fast_forward'] = fast_forward_summary(instructions, sim.pc, reason)
+    return sim
+
+def stream_python_simulation(hex_instructions, cycles=SIM_CYCLES, fast_forward=None, run_info=None, check=None):
+    """Run the Python pipeline model, yielding one cycle at a time"""
+    sim = start_python_simulation(hex_instructions, fast_forward, run_info, check)
+    yield from sim.run(cycles)
+
+def stream_python_records(hex_instructions, cycles=SIM_CYCLES, fast_forward=None, run_info=None, check=None):
+    """Run the Python pipeline model, yielding (record, memory writes) per cycle"""
+    sim = start_python_simulation(hex_instructions, fast_forward, run_info, check)
+    yield from sim.run_records(cycles)
 
 @app.route('/about')
 def about():
@@ -0,0 +1,478 @@
+"""Two-pass RV32I assembler.
+
+The first pass strips comments, records label addresses and expands
+pseudo-instructions into base instructions; the second encodes each
+instruction through the format tables below. Both passes touch every line
+once, so assembly time is linear in program length. Lines that are already
+machine code (eight hex digits, or 0x-prefixed) are emitted as-is, so hex
+and assembly can be mixed in one listing.
+
+Branch and jump targets may be labels or numeric byte offsets from the
+instruction. `call` and `tail` assemble to a single JAL.
+"""
+
+import re
+from functools import lru_cache
+
+from riscv_simulator import (OPCODE_AUIPC, OPCODE_BRANCH, OPCODE_FENCE, OPCODE_I_TYPE,
+                             OPCODE_JAL, OPCODE_JALR, OPCODE_LOAD, OPCODE_LUI,
+                             OPCODE_R_TYPE, OPCODE_STORE, OPCODE_SYSTEM)
+
+
+class AssemblyError(Exception):
+    """Raised for source that cannot be assembled; line is 1-based"""
+
+    def __init__(self, line, message, source=None):
+        self.line = line
+        self.message = message
+        self.source = source
+        text = f"Line {line}: {message}"
+        if source:
+            text += f" ({source.strip()})"
+        super().__init__(text)
+
+
+# Register names, including ABI aliases
+REGISTERS = {f'x{i}': i for i in range(32)}
+REGISTERS.update({
+    'zero': 0, 'ra': 1, 'sp': 2, 'gp': 3, 'tp': 4, 't0': 5, 't1': 6, 't2': 7,
+    's0': 8, 'fp': 8, 's1': 9, 'a0': 10, 'a1': 11, 'a2': 12, 'a3': 13, 'a4': 14,
+    'a5': 15, 'a6': 16, 'a7': 17, 's2': 18, 's3': 19, 's4': 20, 's5': 21,
+    's6': 22, 's7': 23, 's8': 24, 's9': 25, 's10': 26, 's11': 27, 't3': 28,
+    't4': 29, 't5': 30, 't6': 31
+})
+
+# mnemonic: (format, opcode, funct3, funct7)
+INSTRUCTIONS = {
+    'add': ('R', OPCODE_R_TYPE, 0x0, 0x00),
+    'sub': ('R', OPCODE_R_TYPE, 0x0, 0x20),
+    'sll': ('R', OPCODE_R_TYPE, 0x1, 0x00),
+    'slt': ('R', OPCODE_R_TYPE, 0x2, 0x00),
+    'sltu': ('R', OPCODE_R_TYPE, 0x3, 0x00),
+    'xor': ('R', OPCODE_R_TYPE, 0x4, 0x00),
+    'srl': ('R', OPCODE_R_TYPE, 0x5, 0x00),
+    'sra': ('R', OPCODE_R_TYPE, 0x5, 0x20),
+    'or': ('R', OPCODE_R_TYPE, 0x6, 0x00),
+    'and': ('R', OPCODE_R_TYPE, 0x7, 0x00),
+    'addi': ('I', OPCODE_I_TYPE, 0x0, None),
+    'slti': ('I', OPCODE_I_TYPE, 0x2, None),
+    'sltiu': ('I', OPCODE_I_TYPE, 0x3, None),
+    'xori': ('I', OPCODE_I_TYPE, 0x4, None),
+    'ori': ('I', OPCODE_I_TYPE, 0x6, None),
+    'andi': ('I', OPCODE_I_TYPE, 0x7, None),
+    'slli': ('SHIFT', OPCODE_I_TYPE, 0x1, 0x00),
+    'srli': ('SHIFT', OPCODE_I_TYPE, 0x5, 0x00),
+    'srai': ('SHIFT', OPCODE_I_TYPE, 0x5, 0x20),
+    'lb': ('LOAD', OPCODE_LOAD, 0x0, None),
+    'lh': ('LOAD', OPCODE_LOAD, 0x1, None),
+    'lw': ('LOAD', OPCODE_LOAD, 0x2, None),
+    'lbu': ('LOAD', OPCODE_LOAD, 0x4, None),
+    'lhu': ('LOAD', OPCODE_LOAD, 0x5, None),
+    'sb': ('S', OPCODE_STORE, 0x0, None),
+    'sh': ('S', OPCODE_STORE, 0x1, None),
+    'sw': ('S', OPCODE_STORE, 0x2, None),
+    'beq': ('B', OPCODE_BRANCH, 0x0, None),
+    'bne': ('B', OPCODE_BRANCH, 0x1, None),
+    'blt': ('B', OPCODE_BRANCH, 0x4, None),
+    'bge': ('B', OPCODE_BRANCH, 0x5, None),
+    'bltu': ('B', OPCODE_BRANCH, 0x6, None),
+    'bgeu': ('B', OPCODE_BRANCH, 0x7, None),
+    'lui': ('U', OPCODE_LUI, None, None),
+    'auipc': ('U', OPCODE_AUIPC, None, None),
+    'jal': ('J', OPCODE_JAL, None, None),
+    'jalr': ('JALR', OPCODE_JALR, 0x0, None),
+    'fence': ('FENCE', OPCODE_FENCE, 0x0, None),
+    'ecall': ('SYSTEM', OPCODE_SYSTEM, 0x0, 0x000),
+    'ebreak': ('SYSTEM', OPCODE_SYSTEM, 0x0, 0x001),
+}
+
+# Directives that only matter to a linker; instruction memory is a single section
+IGNORED_DIRECTIVES = {'.text', '.globl', '.global', '.section', '.align', '.p2align', '.option', '.type', '.size'}
+
+_LABEL = re.compile(r'^([A-Za-z_.$][\w.$]*)\s*:')
+_SYMBOL = re.compile(r'^[A-Za-z_.$][\w.$]*$')
+_MEMORY_OPERAND = re.compile(r'^(.*)\(\s*(\w+)\s*\)$')
+_RELOCATION = re.compile(r'^%(hi|lo|pcrel_hi|pcrel_lo)\((.+)\)$')
+_HEX_WORD = re.compile(r'^(?:0[xX][0-9a-fA-F]{1,8}|[0-9a-fA-F]{8})$')
+
+
+class Statement:
+    """One base instruction (or data word) at a known address"""
+
+    __slots__ = ('line', 'source', 'address', 'mnemonic', 'operands')
+
+    def __init__(self, line, source, address, mnemonic, operands):
+        self.line = line
+        self.source = source
+        self.address = address
+        self.mnemonic = mnemonic
+        self.operands = operands
+
+
+def _strip_comment(line):
+    for marker in ('#', '//'):
+        index = line.find(marker)
+        if index != -1:
+            line = line[:index]
+    return line.strip()
+
+
+def _parse_integer(token):
+    token = token.strip()
+    try:
+        return int(token, 0)
+    except ValueError:
+        # int(x, 0) rejects leading zeros in decimal, e.g. "08"
+        return int(token, 10)
+
+
+# Pseudo-instructions expand to base instructions before addresses are assigned
+
+def _expand_li(operands):
+    _expect(operands, 2, 'li rd, immediate')
+    rd, value = operands
+    try:
+        value = _parse_integer(value)
+    except ValueError:
+        raise ValueError("li needs a constant; use la for addresses")
+    if not -0x80000000 <= value <= 0xFFFFFFFF:
+        raise ValueError(f"li immediate {value} does not fit in 32 bits")
+    value &= 0xFFFFFFFF
+    signed = value - 0x100000000 if value & 0x80000000 else value
+    if -2048 <= signed <= 2047:
+        return [('addi', [rd, 'x0', str(signed)])]
+    upper = ((value + 0x800) >> 12) & 0xFFFFF
+    lower = ((value & 0xFFF) ^ 0x800) - 0x800
+    expansion = [('lui', [rd, str(upper)])]
+    if lower:
+        expansion.append(('addi', [rd, rd, str(lower)]))
+    return expansion
+
+
+def _expect(operands, count, usage):
+    if len(operands) != count:
+        raise ValueError(f"expected {usage}")
+
+
+def _branch_zero(base):
+    def expand(operands):
+        _expect(operands, 2, f'{base}z rs, label')
+        return [(base, [operands[0], 'x0', operands[1]])]
+    return expand
+
+
+def _branch_swapped(base):
+    def expand(operands):
+        _expect(operands, 3, 'rs, rt, label')
+        return [(base, [operands[1], operands[0], operands[2]])]
+    return expand
+
+
+def _expand_jal(operands):
+    # Two-operand jal is the base form; `jal label` links through ra
+    if len(operands) == 1:
+        return [('jal', ['ra', operands[0]])]
+    return [('jal', operands)]
+
+
+def _expand_jalr(operands):
+    if len(operands) == 1:
+        return [('jalr', ['ra', f'0({operands[0]})'])]
+    if len(operands) == 3:
+        return [('jalr', [operands[0], f'{operands[2]}({operands[1]})'])]
+    return [('jalr', operands)]
+
+
+PSEUDO_INSTRUCTIONS = {
+    'nop': lambda ops: _expect(ops, 0, 'nop') or [('addi', ['x0', 'x0', '0'])],
+    'li': _expand_li,
+    'la': lambda ops: _expect(ops, 2, 'la rd, label') or [
+        ('auipc', [ops[0], f'%pcrel_hi({ops[1]})']),
+        ('addi', [ops[0], ops[0], f'%pcrel_lo({ops[1]})'])],
+    'mv': lambda ops: _expect(ops, 2, 'mv rd, rs') or [('addi', [ops[0], ops[1], '0'])],
+    'not': lambda ops: _expect(ops, 2, 'not rd, rs') or [('xori', [ops[0], ops[1], '-1'])],
+    'neg': lambda ops: _expect(ops, 2, 'neg rd, rs') or [('sub', [ops[0], 'x0', ops[1]])],
+    'seqz': lambda ops: _expect(ops, 2, 'seqz rd, rs') or [('sltiu', [ops[0], ops[1], '1'])],
+    'snez': lambda ops: _expect(ops, 2, 'snez rd, rs') or [('sltu', [ops[0], 'x0', ops[1]])],
+    'sltz': lambda ops: _expect(ops, 2, 'sltz rd, rs') or [('slt', [ops[0], ops[1], 'x0'])],
+    'sgtz': lambda ops: _expect(ops, 2, 'sgtz rd, rs') or [('slt', [ops[0], 'x0', ops[1]])],
+    'beqz': _branch_zero('beq'),
+    'bnez': _branch_zero('bne'),
+    'bgez': _branch_zero('bge'),
+    'bltz': _branch_zero('blt'),
+    'blez': lambda ops: _expect(ops, 2, 'blez rs, label') or [('bge', ['x0', ops[0], ops[1]])],
+    'bgtz': lambda ops: _expect(ops, 2, 'bgtz rs, label') or [('blt', ['x0', ops[0], ops[1]])],
+    'bgt': _branch_swapped('blt'),
+    'ble': _branch_swapped('bge'),
+    'bgtu': _branch_swapped('bltu'),
+    'bleu': _branch_swapped('bgeu'),
+    'j': lambda ops: _expect(ops, 1, 'j label') or [('jal', ['x0', ops[0]])],
+    'jal': _expand_jal,
+    'jr': lambda ops: _expect(ops, 1, 'jr rs') or [('jalr', ['x0', f'0({ops[0]})'])],
+    'jalr': _expand_jalr,
+    'ret': lambda ops: _expect(ops, 0, 'ret') or [('jalr', ['x0', '0(ra)'])],
+    'call': lambda ops: _expect(ops, 1, 'call label') or [('jal', ['ra', ops[0]])],
+    'tail': lambda ops: _expect(ops, 1, 'tail label') or [('jal', ['x0', ops[0]])],
+}
+
+
+class _Encoder:
+    """Second-pass operand resolution for one statement"""
+
+    def __init__(self, labels):
+        self.labels = labels
+
+    def register(self, token):
+        register = REGISTERS.get(token.strip().lower())
+        if register is None:
+            raise ValueError(f"unknown register '{token.strip()}'")
+        return register
+
+    def value(self, token, statement):
+        """Integer, label address, or %hi/%lo/%pcrel relocation of a label"""
+        token = token.strip()
+        relocation = _RELOCATION.match(token)
+        if relocation:
+            kind, symbol = relocation.groups()
+            target = self.value(symbol, statement)
+            if kind == 'pcrel_hi':
+                target -= statement.address
+            elif kind == 'pcrel_lo':
+                # Pairs with the auipc immediately before this instruction
+                target -= statement.address - 4
+            if kind in ('hi', 'pcrel_hi'):
+                return ((target + 0x800) >> 12) & 0xFFFFF
+            return ((target & 0xFFF) ^ 0x800) - 0x800
+        if _SYMBOL.match(token):
+            if token not in self.labels:
+                raise ValueError(f"undefined label '{token}'")
+            return self.labels[token]
+        try:
+            return _parse_integer(token)
+        except ValueError:
+            raise ValueError(f"invalid immediate '{token}'")
+
+    def offset(self, token, statement):
+        """Branch/jump target: a label, or a numeric byte offset"""
+        token = token.strip()
+        if _SYMBOL.match(token):
+            return self.value(token, statement) - statement.address
+        return self.value(token, statement)
+
+    def memory(self, token, statement):
+        match = _MEMORY_OPERAND.match(token.strip())
+        if not match:
+            raise ValueError(f"expected offset(register), got '{token.strip()}'")
+        offset = match.group(1).strip() or '0'
+        return self.value(offset, statement), self.register(match.group(2))
+
+
+def _check_range(value, low, high, what):
+    if not low <= value <= high:
+        raise ValueError(f"{what} {value} out of range [{low}, {high}]")
+
+
+def _encode_r(spec, ops, enc, st):
+    _, opcode, funct3, funct7 = spec
+    _expect(ops, 3, f'{st.mnemonic} rd, rs1, rs2')
+    rd, rs1, rs2 = (enc.register(op) for op in ops)
+    return (funct7 << 25) | (rs2 << 20) | (rs1 << 15) | (funct3 << 12) | (rd << 7) | opcode
+
+
+def _encode_i(spec, ops, enc, st):
+    _, opcode, funct3, _ = spec
+    _expect(ops, 3, f'{st.mnemonic} rd, rs1, immediate')
+    rd, rs1 = enc.register(ops[0]), enc.register(ops[1])
+    imm = enc.value(ops[2], st)
+    _check_range(imm, -2048, 2047, 'immediate')
+    return ((imm & 0xFFF) << 20) | (rs1 << 15) | (funct3 << 12) | (rd << 7) | opcode
+
+
+def _encode_shift(spec, ops, enc, st):
+    _, opcode, funct3, funct7 = spec
+    _expect(ops, 3, f'{st.mnemonic} rd, rs1, shamt')
+    rd, rs1 = enc.register(ops[0]), enc.register(ops[1])
+    shamt = enc.value(ops[2], st)
+    _check_range(shamt, 0, 31, 'shift amount')
+    return (funct7 << 25) | (shamt << 20) | (rs1 << 15) | (funct3 << 12) | (rd << 7) | opcode
+
+
+def _encode_load(spec, ops, enc, st):
+    _, opcode, funct3, _ = spec
+    _expect(ops, 2, f'{st.mnemonic} rd, offset(rs1)')
+    rd = enc.register(ops[0])
+    imm, rs1 = enc.memory(ops[1], st)
+    _check_range(imm, -2048, 2047, 'offset')
+    return ((imm & 0xFFF) << 20) | (rs1 << 15) | (funct3 << 12) | (rd << 7) | opcode
+
+
+def _encode_s(spec, ops, enc, st):
+    _, opcode, funct3, _ = spec
+    _expect(ops, 2, f'{st.mnemonic} rs2, offset(rs1)')
+    rs2 = enc.register(ops[0])
+    imm, rs1 = enc.memory(ops[1], st)
+    _check_range(imm, -2048, 2047, 'offset')
+    return (((imm >> 5) & 0x7F) << 25) | (rs2 << 20) | (rs1 << 15) | (funct3 << 12) | ((imm & 0x1F) << 7) | opcode
+
+
+def _encode_b(spec, ops, enc, st):
+    _, opcode, funct3, _ = spec
+    _expect(ops, 3, f'{st.mnemonic} rs1, rs2, label')
+    rs1, rs2 = enc.register(ops[0]), enc.register(ops[1])
+    offset = enc.offset(ops[2], st)
+    _check_range(offset, -4096, 4094, 'branch offset')
+    if offset & 1:
+        raise ValueError(f"branch offset {offset} is not even")
+    return ((((offset >> 12) & 1) << 31) | (((offset >> 5) & 0x3F) << 25) | (rs2 << 20) | (rs1 << 15) |
+            (funct3 << 12) | (((offset >> 1) & 0xF) << 8) | (((offset >> 11) & 1) << 7) | opcode)
+
+
+def _encode_u(spec, ops, enc, st):
+    opcode = spec[1]
+    _expect(ops, 2, f'{st.mnemonic} rd, immediate')
+    rd = enc.register(ops[0])
+    imm = enc.value(ops[1], st)
+    _check_range(imm, -0x80000, 0xFFFFF, 'upper immediate')
+    return ((imm & 0xFFFFF) << 12) | (rd << 7) | opcode
+
+
+def _encode_j(spec, ops, enc, st):
+    opcode = spec[1]
+    _expect(ops, 2, 'jal rd, label')
+    rd = enc.register(ops[0])
+    offset = enc.offset(ops[1], st)
+    _check_range(offset, -0x100000, 0xFFFFE, 'jump offset')
+    if offset & 1:
+        raise ValueError(f"jump offset {offset} is not even")
+    return ((((offset >> 20) & 1) << 31) | (((offset >> 1) & 0x3FF) << 21) | (((offset >> 11) & 1) << 20) |
+            (((offset >> 12) & 0xFF) << 12) | (rd << 7) | opcode)
+
+
+def _encode_jalr(spec, ops, enc, st):
+    _, opcode, funct3, _ = spec
+    _expect(ops, 2, 'jalr rd, offset(rs1)')
+    rd = enc.register(ops[0])
+    imm, rs1 = enc.memory(ops[1], st)
+    _check_range(imm, -2048, 2047, 'offset')
+    return ((imm & 0xFFF) << 20) | (rs1 << 15) | (funct3 << 12) | (rd << 7) | opcode
+
+
+def _encode_fence(spec, ops, enc, st):
+    # Orders all prior and later memory accesses (fence iorw, iorw)
+    return (0x0FF << 20) | spec[1]
+
+
+def _encode_system(spec, ops, enc, st):
+    _expect(ops, 0, st.mnemonic)
+    return (spec[3] << 20) | spec[1]
+
+
+def _encode_word(spec, ops, enc, st):
+    _expect(ops, 1, '.word value')
+    value = enc.value(ops[0], st)
+    _check_range(value, -0x80000000, 0xFFFFFFFF, 'word')
+    return value & 0xFFFFFFFF
+
+
+FORMAT_ENCODERS = {
+    'R': _encode_r,
+    'I': _encode_i,
+    'SHIFT': _encode_shift,
+    'LOAD': _encode_load,
+    'S': _encode_s,
+    'B': _encode_b,
+    'U': _encode_u,
+    'J': _encode_j,
+    'JALR': _encode_jalr,
+    'FENCE': _encode_fence,
+    'SYSTEM': _encode_system,
+    'WORD': _encode_word,
+}
+
+_WORD_SPEC = ('WORD', None, None, None)
+
+
+def _split_operands(text):
+    if not text:
+        return []
+    return [op.strip() for op in text.split(',')]
+
+
+def first_pass(source):
+    """Assign addresses, collect labels and expand pseudo-instructions"""
+    statements = []
+    labels = {}
+    address = 0
+    for line_number, raw in enumerate(source.splitlines(), 1):
+        line = _strip_comment(raw)
+
+        # Leading labels, possibly several, possibly followed by an instruction
+        label = _LABEL.match(line)
+        while label:
+            name = label.group(1)
+            if name in labels:
+                raise AssemblyError(line_number, f"label '{name}' is already defined", raw)
+            labels[name] = address
+            line = line[label.end():].strip()
+            label = _LABEL.match(line)
+        if not line:
+            continue
+
+        if _HEX_WORD.match(line):
+            word = line if line[:2].lower() == '0x' else '0x' + line
+            statements.append(Statement(line_number, raw, address, '.word', [word]))
+            address += 4
+            continue
+
+        parts = line.split(None, 1)
+        mnemonic = parts[0].lower()
+        operands = _split_operands(parts[1] if len(parts) > 1 else '')
+
+        if mnemonic.startswith('.'):
+            if mnemonic == '.word':
+                for operand in operands:
+                    statements.append(Statement(line_number, raw, address, '.word', [operand]))
+                    address += 4
+            elif mnemonic not in IGNORED_DIRECTIVES:
+                raise AssemblyError(line_number, f"unsupported directive '{mnemonic}'", raw)
+            continue
+
+        expand = PSEUDO_INSTRUCTIONS.get(mnemonic)
+        if expand is not None:
+            try:
+                expansion = expand(operands)
+            except ValueError as e:
+                raise AssemblyError(line_number, str(e), raw) from None
+        elif mnemonic in INSTRUCTIONS:
+            expansion = [(mnemonic, operands)]
+        else:
+            raise AssemblyError(line_number, f"unknown instruction '{mnemonic}'", raw)
+
+        for base_mnemonic, base_operands in expansion:
+            statements.append(Statement(line_number, raw, address, base_mnemonic, base_operands))
+            address += 4
+    return statements, labels
+
+
+def second_pass(statements, labels):
+    """Encode every statement into a 32-bit word"""
+    encoder = _Encoder(labels)
+    words = []
+    for statement in statements:
+        spec = _WORD_SPEC if statement.mnemonic == '.word' else INSTRUCTIONS[statement.mnemonic]
+        try:
+            words.append(FORMAT_ENCODERS[spec[0]](spec, statement.operands, encoder, statement))
+        except ValueError as e:
+            raise AssemblyError(statement.line, str(e), statement.source) from None
+    return words
+
+
+def assemble_words(source):
+    statements, labels = first_pass(source)
+    return second_pass(statements, labels)
+
+
+@lru_cache(maxsize=256)
+def assemble(source):
+    """Assemble source into newline-separated hex words, memoized per source text"""
+    return '\n'.join(format(word, '08x') for word in assemble_words(source))
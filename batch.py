@@ -0,0 +1,239 @@
+"""Batch simulation of many programs across a process pool.
+
+Each program is simulated in a worker process and reduced to a summary
+(final registers and memory, cycle and instruction counts, CPI and the
+engine's performance counters) instead of a full trace. Summaries are
+yielded as programs complete, followed by an aggregate report. Used by
+the /batch endpoint and as a command-line tool:
+
+    python batch.py examples/*.hex --cycles 200 --backend python
+"""
+
+import argparse
+import atexit
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from app import (SIM_CYCLES, get_simulation_model, performance_summary, process_instructions,
+                 start_python_simulation, stream_riscv_records)
+from riscv_simulator import PERF_COUNTERS
+from trace_format import RECORD_COUNTERS, RECORD_REGISTERS
+
+BATCH_BACKENDS = ('auto', 'verilog', 'python')
+SIM_BATCH_WORKERS = int(os.environ.get('SIM_BATCH_WORKERS', os.cpu_count() or 1))
+SIM_MAX_BATCH = int(os.environ.get('SIM_MAX_BATCH', 1000))
+VERILOG_UNAVAILABLE = "Verilog simulation unavailable; rerun with backend 'auto' or 'python'"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process pool shared by all batches in this process.
+
+    Workers are started with forkserver (or spawn) rather than fork, since
+    the web server forking while its threads hold locks is unsafe.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            methods = multiprocessing.get_all_start_methods()
+            method = 'forkserver' if 'forkserver' in methods else 'spawn'
+            context = multiprocessing.get_context(method)
+            _executor = ProcessPoolExecutor(max_workers=SIM_BATCH_WORKERS, mp_context=context,
+                                            initializer=_worker_init)
+        return _executor
+
+
+def _worker_init():
+    # Simulator diagnostics go to stderr so stdout carries only results
+    sys.stdout = sys.stderr
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(cancel_futures=True)
+            _executor = None
+
+
+atexit.register(shutdown_executor)
+
+
+def require_verilog(backend):
+    """Fail before simulating anything if the Verilog backend was asked for but cannot run"""
+    if backend == 'verilog' and get_simulation_model() is None:
+        raise RuntimeError(VERILOG_UNAVAILABLE)
+
+
+def summarize_program(name, instructions, cycles=SIM_CYCLES, backend='auto', fast_forward=None):
+    """Simulate one program and reduce its final state to a summary dict.
+
+    The Python engine runs untraced and is read once at the end; a Verilog
+    run is read as packed records, keeping only the last. fast_forward
+    takes the limits from parse_run_options.
+    """
+    started = time.perf_counter()
+    summary = {'name': name, 'success': False}
+    run_info = {}
+    try:
+        hex_instructions = process_instructions(instructions)
+        require_verilog(backend)
+        if backend == 'python':
+            sim = start_python_simulation(hex_instructions, fast_forward, run_info)
+            # The summary describes the state at the start of the last cycle
+            sim.run_untraced(cycles - 1)
+            count = cycles
+            last = sim.record(cycles)
+            memory = dict(sim.memory.nonzero())
+        else:
+            count = 0
+            last = None
+            memory = {}
+            records = stream_riscv_records(hex_instructions, cycles, fast_forward, run_info)
+            for record, writes in records:
+                count += 1
+                memory.update(writes)
+                last = record
+
+        if backend == 'verilog' and run_info.get('backend') != 'verilog':
+            # The model built but the run fell back to Python
+            raise RuntimeError(VERILOG_UNAVAILABLE)
+        if last is None:
+            raise RuntimeError("Simulation produced no cycles")
+
+        # The last cycle's counters cover the clock edges before it
+        counters = performance_summary(dict(zip(PERF_COUNTERS, last[RECORD_COUNTERS:])), count - 1)
+        summary.update({
+            'success': True,
+            'backend': run_info.get('backend'),
+            'cycles': count,
+            'instructions': counters['retired'],
+            'cpi': counters['cpi'],
+            'counters': counters,
+            'pc': last[1],
+            'registers': list(last[RECORD_REGISTERS:RECORD_REGISTERS + 32]),
+            'memory': {str(addr): value for addr, value in sorted(memory.items()) if value}
+        })
+        if 'fast_forward' in run_info:
+            summary['fast_forward'] = run_info['fast_forward']
+    except Exception as e:
+        summary['error'] = str(e)
+    summary['seconds'] = round(time.perf_counter() - started, 4)
+    return summary
+
+
+def aggregate_summaries(summaries, wall_seconds):
+    """Totals over a finished batch"""
+    succeeded = [s for s in summaries if s['success']]
+    total_cycles = sum(s['cycles'] for s in succeeded)
+    total_instructions = sum(s['instructions'] for s in succeeded)
+    counted_cycles = sum(s['counters']['cycles'] for s in succeeded)
+    counters = {name: sum(s['counters'][name] for s in succeeded) for name in PERF_COUNTERS}
+    busy_seconds = sum(s['seconds'] for s in summaries)
+    return {
+        'programs': len(summaries),
+        'succeeded': len(succeeded),
+        'failed': len(summaries) - len(succeeded),
+        'total_cycles': total_cycles,
+        'total_instructions': total_instructions,
+        'cpi': round(counted_cycles / total_instructions, 4) if total_instructions else None,
+        'counters': counters,
+        'busy_seconds': round(busy_seconds, 4),
+        'wall_seconds': round(wall_seconds, 4),
+        # How close the batch came to total work divided by workers
+        'parallel_speedup': round(busy_seconds / wall_seconds, 2) if wall_seconds else None
+    }
+
+
+def run_batch(programs, cycles=SIM_CYCLES, backend='auto', executor=None, fast_forward=None):
+    """Simulate (name, instructions) pairs in parallel.
+
+    Yields ('program', summary) as each program completes, in completion
+    order, then ('aggregate', report) once all are done. Every program is
+    fast-forwarded by the same fast_forward limits, if given.
+    """
+    if backend not in BATCH_BACKENDS:
+        raise ValueError(f"backend must be one of {', '.join(BATCH_BACKENDS)}")
+    require_verilog(backend)
+    executor = executor or get_executor()
+    started = time.perf_counter()
+    futures = [executor.submit(summarize_program, name, instructions, cycles, backend, fast_forward)
+               for name, instructions in programs]
+    summaries = []
+    try:
+        for future in as_completed(futures):
+            summary = future.result()
+            summaries.append(summary)
+            yield 'program', summary
+    finally:
+        # A client that disconnects should not leave its batch queued
+        for future in futures:
+            future.cancel()
+    yield 'aggregate', aggregate_summaries(summaries, time.perf_counter() - started)
+
+
+def parse_batch_request(data):
+    """Validate the programs of a /batch request into (name, instructions) pairs"""
+    programs = data.get('programs')
+    if not isinstance(programs, list) or not programs:
+        raise ValueError("programs must be a non-empty list")
+    if len(programs) > SIM_MAX_BATCH:
+        raise ValueError(f"at most {SIM_MAX_BATCH} programs per batch")
+
+    parsed = []
+    for i, program in enumerate(programs):
+        if isinstance(program, str):
+            parsed.append((f"program-{i}", program))
+        elif isinstance(program, dict) and isinstance(program.get('instructions'), str):
+            parsed.append((str(program.get('name', f"program-{i}")), program['instructions']))
+        else:
+            raise ValueError(f"programs[{i}] must be a string or an object with 'instructions'")
+    return parsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate many RISC-V programs in parallel")
+    parser.add_argument('files', nargs='+', help="program files (hex or assembly)")
+    parser.add_argument('--cycles', type=int, default=SIM_CYCLES,
+                        help="cycles to simulate per program")
+    parser.add_argument('--backend', choices=BATCH_BACKENDS, default='auto')
+    parser.add_argument('--workers', type=int, default=SIM_BATCH_WORKERS, help="worker processes")
+    parser.add_argument('--json', action='store_true',
+                        help="print NDJSON records instead of a table")
+    args = parser.parse_args(argv)
+
+    programs = []
+    for path in args.files:
+        with open(path) as f:
+            programs.append((path, f.read()))
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_worker_init) as executor:
+        for event_type, payload in run_batch(programs, args.cycles, args.backend, executor):
+            if args.json:
+                print(json.dumps({'type': event_type, 'data': payload}), flush=True)
+            elif event_type == 'program':
+                if payload['success']:
+                    print(f"{payload['name']}: {payload['cycles']} cycles, "
+                          f"{payload['instructions']} instructions, CPI {payload['cpi']} "
+                          f"[{payload['backend']}, {payload['seconds']}s]", flush=True)
+                else:
+                    print(f"{payload['name']}: ERROR {payload['error']}", flush=True)
+            else:
+                print(f"\n{payload['succeeded']}/{payload['programs']} programs succeeded, "
+                      f"{payload['total_cycles']} cycles in {payload['wall_seconds']}s "
+                      f"(speedup {payload['parallel_speedup']}x)")
+            if event_type == 'aggregate':
+                failed = payload['failed']
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
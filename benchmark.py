@@ -0,0 +1,425 @@
+"""Benchmarks for the simulator hot paths.
+
+Covers instruction processing, both trace parsers on synthetic traces of
+increasing length, Python and vector engine throughput, the Verilog path split into
+compile/spawn/simulate/parse, and /simulate latency through Flask's test
+client at several concurrency levels. Results are written as JSON and
+compared against a stored baseline:
+
+    python benchmark.py --save-baseline      # record benchmarks/baseline.json
+    python benchmark.py                      # compare, exit 1 on regression
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import app
+import assembler
+from riscv_simulator import PERF_COUNTERS, FunctionalSimulator, RISCVSimulator, parse_program
+
+BENCHMARK_DIR = 'benchmarks'
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+DEFAULT_OUTPUT = os.path.join(BENCHMARK_DIR, 'results.json')
+EXAMPLES = sorted(glob.glob(os.path.join('examples', '*.hex')))
+
+
+def best_of(func, repeat=5, number=1):
+    """Fastest of repeat timings of number calls, in seconds per call"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number)
+    return min(timings)
+
+
+def synthetic_program(length, seed=0):
+    """Hex program of ALU, load and store instructions over x1-x15"""
+    words = []
+    for i in range(length):
+        rd = 1 + (i + seed) % 15
+        rs1 = 1 + (i * 7 + seed) % 15
+        rs2 = 1 + (i * 11 + seed) % 15
+        kind = i % 4
+        if kind == 0:    # addi rd, rs1, i
+            word = ((i & 0x7ff) << 20) | (rs1 << 15) | (rd << 7) | 0x13
+        elif kind == 1:  # add rd, rs1, rs2
+            word = (rs2 << 20) | (rs1 << 15) | (rd << 7) | 0x33
+        elif kind == 2:  # sw rs2, 0(x0)
+            word = (rs2 << 20) | (0x2 << 12) | 0x23
+        else:            # lw rd, 0(x0)
+            word = (0x2 << 12) | (rd << 7) | 0x03
+        words.append(format(word, '08x'))
+    return '\n'.join(words)
+
+
+def synthetic_assembly(length, seed=0):
+    """Assembly source of length instructions using mnemonics, ABI names, pseudo-instructions and labels.
+
+    A label starts every block of 16 instructions. Branches go to a
+    neighbouring block and jumps anywhere, so both assembler passes do real work.
+    """
+    names = ['ra', 'sp', 'gp', 'tp', 't0', 't1', 't2', 's0', 's1', 'a0', 'a1', 'a2', 'a3', 'a4', 'a5']
+    blocks = (length + 15) // 16
+    lines = []
+    for i in range(length):
+        rd = names[(i + seed) % 15]
+        rs1 = f'x{1 + (i * 7 + seed) % 15}'
+        rs2 = names[(i * 11 + seed) % 15]
+        block = i // 16
+        if i % 16 == 0:
+            lines.append(f'block{block}:')
+        kind = i % 8
+        if kind == 0:
+            lines.append(f'    addi {rd}, {rs1}, {i & 0x7ff}    # immediate')
+        elif kind == 1:
+            lines.append(f'    add {rd}, {rs1}, {rs2}')
+        elif kind == 2:
+            lines.append(f'    sw {rs2}, {4 * (i % 64)}({rs1})')
+        elif kind == 3:
+            lines.append(f'    lw {rd}, {4 * (i % 64)}({rs1})')
+        elif kind == 4:
+            lines.append(f'    li {rd}, {(i * 2654435761) & 0x7fffffff}')
+        elif kind == 5:
+            # The next block, or the previous one from the last
+            lines.append(f'    beq {rs1}, {rs2}, block{block + 1 if block + 1 < blocks else max(block - 1, 0)}')
+        elif kind == 6:
+            lines.append(f'    mv {rd}, {rs2}')
+        else:
+            lines.append(f'    jal ra, block{(block * 7 + seed) % blocks}')
+    return '\n'.join(lines)
+
+
+def format_text_trace(cycles):
+    """Render cycle dicts in the testbench's $display format"""
+    lines = []
+    for cycle in cycles:
+        pipeline = cycle['pipeline']
+        if_id, id_ex, ex_mem, mem_wb = (pipeline['if_id'], pipeline['id_ex'],
+                                        pipeline['ex_mem'], pipeline['mem_wb'])
+        registers = cycle['registers']
+        # The testbench reports at most one store per cycle
+        write = next(iter(cycle['memory_writes'].items()), None)
+        lines.append(f"CYCLE {cycle['cycle']}: PC=0x{cycle['pc']:08x}")
+        for base in range(0, 32, 4):
+            lines.append(' '.join(f"REG[{i}]=0x{registers[i]:08x}" for i in range(base, base + 4)))
+        lines.append(f"IF_ID_INSTR=0x{if_id['instruction']} IF_ID_PC=0x{if_id['pc']:08x}")
+        lines.append(f"ID_EX_INSTR=0x{id_ex['instruction']} ID_EX_PC=0x{id_ex['pc']:08x}")
+        lines.append(f"ID_EX_RS1=0x00 ID_EX_RS1_VAL=0x{id_ex['rs1_val']:08x}")
+        lines.append(f"ID_EX_RS2=0x00 ID_EX_RS2_VAL=0x{id_ex['rs2_val']:08x}")
+        lines.append("ID_EX_RD=0x00 ID_EX_IMM=0x00000000")
+        lines.append(f"EX_MEM_ALU=0x{ex_mem['alu_result']:08x} EX_MEM_PC=0x{ex_mem['pc']:08x}")
+        lines.append(f"EX_MEM_RD=0x{ex_mem['rd']:02x} EX_MEM_ZERO=0")
+        lines.append(f"MEM_WB_DATA=0x{mem_wb['result']:08x} MEM_WB_PC=0x{mem_wb['pc']:08x}")
+        lines.append(f"MEM_WB_RD=0x{mem_wb['rd']:02x}")
+        lines.append("CTRL_REGWRITE=1 CTRL_MEMREAD=0 CTRL_MEMWRITE=0")
+        lines.append("CTRL_BRANCH=0 CTRL_ALUSRC=1 CTRL_MEMTOREG=0")
+        if write:
+            lines.append(f"MEM_WRITE=1 MEM_ADDR=0x{write[0]:08x} MEM_DATA=0x{write[1]:08x}")
+        else:
+            lines.append("MEM_WRITE=0 MEM_ADDR=0x00000000 MEM_DATA=0x00000000")
+        counters = cycle['counters']
+        lines.append(f"PERF_RETIRED={counters['retired']} PERF_RAW_HAZARDS={counters['raw_hazards']} "
+                     f"PERF_STALLS={counters['stalls']} PERF_FORWARDS={counters['forwards']}")
+        lines.append(f"PERF_FLUSHES={counters['flushes']} PERF_TAKEN_BRANCHES={counters['taken_branches']} "
+                     f"PERF_LOADS={counters['loads']} PERF_STORES={counters['stores']}")
+        lines.append("----")
+    return '\n'.join(lines) + '\n'
+
+
+def format_packed_trace(cycles):
+    """Render cycle dicts as packed trace records (see trace.vh)"""
+    records = []
+    for cycle in cycles:
+        pipeline = cycle['pipeline']
+        if_id, id_ex, ex_mem, mem_wb = (pipeline['if_id'], pipeline['id_ex'],
+                                        pipeline['ex_mem'], pipeline['mem_wb'])
+        words = [cycle['cycle'], cycle['pc']] + cycle['registers'] + [
+            int(if_id['instruction'], 16), if_id['pc'],
+            int(id_ex['instruction'], 16), id_ex['pc'],
+            0, id_ex['rs1_val'], 0, id_ex['rs2_val'], 0, 0,
+            ex_mem['alu_result'], ex_mem['pc'], ex_mem['rd'], 0,
+            mem_wb['result'], mem_wb['pc'], mem_wb['rd'], 0x11
+        ] + ([1, *next(iter(cycle['memory_writes'].items()))] if cycle['memory_writes'] else [0, 0, 0]) + [
+            cycle['counters'][name] for name in PERF_COUNTERS
+        ]
+        records.append(''.join(format(word, '08x') for word in words))
+    return '\n'.join(records) + '\n'
+
+
+def store_packed_trace(text):
+    """Decode a packed trace into an unpublished run, as /simulate does"""
+    run = app.run_store.create()
+    run.extend_records(app.decode_packed_trace(text))
+    return run
+
+
+def trace_cycles(length):
+    sim = RISCVSimulator()
+    sim.load_instructions(synthetic_program(60))
+    return list(sim.run(length))
+
+
+def bench_process_instructions(results, quick):
+    # assemble() memoizes by source text, so clear it to time the assembler itself
+    def uncached(*sources):
+        def run():
+            assembler.assemble.cache_clear()
+            for source in sources:
+                app.process_instructions(source)
+        return run
+
+    sources = [open(path).read() for path in EXAMPLES]
+    seconds = best_of(uncached(*sources), number=20)
+    results['process_instructions.examples'] = metric(seconds * 1000, 'ms', 'lower')
+
+    length = 2000 if quick else 20000
+    seconds = best_of(uncached(synthetic_program(length)), repeat=3)
+    results['process_instructions.large'] = metric(seconds * 1000, 'ms', 'lower')
+
+    seconds = best_of(uncached(synthetic_assembly(length)), repeat=3)
+    results['process_instructions.assembly'] = metric(seconds * 1000, 'ms', 'lower')
+
+    # A resubmitted program is answered from the memo
+    large = synthetic_program(length)
+    app.process_instructions(large)
+    seconds = best_of(lambda: app.process_instructions(large), number=100)
+    results['process_instructions.cached'] = metric(seconds * 1e6, 'us', 'lower')
+
+
+def bench_parsers(results, quick):
+    lengths = (100, 1000, 10000) if quick else (100, 1000, 10000, 100000)
+    for length in lengths:
+        cycles = trace_cycles(length)
+        text = format_text_trace(cycles)
+        packed = format_packed_trace(cycles)
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write(text)
+            path = f.name
+        try:
+            repeat = 3 if length <= 10000 else 1
+            seconds = best_of(lambda: app.parse_simulation_output(path), repeat=repeat)
+            results[f'parse_text.{length}'] = metric(length / seconds, 'cycles/s', 'higher')
+            seconds = best_of(lambda: store_packed_trace(packed), repeat=repeat)
+            results[f'parse_packed.{length}'] = metric(length / seconds, 'cycles/s', 'higher')
+        finally:
+            os.remove(path)
+
+
+def bench_python_engine(results, quick):
+    program = synthetic_program(60)
+    length = 20000 if quick else 200000
+
+    def traced():
+        sim = RISCVSimulator()
+        sim.load_instructions(program)
+        for _ in sim.run(length):
+            pass
+
+    def records():
+        app.fallback_python_simulation(program, length)
+
+    def untraced():
+        sim = RISCVSimulator()
+        sim.load_instructions(program)
+        sim.run_untraced(length)
+
+    results['python_engine.traced'] = metric(length / best_of(traced, repeat=3), 'cycles/s', 'higher')
+    results['python_engine.records'] = metric(length / best_of(records, repeat=3), 'cycles/s', 'higher')
+    results['python_engine.untraced'] = metric(length / best_of(untraced, repeat=3), 'cycles/s', 'higher')
+
+    # The example programs end in NOPs, so loop over the synthetic one
+    words = parse_program(program)
+    words[60] = 0xf11ff06f  # jal x0, -240: back to the start
+
+    def functional():
+        FunctionalSimulator(words, [0] * 32, [0] * 64).run(max_instructions=length)
+
+    results['functional.run'] = metric(length / best_of(functional, repeat=3), 'instructions/s', 'higher')
+
+
+def bench_vector_engine(results, quick):
+    """Aggregate throughput of the NumPy engine over many looping programs"""
+    import vector_simulator
+    if vector_simulator.np is None:
+        print("Skipping vector engine benchmarks: NumPy not installed")
+        return
+
+    programs = []
+    for seed in range(64):
+        words = parse_program(synthetic_program(60, seed))
+        words[60] = 0xf11ff06f  # jal x0, -240: back to the start
+        programs.append(words)
+    count = 1024 if quick else 4096
+    steps = 200 if quick else 1000
+
+    def vectorized():
+        vector_simulator.VectorSimulator(programs * (count // len(programs))).run(steps)
+
+    results['vector.run'] = metric(count * steps / best_of(vectorized, repeat=3), 'instructions/s', 'higher')
+
+
+def bench_verilog(results, quick):
+    """Compile, spawn, simulate and parse phases of a batch vvp run"""
+    if app.probe_verilog_tools() is None:
+        print("Skipping Verilog benchmarks: iverilog/vvp not found")
+        return
+
+    sources = app.VERILOG_MODELS['batch']
+    with tempfile.TemporaryDirectory() as build_dir:
+        model_path = os.path.join(build_dir, 'bench.vvp')
+        started = time.perf_counter()
+        app._compile_model(sources, model_path)
+        results['verilog.compile'] = metric((time.perf_counter() - started) * 1000, 'ms', 'lower')
+
+        program = synthetic_program(60)
+        length = 2000 if quick else 20000
+
+        def collect(cycles):
+            with app.simulation_workspace(program) as (workspace, instructions_path):
+                run = app.VerilogRun(model_path, workspace, instructions_path, cycles)
+                return run, ''.join(app.iter_vvp_lines(run))
+
+        spawn = best_of(lambda: collect(1), repeat=3)
+        results['verilog.spawn'] = metric(spawn * 1000, 'ms', 'lower')
+
+        simulate = best_of(lambda: collect(length), repeat=3)
+        results['verilog.simulate'] = metric(length / max(simulate - spawn, 1e-9), 'cycles/s', 'higher')
+
+        run, output = collect(length)
+        if run.packed:
+            parse = best_of(lambda: store_packed_trace(output), repeat=3)
+        else:
+            parse = best_of(lambda: app.parse_simulation_lines(output.splitlines(True)), repeat=3)
+        results['verilog.parse'] = metric(length / parse, 'cycles/s', 'higher')
+
+
+def bench_flask(results, quick):
+    """Latency of uncached /simulate requests at several concurrency levels"""
+    counter = iter(range(1 << 30))
+    counter_lock = threading.Lock()
+    base = open(EXAMPLES[0]).read() if EXAMPLES else synthetic_program(10)
+
+    def request_once():
+        # A distinct program per request keeps the result cache out of the measurement
+        with counter_lock:
+            n = next(counter)
+        instructions = base + '\n' + format(((n & 0x7ff) << 20) | (n >> 11 & 0x1f) << 7 | 0x13, '08x')
+        client = app.app.test_client()
+        started = time.perf_counter()
+        response = client.post('/simulate', json={'instructions': instructions, 'cycles': 200})
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200 or not response.get_json().get('success'):
+            raise RuntimeError(f"/simulate failed: {response.status_code} {response.get_data(as_text=True)[:200]}")
+        return elapsed
+
+    requests_per_level = 16 if quick else 64
+    for concurrency in (1, 4, 16):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            started = time.perf_counter()
+            latencies = sorted(pool.map(lambda _: request_once(), range(requests_per_level)))
+            wall = time.perf_counter() - started
+        results[f'flask.c{concurrency}.p50'] = metric(statistics.median(latencies) * 1000, 'ms', 'lower')
+        results[f'flask.c{concurrency}.p95'] = metric(latencies[int(len(latencies) * 0.95) - 1] * 1000, 'ms', 'lower')
+        results[f'flask.c{concurrency}.throughput'] = metric(requests_per_level / wall, 'requests/s', 'higher')
+
+
+BENCHMARKS = {
+    'process_instructions': bench_process_instructions,
+    'parsers': bench_parsers,
+    'python_engine': bench_python_engine,
+    'vector_engine': bench_vector_engine,
+    'verilog': bench_verilog,
+    'flask': bench_flask,
+}
+
+
+def metric(value, unit, better):
+    return {'value': round(value, 4), 'unit': unit, 'better': better}
+
+
+def compare(results, baseline, threshold):
+    """Names of metrics that are worse than the baseline by more than threshold"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None or not previous['value']:
+            continue
+        ratio = current['value'] / previous['value']
+        worse = ratio < 1 - threshold if current['better'] == 'higher' else ratio > 1 + threshold
+        flag = '  REGRESSION' if worse else ''
+        print(f"  {name:32} {previous['value']:>14.2f} -> {current['value']:>14.2f} {current['unit']:15} {ratio:6.2f}x{flag}")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulator hot paths")
+    parser.add_argument('--only', action='append', choices=sorted(BENCHMARKS), help="run only these groups")
+    parser.add_argument('--quick', action='store_true', help="smaller inputs for a fast smoke run")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="where to write the JSON results")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="baseline to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed slowdown before failing (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        print(f"Running {name} benchmarks...")
+        BENCHMARKS[name](results, args.quick)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'iverilog': app.probe_verilog_tools(),
+            'trace_format': app.SIM_TRACE_FORMAT,
+            'quick': args.quick
+        },
+        'results': results
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        for name, result in results.items():
+            print(f"  {name:32} {result['value']:>14.2f} {result['unit']}")
+        print("No baseline to compare against; run with --save-baseline to record one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline['meta'].get('quick') != args.quick:
+        print("Warning: baseline and this run use different --quick settings")
+    print(f"Comparing against {args.baseline} ({baseline['meta']['timestamp']}):")
+    regressions = compare(results, baseline['results'], args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    print("No regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
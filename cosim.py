@@ -0,0 +1,269 @@
+"""Lockstep differential co-simulation of the Verilog and Python engines.
+
+Both engines run the same program side by side: the vvp trace is read one
+cycle at a time while the Python pipeline model steps alongside it, and the
+first cycle where they disagree ends both runs with a compact diff report.
+
+'pipeline' mode compares every traced field: PC, registers, data memory,
+pipeline latches, control signals and performance counters. 'architectural'
+mode compares only the PC, registers and data memory, skipping the
+per-cycle snapshots of the Python model, and suits large batches. The
+Python side gets the RTL's data memory depth, SIM_DMEM_WORDS, so addresses
+wrap the same way on both.
+
+    python cosim.py examples/*.hex --cycles 200 --mode architectural
+"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from app import (SIM_CYCLES, SIM_DMEM_WORDS, get_simulation_model, iter_verilog_cycles, iter_verilog_lines,
+                 parse_run_options, process_instructions, verilog_run)
+from batch import SIM_BATCH_WORKERS, _worker_init
+from riscv_simulator import RISCVSimulator
+from trace_format import RECORD_REGISTERS, TRACE_RECORD_FIELDS, decode_packed_line, record_writes
+
+COSIM_MODES = ('pipeline', 'architectural')
+# Differences listed per report; the rest are only counted
+MAX_DIFFERENCES = 20
+
+_PC = TRACE_RECORD_FIELDS.index('pc')
+
+
+class CosimUnavailableError(Exception):
+    """Raised when the Verilog engine cannot run, so there is nothing to compare"""
+
+
+def python_states(sim, cycles, mode):
+    """Cycles of the Python model; architectural mode skips full snapshots"""
+    if mode == 'pipeline':
+        yield from sim.run(cycles)
+        return
+    for cycle in range(1, cycles + 1):
+        yield {
+            'cycle': sim.cycle_offset + cycle,
+            'pc': sim.pc,
+            'registers': sim.registers[:],
+            'memory_writes': sim.memory.take_dirty()
+        }
+        sim.step(cycle)
+
+
+def verilog_states(run, mode):
+    """Cycles of a vvp run; architectural mode reads only those fields of packed records"""
+    if mode == 'pipeline' or not run.packed:
+        yield from iter_verilog_cycles(run)
+        return
+    first = True
+    for line in iter_verilog_lines(run):
+        # Shared with the other packed readers, so x/z words decode as zero
+        record = decode_packed_line(line)
+        if record is None:
+            continue
+        writes = dict(record_writes(record))
+        if first:
+            writes = {**run.initial_memory, **writes}
+            first = False
+        yield {
+            'cycle': record[0],
+            'pc': record[_PC],
+            'registers': list(record[RECORD_REGISTERS:RECORD_REGISTERS + 32]),
+            'memory_writes': writes
+        }
+
+
+def _flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f'{prefix}.{key}' if prefix else key, item, out)
+    elif isinstance(value, str):
+        # Instruction words are hex strings; only their value matters
+        out[prefix] = value.lower()
+    else:
+        out[prefix] = value
+
+
+def diff_cycle(verilog, python, mode, memory):
+    """Differences between two cycle dicts as {'field', 'verilog', 'python'} entries.
+
+    memory is a pair of running {address: value} images, updated here with
+    each side's writes. Memory is compared by effect rather than by the
+    writes reported, since an engine may omit a store that changes nothing.
+    """
+    differences = []
+
+    def differ(field, left, right):
+        if left != right:
+            differences.append({'field': field, 'verilog': left, 'python': right})
+
+    differ('cycle', verilog.get('cycle'), python.get('cycle'))
+    differ('pc', verilog.get('pc'), python.get('pc'))
+    for index, (left, right) in enumerate(zip(verilog['registers'], python['registers'])):
+        differ(f'x{index}', left, right)
+
+    touched = set()
+    for image, cycle in zip(memory, (verilog, python)):
+        for address, value in cycle.get('memory_writes', {}).items():
+            address = int(address)
+            touched.add(address)
+            if value:
+                image[address] = value
+            else:
+                image.pop(address, None)
+    for address in sorted(touched):
+        differ(f'memory[{address}]', memory[0].get(address, 0), memory[1].get(address, 0))
+
+    if mode == 'pipeline':
+        flat_verilog, flat_python = {}, {}
+        _flatten('pipeline', verilog.get('pipeline', {}), flat_verilog)
+        _flatten('pipeline', python.get('pipeline', {}), flat_python)
+        _flatten('control_signals', verilog.get('control_signals', {}), flat_verilog)
+        _flatten('control_signals', python.get('control_signals', {}), flat_python)
+        _flatten('counters', verilog.get('counters', {}), flat_verilog)
+        _flatten('counters', python.get('counters', {}), flat_python)
+        for field in sorted(flat_verilog.keys() | flat_python.keys()):
+            differ(field, flat_verilog.get(field), flat_python.get(field))
+    return differences
+
+
+def compare_traces(verilog_cycles, python_cycles, mode='pipeline'):
+    """Step two cycle iterables in lockstep until they diverge or both end.
+
+    Returns a report with the number of matching cycles and, at the first
+    divergence, its position, the differing fields and the instructions in
+    flight on the Verilog side.
+    """
+    if mode not in COSIM_MODES:
+        raise ValueError(f"mode must be one of {', '.join(COSIM_MODES)}")
+    memory = ({}, {})
+    compared = 0
+    divergence = None
+    verilog_iter, python_iter = iter(verilog_cycles), iter(python_cycles)
+    while True:
+        verilog = next(verilog_iter, None)
+        python = next(python_iter, None)
+        if verilog is None and python is None:
+            break
+        if verilog is None or python is None:
+            divergence = {
+                'position': compared,
+                'differences': [{'field': 'trace_length',
+                                 'verilog': compared + (verilog is not None),
+                                 'python': compared + (python is not None)}]
+            }
+            break
+        differences = diff_cycle(verilog, python, mode, memory)
+        if differences:
+            divergence = {
+                'position': compared,
+                'cycle': verilog.get('cycle'),
+                'differences': differences[:MAX_DIFFERENCES],
+                'total_differences': len(differences)
+            }
+            pipeline = verilog.get('pipeline')
+            if pipeline:
+                divergence['in_flight'] = {stage: latch.get('instruction') for stage, latch in pipeline.items()
+                                           if 'instruction' in latch}
+            break
+        compared += 1
+    return {
+        'mode': mode,
+        'match': divergence is None,
+        'cycles_compared': compared,
+        'first_divergence': divergence
+    }
+
+
+def cosimulate(hex_instructions, cycles=SIM_CYCLES, fast_forward=None, mode='pipeline'):
+    """Run both engines on one assembled program and compare them cycle by cycle"""
+    if mode not in COSIM_MODES:
+        raise ValueError(f"mode must be one of {', '.join(COSIM_MODES)}")
+    model_path = get_simulation_model()
+    if model_path is None:
+        raise CosimUnavailableError("Verilog simulation is unavailable, so there is nothing to compare against")
+
+    sim = RISCVSimulator(SIM_DMEM_WORDS)
+    sim.load_instructions(hex_instructions)
+    if fast_forward:
+        sim.fast_forward(**fast_forward)
+
+    run_info = {}
+    with verilog_run(model_path, hex_instructions, cycles, fast_forward, run_info) as run:
+        verilog_cycles = verilog_states(run, mode)
+        try:
+            # Stopping early closes the trace, which ends the vvp run
+            report = compare_traces(verilog_cycles, python_states(sim, cycles, mode), mode)
+        finally:
+            verilog_cycles.close()
+    if 'fast_forward' in run_info:
+        report['fast_forward'] = run_info['fast_forward']
+    return report
+
+
+def cosimulate_program(name, instructions, cycles=SIM_CYCLES, mode='architectural'):
+    """Co-simulate one source program, reporting errors instead of raising"""
+    started = time.perf_counter()
+    report = {'name': name, 'success': False}
+    try:
+        report.update(cosimulate(process_instructions(instructions), cycles, None, mode))
+        report['success'] = True
+    except Exception as e:
+        report['error'] = str(e)
+    report['seconds'] = round(time.perf_counter() - started, 4)
+    return report
+
+
+def parse_cosim_request(data):
+    """Cycle budget, fast-forward limits and mode of a /cosim request"""
+    cycles, fast_forward = parse_run_options(data)
+    mode = data.get('mode', 'pipeline')
+    if mode not in COSIM_MODES:
+        raise ValueError(f"mode must be one of {', '.join(COSIM_MODES)}")
+    return cycles, fast_forward, mode
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the Verilog and Python engines cycle by cycle")
+    parser.add_argument('files', nargs='+', help="program files (hex or assembly)")
+    parser.add_argument('--cycles', type=int, default=SIM_CYCLES, help="cycles to compare per program")
+    parser.add_argument('--mode', choices=COSIM_MODES, default='architectural')
+    parser.add_argument('--workers', type=int, default=SIM_BATCH_WORKERS, help="worker processes")
+    parser.add_argument('--json', action='store_true', help="print NDJSON reports instead of a table")
+    args = parser.parse_args(argv)
+
+    programs = []
+    for path in args.files:
+        with open(path) as f:
+            programs.append((path, f.read()))
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_worker_init) as executor:
+        futures = [executor.submit(cosimulate_program, name, instructions, args.cycles, args.mode)
+                   for name, instructions in programs]
+        for future in as_completed(futures):
+            report = future.result()
+            if not (report['success'] and report['match']):
+                failed += 1
+            if args.json:
+                print(json.dumps(report), flush=True)
+            elif not report['success']:
+                print(f"{report['name']}: ERROR {report['error']}", flush=True)
+            elif report['match']:
+                print(f"{report['name']}: match over {report['cycles_compared']} cycles", flush=True)
+            else:
+                divergence = report['first_divergence']
+                print(f"{report['name']}: DIVERGED at cycle {divergence.get('cycle')} "
+                      f"(after {report['cycles_compared']} matching cycles)", flush=True)
+                for difference in divergence['differences']:
+                    print(f"  {difference['field']}: verilog={difference['verilog']} "
+                          f"python={difference['python']}", flush=True)
+    if not args.json:
+        print(f"\n{len(programs) - failed}/{len(programs)} programs matched")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""Background simulation jobs, so long runs do not hold a request open.
+
+Submitting a job returns its ID at once; a small pool of threads in the
+server process runs it, and clients poll /jobs/<id> or subscribe to its
+progress events. Each job has a wall-clock limit, checked between cycles,
+and can be cancelled while queued or running. Stopping a run closes its
+trace, which kills the vvp process behind it. The finished trace goes
+to the run store like any other result, so /runs/<run_id>/cycles serves it.
+
+The queue holds at most SIM_JOB_MAX_QUEUE jobs that have not started;
+further submissions are rejected with SimulatorBusyError. Jobs live in the
+server process, so multi-worker deployments need sticky sessions.
+"""
+
+import atexit
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from app import (SIM_MAX_WORKERS, SIM_QUEUE_TIMEOUT, SimulationStopped, SimulatorBusyError,
+                 VerilogTimeoutError, get_run, result_cache_key, run_performance, run_store,
+                 simulation_backend, store_result, stream_riscv_records)
+
+# Leave some simulator slots free for interactive requests by default
+SIM_JOB_WORKERS = int(os.environ.get('SIM_JOB_WORKERS', max(1, SIM_MAX_WORKERS // 2)))
+SIM_JOB_MAX_QUEUE = int(os.environ.get('SIM_JOB_MAX_QUEUE', 64))
+SIM_JOB_TIMEOUT = float(os.environ.get('SIM_JOB_TIMEOUT', 300))
+SIM_JOB_MAX_TIMEOUT = float(os.environ.get('SIM_JOB_MAX_TIMEOUT', 3600))
+# Finished jobs are forgotten after this many seconds, oldest first beyond SIM_JOB_MAX_JOBS
+SIM_JOB_TTL = float(os.environ.get('SIM_JOB_TTL', 3600))
+SIM_JOB_MAX_JOBS = int(os.environ.get('SIM_JOB_MAX_JOBS', 1000))
+
+JOB_STATES = ('queued', 'running', 'done', 'failed', 'cancelled', 'timed_out')
+FINISHED_STATES = ('done', 'failed', 'cancelled', 'timed_out')
+# Subscribers are woken at most once per this many cycles
+PROGRESS_INTERVAL = 256
+
+jobs_finished = metrics.Counter('sim_jobs_total', "Background jobs by final state", ('state',))
+
+
+class JobStopped(SimulationStopped):
+    """Raised inside a running job when it is cancelled or out of time"""
+
+    def __init__(self, state, message):
+        super().__init__(message)
+        self.state = state
+
+
+class Job:
+    """One background simulation and its progress"""
+
+    def __init__(self, job_id, hex_instructions, cycles, fast_forward, timeout):
+        self.job_id = job_id
+        self.hex_instructions = hex_instructions
+        self.cycles = cycles
+        self.fast_forward = fast_forward
+        self.timeout = timeout
+        self.state = 'queued'
+        self.cycles_done = 0
+        self.run_id = None
+        self.run_info = {}
+        self.counters = None
+        self.error = None
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+        self.future = None
+        self.version = 0
+        self._cancel = threading.Event()
+        self._changed = threading.Condition()
+
+    @property
+    def is_finished(self):
+        return self.state in FINISHED_STATES
+
+    def notify(self, **changes):
+        """Apply changes and wake anyone waiting on this job"""
+        with self._changed:
+            for name, value in changes.items():
+                setattr(self, name, value)
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait(self, version, timeout):
+        """Block until the job changes past version or timeout expires; returns the new version"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def check(self):
+        """Raise JobStopped if the job was cancelled or has run out of time"""
+        if self._cancel.is_set():
+            raise JobStopped('cancelled', "Job was cancelled")
+        if time.monotonic() - self.started > self.timeout:
+            raise JobStopped('timed_out', f"Job exceeded its {self.timeout:g}s time limit")
+
+    def info(self):
+        now = time.monotonic()
+        info = {
+            'job_id': self.job_id,
+            'state': self.state,
+            'progress': {'cycles': self.cycles_done, 'total_cycles': self.cycles},
+            'timeout': self.timeout,
+            'queued_seconds': round((self.started or self.finished or now) - self.submitted, 3)
+        }
+        if self.started is not None:
+            info['run_seconds'] = round((self.finished or now) - self.started, 3)
+        if self.run_info.get('backend'):
+            info['backend'] = self.run_info['backend']
+        if 'fast_forward' in self.run_info:
+            info['fast_forward'] = self.run_info['fast_forward']
+        if self.run_id is not None:
+            info['run_id'] = self.run_id
+            info['counters'] = self.counters
+        if self.error is not None:
+            info['error'] = self.error
+        return info
+
+
+class JobQueue:
+    """Bounded queue of background jobs run on a thread pool"""
+
+    def __init__(self, workers=SIM_JOB_WORKERS, max_queue=SIM_JOB_MAX_QUEUE,
+                 ttl=SIM_JOB_TTL, max_jobs=SIM_JOB_MAX_JOBS):
+        self.max_queue = max_queue
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sim-job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def counts(self):
+        """Number of jobs in each state"""
+        with self._lock:
+            counts = dict.fromkeys(JOB_STATES, 0)
+            for job in self._jobs.values():
+                counts[job.state] += 1
+            return counts
+
+    def submit(self, hex_instructions, cycles, fast_forward=None, timeout=None):
+        timeout = SIM_JOB_TIMEOUT if timeout is None else float(timeout)
+        if not 0 < timeout <= SIM_JOB_MAX_TIMEOUT:
+            raise ValueError(f"timeout must be between 0 and {SIM_JOB_MAX_TIMEOUT:g} seconds")
+        job = Job(secrets.token_hex(8), hex_instructions, cycles, fast_forward, timeout)
+        with self._lock:
+            self._evict()
+            queued = sum(1 for queued_job in self._jobs.values() if queued_job.state == 'queued')
+            if queued >= self.max_queue:
+                metrics.busy_rejections.inc(reason='job_queue_full')
+                raise SimulatorBusyError("Job queue is full, please retry shortly")
+            self._jobs[job.job_id] = job
+            job.future = self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._evict()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a job; returns it, or None if it is unknown"""
+        job = self.get(job_id)
+        if job is None or job.is_finished:
+            return job
+        job._cancel.set()
+        if job.future.cancel():
+            # Never started, so no worker will record the outcome
+            self._finish(job, 'cancelled', "Job was cancelled")
+        return job
+
+    def shutdown(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job._cancel.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.is_finished and now - job.finished > self.ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[job_id]
+
+    def _finish(self, job, state, error=None):
+        jobs_finished.inc(state=state)
+        job.notify(state=state, error=error, finished=time.monotonic())
+
+    def _run(self, job):
+        if job._cancel.is_set():
+            self._finish(job, 'cancelled', "Job was cancelled")
+            return
+        job.notify(state='running', started=time.monotonic())
+        try:
+            backend = simulation_backend()
+            key = result_cache_key(job.hex_instructions, job.cycles, job.fast_forward, backend)
+            run = get_run(key)
+            if run is not None:
+                job.run_info = dict(run.metadata, backend='cache')
+            else:
+                trace = self._simulate(job)
+                run = store_result(key, backend, trace, job.run_info)
+            metrics.simulations.inc(endpoint='jobs', backend=job.run_info.get('backend'))
+            job.notify(run_id=run.run_id, counters=run_performance(run), cycles_done=len(run))
+            self._finish(job, 'done')
+        except JobStopped as e:
+            self._finish(job, e.state, str(e))
+        except Exception as e:
+            self._finish(job, 'failed', str(e))
+
+    def _simulate(self, job):
+        """Trace the job's program, checking for cancellation while fast-forwarding and between cycles"""
+        while True:
+            try:
+                # The job's own limit replaces SIM_RUN_TIMEOUT for its vvp run
+                remaining = job.timeout - (time.monotonic() - job.started)
+                records = stream_riscv_records(job.hex_instructions, job.cycles, job.fast_forward,
+                                               job.run_info, remaining, job.check)
+                trace = run_store.create()
+                try:
+                    for record, writes in records:
+                        trace.append_record(record, writes)
+                        job.cycles_done = len(trace)
+                        if job.cycles_done % PROGRESS_INTERVAL == 0:
+                            job.check()
+                            job.notify()
+                except VerilogTimeoutError as e:
+                    # The vvp watchdog ran out the job's remaining time
+                    raise JobStopped('timed_out', f"Job exceeded its {job.timeout:g}s time limit") from e
+                finally:
+                    # Stops the vvp process if the job ends early
+                    records.close()
+                return trace
+            except SimulatorBusyError:
+                # Interactive requests got the slots first; wait our turn.
+                # No slot means nothing ran, fast-forwarding included.
+                job.run_info.clear()
+                job.check()
+                time.sleep(min(1.0, SIM_QUEUE_TIMEOUT))
+
+
+job_queue = JobQueue()
+atexit.register(job_queue.shutdown)
+
+metrics.Sampled('sim_jobs_queued', "Background jobs waiting to start", lambda: job_queue.counts()['queued'])
+metrics.Sampled('sim_jobs_running', "Background jobs running", lambda: job_queue.counts()['running'])
@@ -0,0 +1,199 @@
+"""In-process metrics for the simulation server, in Prometheus text format.
+
+Counters and histograms are kept per label set and rendered by /metrics.
+Request phases are timed with the phase() context manager; the timings of
+the request being handled on the current thread are also collected for
+its Server-Timing header. Metrics live in the server process, so each
+worker reports its own and the scraper aggregates them.
+
+Profiling is opt-in per request: start_profile() runs cProfile until
+save_profile() writes its stats to a directory for pstats or snakeviz.
+"""
+
+import cProfile
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from memoized assembly to long vvp runs
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_registry = []
+_registry_lock = threading.Lock()
+_local = threading.local()
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    escaped = ((name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for name, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named family of samples, one per label set"""
+    kind = 'untyped'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+    def samples(self):
+        """(suffix, label values, extra labels, value) tuples"""
+        with self._lock:
+            return [('', key, (), value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for suffix, key, extra, value in self.samples():
+            labels = _format_labels(list(zip(self.labels, key)) + list(extra))
+            lines.append(f'{self.name}{suffix}{labels} {_format_value(value)}')
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    """Cumulative bucket counts, sum and count of observed values"""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    samples.append(('_bucket', key, (('le', _format_value(bound)),), cumulative))
+                samples.append(('_sum', key, (), total))
+                samples.append(('_count', key, (), count))
+        return samples
+
+
+class Sampled(Metric):
+    """Value read from a callback at scrape time, such as a queue length"""
+
+    def __init__(self, name, help_text, read, kind='gauge'):
+        super().__init__(name, help_text)
+        self.read = read
+        self.kind = kind
+
+    def samples(self):
+        return [('', (), (), self.read())]
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+http_requests = Counter('sim_http_requests_total', "HTTP requests by endpoint and status",
+                        ('endpoint', 'status'))
+request_seconds = Histogram('sim_request_seconds',
+                            "Time to build each response (to the first byte for streams)",
+                            ('endpoint',))
+phase_seconds = Histogram('sim_phase_seconds', "Time spent in each phase of a simulation",
+                          ('phase',))
+simulations = Counter('sim_simulations_total', "Simulations served, by endpoint and backend",
+                      ('endpoint', 'backend'))
+fallbacks = Counter('sim_fallbacks_total', "Runs that fell back to the Python engine, by reason",
+                    ('reason',))
+busy_rejections = Counter('sim_busy_rejections_total', "Requests shed because no simulator was free",
+                          ('reason',))
+
+
+def begin_request():
+    """Start collecting phase timings for the request on this thread"""
+    _local.timings = []
+
+
+def end_request():
+    """Stop collecting and return this request's (phase, seconds) timings"""
+    timings = getattr(_local, 'timings', None) or []
+    _local.timings = None
+    return timings
+
+
+@contextmanager
+def phase(name):
+    """Time the block as one phase of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        phase_seconds.observe(elapsed, phase=name)
+        timings = getattr(_local, 'timings', None)
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def server_timing(timings):
+    """Server-Timing header value for a request's phase timings"""
+    return ', '.join(f'{name};dur={elapsed * 1000:.2f}' for name, elapsed in timings)
+
+
+def start_profile():
+    """Profile the current thread, or return None if a profiler is already active"""
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return None
+    return profiler
+
+
+def save_profile(profiler, directory, label):
+    """Stop profiling and write the stats; returns the file name"""
+    profiler.disable()
+    os.makedirs(directory, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{os.getpid()}-{threading.get_ident()}.prof"
+    profiler.dump_stats(os.path.join(directory, name))
+    return name
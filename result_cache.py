@@ -0,0 +1,100 @@
+"""Content-addressed cache of finished simulation results.
+
+Entries are opaque byte strings keyed by a hex digest. The in-memory tier is
+an LRU bounded by the total size of its values; the optional disk tier
+stores one file per key under a directory that several worker processes
+can share. Files are written to a temporary name and renamed into place,
+so readers never see a partial entry.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+_KEY_PATTERN = re.compile(r'[0-9a-f]{8,64}')
+
+
+def cache_key(*parts):
+    """Stable digest of the given strings"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()[:32]
+
+
+class ResultCache:
+    """Two-tier (memory LRU, optional disk) byte cache"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+        self._write_disk(key, value)
+
+    def _remember(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = value
+        self._size += len(value)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def _read_disk(self, key):
+        # Keys may come from URLs; never let one name a path outside the cache
+        if not self.disk_dir or not _KEY_PATTERN.fullmatch(key):
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write result cache entry {key}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,760 @@
+"""Python model of the 5-stage RISC-V pipeline, used when Verilog is unavailable.
+
+Instruction memory is decoded once into DecodedInstruction records and ALU
+operations are resolved through dispatch tables at decode time, so the
+per-cycle loop only moves values between slot-based pipeline latches.
+The pipeline follows processor.v rather than the full ISA, limits included:
+a subset of ALU operations, branches resolved in MEM without a flush, and a
+register file without write-through.
+
+FunctionalSimulator is a plain RV32I interpreter with no pipeline timing.
+It fast-forwards through long program prefixes before the detailed model
+takes over.
+
+Data memory is a sparse PagedMemory covering the whole 32-bit address
+space by default. Cycle snapshots report only the words written since the previous
+snapshot, so their cost does not grow with the amount of data a program uses.
+
+Both engines keep the same performance counters (PERF_COUNTERS), updated at
+each clock edge and reported cumulatively with every cycle. This pipeline
+has no hazard unit, so stalls, forwards and flushes stay at zero; RAW
+hazards count the operands that are read before their producer writes back.
+"""
+
+NOP = 0x00000013
+MASK32 = 0xFFFFFFFF
+
+OPCODE_R_TYPE = 0x33
+OPCODE_I_TYPE = 0x13
+OPCODE_LOAD = 0x03
+OPCODE_STORE = 0x23
+OPCODE_BRANCH = 0x63
+OPCODE_LUI = 0x37
+OPCODE_AUIPC = 0x17
+OPCODE_JAL = 0x6F
+OPCODE_JALR = 0x67
+OPCODE_FENCE = 0x0F
+OPCODE_SYSTEM = 0x73
+
+INSTRUCTION_MEMORY_WORDS = 64
+# Word-addressed data memory spans every word of a 32-bit byte address space
+ADDRESS_SPACE_WORDS = 1 << 30
+PAGE_SHIFT = 10
+PAGE_WORDS = 1 << PAGE_SHIFT
+PAGE_MASK = PAGE_WORDS - 1
+# Data memory words preloaded at reset, as Data_Memory does in the RTL
+INITIAL_MEMORY = {10: 123}
+# Instructions FunctionalSimulator runs between calls to its check callback
+CHECK_INTERVAL = 65536
+
+# Performance counters, in the order of the RTL's Performance_Counters
+# outputs and the packed trace record
+PERF_COUNTERS = ('retired', 'raw_hazards', 'stalls', 'forwards', 'flushes',
+                 'taken_branches', 'loads', 'stores')
+# Opcodes that read rs1, read rs2 and write rd
+READS_RS1 = (OPCODE_R_TYPE, OPCODE_I_TYPE, OPCODE_LOAD, OPCODE_STORE, OPCODE_BRANCH, OPCODE_JALR)
+READS_RS2 = (OPCODE_R_TYPE, OPCODE_STORE, OPCODE_BRANCH)
+# (the pipeline writes rd only where main_control_unit sets reg_write)
+WRITES_RD = (OPCODE_R_TYPE, OPCODE_I_TYPE, OPCODE_LOAD)
+
+# Control signals decoded from the IF/ID instruction, as main_control_unit
+# in processor.v sets them (all zero for other opcodes)
+CONTROL_SIGNAL_NAMES = ('regwrite', 'memread', 'memwrite', 'branch', 'alusrc', 'memtoreg')
+CONTROL_SIGNALS = {
+    OPCODE_R_TYPE: ('regwrite',),
+    OPCODE_I_TYPE: ('regwrite', 'alusrc'),
+    OPCODE_LOAD: ('regwrite', 'memread', 'alusrc', 'memtoreg'),
+    OPCODE_STORE: ('memwrite', 'alusrc'),
+    OPCODE_BRANCH: ('branch',),
+}
+
+
+def _alu_add(op1, op2):
+    return (op1 + op2) & MASK32
+
+def _alu_sub(op1, op2):
+    return (op1 - op2) & MASK32
+
+def _alu_and(op1, op2):
+    return op1 & op2
+
+def _alu_or(op1, op2):
+    return op1 | op2
+
+def _alu_xor(op1, op2):
+    return op1 ^ op2
+
+def _alu_sll(op1, op2):
+    return (op1 << (op2 & 0x1F)) & MASK32
+
+def _alu_zero(op1, op2):
+    return 0
+
+
+# ALU operations as ALU_Control in processor.v decodes them: R-type by
+# (funct7, funct3), I-type by funct3 alone. Anything else leaves the ALU at
+# its default of zero.
+R_TYPE_ALU = {(0x00, 0): _alu_add, (0x20, 0): _alu_sub, (0x00, 7): _alu_and,
+              (0x00, 6): _alu_or, (0x00, 4): _alu_xor, (0x00, 1): _alu_sll}
+I_TYPE_ALU = {0: _alu_add, 7: _alu_and, 6: _alu_or, 4: _alu_xor, 1: _alu_sll}
+
+
+def alu_operation(opcode, funct3, funct7):
+    """Resolve the ALU function for an instruction, once, at decode time.
+
+    Follows the ALUOp main_control_unit sets: R-type and I-type decode
+    their function fields, branches subtract and every other opcode adds.
+    """
+    if opcode == OPCODE_R_TYPE:
+        return R_TYPE_ALU.get((funct7, funct3), _alu_zero)
+    if opcode == OPCODE_I_TYPE:
+        return I_TYPE_ALU.get(funct3, _alu_zero)
+    if opcode == OPCODE_BRANCH:
+        return _alu_sub
+    return _alu_add
+
+
+class DecodedInstruction:
+    """Fields of one instruction word, decoded once when it is loaded"""
+    __slots__ = ('word', 'hex', 'opcode', 'rd', 'funct3', 'rs1', 'rs2', 'funct7', 'imm',
+                 'alu', 'uses_imm', 'is_load', 'is_store', 'is_branch', 'is_nop', 'sources', 'dest', 'control', 'ctrl')
+
+    def __init__(self, word):
+        opcode = word & 0x7F
+        self.word = word
+        self.hex = format(word, '08x')
+        self.opcode = opcode
+        self.rd = (word >> 7) & 0x1F
+        self.funct3 = (word >> 12) & 0x7
+        self.rs1 = (word >> 15) & 0x1F
+        self.rs2 = (word >> 20) & 0x1F
+        self.funct7 = (word >> 25) & 0x7F
+        self.imm = decode_immediate(word, opcode)
+        self.alu = alu_operation(opcode, self.funct3, self.funct7)
+        self.uses_imm = opcode in (OPCODE_I_TYPE, OPCODE_LOAD, OPCODE_STORE)
+        self.is_load = opcode == OPCODE_LOAD
+        self.is_store = opcode == OPCODE_STORE
+        self.is_branch = opcode == OPCODE_BRANCH
+        self.is_nop = word == NOP
+        # Registers read and written, for hazard detection (x0 never conflicts)
+        sources = []
+        if opcode in READS_RS1 and self.rs1:
+            sources.append(self.rs1)
+        if opcode in READS_RS2 and self.rs2:
+            sources.append(self.rs2)
+        self.sources = tuple(sources)
+        self.dest = self.rd if opcode in WRITES_RD else 0
+        asserted = CONTROL_SIGNALS.get(opcode, ())
+        self.control = {name: name in asserted for name in CONTROL_SIGNAL_NAMES}
+        # The same signals as bits, bit i for CONTROL_SIGNAL_NAMES[i]
+        self.ctrl = sum(1 << bit for bit, name in enumerate(CONTROL_SIGNAL_NAMES) if name in asserted)
+
+
+def decode_immediate(word, opcode):
+    """Sign-extended immediate for I, S and B formats, as an unsigned 32-bit value"""
+    if opcode == OPCODE_I_TYPE or opcode == OPCODE_LOAD:
+        imm = (word >> 20) & 0xFFF
+        if imm & 0x800:
+            imm |= 0xFFFFF000
+    elif opcode == OPCODE_STORE:
+        imm = ((word >> 25) << 5) | ((word >> 7) & 0x1F)
+        if imm & 0x800:
+            imm |= 0xFFFFF000
+    elif opcode == OPCODE_BRANCH:
+        imm = ((word >> 31) << 12) | (((word >> 7) & 0x1) << 11) | (((word >> 25) & 0x3F) << 5) | (((word >> 8) & 0xF) << 1)
+        if imm & 0x1000:
+            imm |= 0xFFFFE000
+    else:
+        imm = 0
+    return imm & MASK32
+
+
+DECODED_NOP = DecodedInstruction(NOP)
+
+
+class IFIDLatch:
+    __slots__ = ('pc', 'instr')
+
+    def __init__(self):
+        self.pc = 0
+        self.instr = DECODED_NOP
+
+
+class IDEXLatch:
+    __slots__ = ('pc', 'instr', 'rs1_val', 'rs2_val', 'imm', 'rd')
+
+    def __init__(self):
+        self.pc = 0
+        self.instr = DECODED_NOP
+        self.rs1_val = 0
+        self.rs2_val = 0
+        self.imm = 0
+        self.rd = 0
+
+
+class EXMEMLatch:
+    __slots__ = ('pc', 'instr', 'alu_result', 'zero', 'rd', 'mem_write_data', 'branch_target')
+
+    def __init__(self):
+        self.pc = 0
+        self.instr = DECODED_NOP
+        self.alu_result = 0
+        self.zero = 0
+        self.rd = 0
+        self.mem_write_data = 0
+        self.branch_target = 0
+
+
+class MEMWBLatch:
+    __slots__ = ('pc', 'instr', 'result', 'rd')
+
+    def __init__(self):
+        self.pc = 0
+        self.instr = DECODED_NOP
+        self.result = 0
+        self.rd = 0
+
+
+class PerfCounters:
+    """Cumulative event counts, one attribute per PERF_COUNTERS entry"""
+    __slots__ = PERF_COUNTERS
+
+    def __init__(self):
+        for name in PERF_COUNTERS:
+            setattr(self, name, 0)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in PERF_COUNTERS}
+
+
+class PagedMemory:
+    """Sparse word-addressed memory, allocated one page at a time on first write.
+
+    Supports len(), integer indexing and reading slices like the list it
+    replaces; indices are word addresses below size (callers wrap with
+    % len(memory)). Words whose value changes are remembered until
+    take_dirty() collects them.
+    """
+    __slots__ = ('size', 'pages', 'dirty')
+
+    def __init__(self, size=ADDRESS_SPACE_WORDS):
+        self.size = size
+        self.pages = {}
+        self.dirty = set()
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        try:
+            page = self.pages.get(index >> PAGE_SHIFT)
+        except TypeError:
+            if isinstance(index, slice):
+                return [self[i] for i in range(*index.indices(self.size))]
+            raise
+        return page[index & PAGE_MASK] if page is not None else 0
+
+    def __setitem__(self, index, value):
+        try:
+            page = self.pages.get(index >> PAGE_SHIFT)
+        except TypeError:
+            if isinstance(index, slice):
+                raise TypeError("PagedMemory does not support slice assignment") from None
+            raise
+        if page is None:
+            if not value:
+                return
+            page = self.pages[index >> PAGE_SHIFT] = [0] * PAGE_WORDS
+        offset = index & PAGE_MASK
+        if page[offset] != value:
+            page[offset] = value
+            self.dirty.add(index)
+
+    def take_dirty(self):
+        """{word address: value} of words changed since the last call"""
+        if not self.dirty:
+            return {}
+        dirty, self.dirty = self.dirty, set()
+        return {index: self[index] for index in sorted(dirty)}
+
+    def nonzero(self):
+        """(word address, value) of every nonzero word, in address order"""
+        for number in sorted(self.pages):
+            base = number << PAGE_SHIFT
+            for offset, value in enumerate(self.pages[number]):
+                if value:
+                    yield base + offset, value
+
+
+def parse_program(hex_str):
+    """Instruction words from hex text, padded with NOPs to the memory size"""
+    words = []
+    for line in hex_str.strip().split('\n'):
+        line = line.strip()
+        if line and not line.startswith('#'):
+            try:
+                words.append(int(line, 16))
+            except ValueError:
+                words.append(NOP)
+
+    # Pad with NOPs
+    while len(words) < INSTRUCTION_MEMORY_WORDS:
+        words.append(NOP)
+    return words
+
+
+class RISCVSimulator:
+    """Cycle-by-cycle model of the 5-stage pipeline"""
+
+    def __init__(self, memory_words=ADDRESS_SPACE_WORDS):
+        self.registers = [0] * 32  # 32 general purpose registers
+        # Data addresses wrap at memory_words, like the RTL's DMEM_WORDS
+        self.memory = PagedMemory(memory_words)
+        self.pc = 0
+        self.instruction_memory = []
+        # Cycles already covered by fast-forwarding; added to reported cycle numbers
+        self.cycle_offset = 0
+        self.counters = PerfCounters()
+        self.reset_state()
+
+        # Pipeline registers
+        self.if_id = IFIDLatch()
+        self.id_ex = IDEXLatch()
+        self.ex_mem = EXMEMLatch()
+        self.mem_wb = MEMWBLatch()
+
+    def load_instructions(self, hex_str):
+        """Load hex instructions into instruction memory, decoding each word once"""
+        decoded = {NOP: DECODED_NOP}
+        for word in parse_program(hex_str):
+            if word not in decoded:
+                decoded[word] = DecodedInstruction(word)
+            self.instruction_memory.append(decoded[word])
+
+    def snapshot(self, cycle_num):
+        """State at the start of a cycle, in the format used by the frontend.
+
+        memory_writes holds the words changed since the previous snapshot;
+        the first snapshot carries the whole initial image.
+        """
+        if_id, id_ex, ex_mem, mem_wb = self.if_id, self.id_ex, self.ex_mem, self.mem_wb
+        return {
+            'cycle': self.cycle_offset + cycle_num,
+            'pc': self.pc,
+            'registers': self.registers[:],
+            'pipeline': {
+                'if_id': {
+                    'pc': if_id.pc,
+                    'instruction': if_id.instr.hex
+                },
+                'id_ex': {
+                    'pc': id_ex.pc,
+                    'instruction': id_ex.instr.hex,
+                    'rs1': id_ex.instr.rs1,
+                    'rs2': id_ex.instr.rs2,
+                    'rd': id_ex.rd,
+                    'rs1_val': id_ex.rs1_val,
+                    'rs2_val': id_ex.rs2_val,
+                    'imm': id_ex.imm
+                },
+                'ex_mem': {
+                    'pc': ex_mem.pc,
+                    'alu_result': ex_mem.alu_result,
+                    'rd': ex_mem.rd,
+                    'zero_flag': ex_mem.zero
+                },
+                'mem_wb': {
+                    'pc': mem_wb.pc,
+                    'result': mem_wb.result,
+                    'rd': mem_wb.rd
+                }
+            },
+            'memory_writes': self.memory.take_dirty(),
+            'counters': self.counters.as_dict(),
+            'control_signals': dict(if_id.instr.control)
+        }
+
+    def record(self, cycle_num):
+        """State at the start of a cycle as a packed trace record (see trace_format.py).
+
+        Carries the same values as snapshot() without building any dicts.
+        The memory write words are left zero; take the cycle's writes from
+        memory.take_dirty() instead, since a cycle may report several.
+        """
+        if_id, id_ex, ex_mem, mem_wb = self.if_id, self.id_ex, self.ex_mem, self.mem_wb
+        counters = self.counters
+        return (
+            self.cycle_offset + cycle_num, self.pc, *self.registers,
+            if_id.instr.word, if_id.pc, id_ex.instr.word, id_ex.pc,
+            id_ex.instr.rs1, id_ex.rs1_val, id_ex.instr.rs2, id_ex.rs2_val, id_ex.rd, id_ex.imm,
+            ex_mem.alu_result, ex_mem.pc, ex_mem.rd, ex_mem.zero,
+            mem_wb.result, mem_wb.pc, mem_wb.rd, if_id.instr.ctrl,
+            0, 0, 0,
+            counters.retired, counters.raw_hazards, counters.stalls, counters.forwards,
+            counters.flushes, counters.taken_branches, counters.loads, counters.stores
+        )
+
+    def step(self, cycle_num):
+        """Advance every pipeline stage by one clock cycle"""
+        registers = self.registers
+        memory = self.memory
+        counters = self.counters
+        if_id, id_ex, ex_mem, mem_wb = self.if_id, self.id_ex, self.ex_mem, self.mem_wb
+
+        # A branch in EX/MEM whose subtraction gave zero redirects the fetch
+        # below. Nothing is flushed: the instructions behind it carry on.
+        branch_taken = ex_mem.zero and ex_mem.instr.is_branch
+        if branch_taken:
+            branch_target = ex_mem.branch_target
+            counters.taken_branches += 1
+
+        # Write Back stage
+        # The register file has no write-through: decode below still reads
+        # the old value, so the write is applied after it
+        writeback = mem_wb.instr
+        writeback_rd = writeback.dest
+        writeback_result = mem_wb.result
+        if not writeback.is_nop:
+            counters.retired += 1
+
+        # Memory stage
+        instr = ex_mem.instr
+        if instr.is_load:
+            mem_wb.result = memory[(ex_mem.alu_result // 4) % len(memory)]
+            counters.loads += 1
+        elif instr.is_store:
+            memory[(ex_mem.alu_result // 4) % len(memory)] = ex_mem.mem_write_data
+            mem_wb.result = ex_mem.alu_result
+            counters.stores += 1
+        else:
+            mem_wb.result = ex_mem.alu_result
+        mem_wb.rd = ex_mem.rd
+        mem_wb.pc = ex_mem.pc
+        mem_wb.instr = instr
+
+        # Execute stage
+        instr = id_ex.instr
+        op2 = id_ex.imm if instr.uses_imm else id_ex.rs2_val
+        result = instr.alu(id_ex.rs1_val, op2)
+        ex_mem.alu_result = result
+        ex_mem.zero = 0 if result else 1
+        ex_mem.rd = id_ex.rd
+        ex_mem.pc = id_ex.pc
+        ex_mem.mem_write_data = id_ex.rs2_val
+        if instr.is_branch:
+            ex_mem.branch_target = (id_ex.pc + id_ex.imm) & MASK32
+        ex_mem.instr = instr
+
+        # Decode stage
+        instr = if_id.instr
+        # Without forwarding, an operand whose producer is still in EX, MEM
+        # or WB is stale, as Performance_Counters counts it in processor.v
+        for source in instr.sources:
+            if source == ex_mem.instr.dest or source == mem_wb.instr.dest or source == writeback_rd:
+                counters.raw_hazards += 1
+                break
+        # x0 always holds zero, so no special case is needed
+        id_ex.rs1_val = registers[instr.rs1]
+        id_ex.rs2_val = registers[instr.rs2]
+        id_ex.imm = instr.imm
+        id_ex.rd = instr.rd
+        id_ex.pc = if_id.pc
+        id_ex.instr = instr
+
+        if writeback_rd:
+            registers[writeback_rd] = writeback_result
+
+        # Fetch stage
+        # Instruction memory wraps at its size, as the RTL's does at 64 words
+        # (programs are padded to that with NOPs)
+        instruction_memory = self.instruction_memory
+        if instruction_memory:
+            if_id.instr = instruction_memory[(self.pc >> 2) % len(instruction_memory)]
+        else:
+            if_id.instr = DECODED_NOP
+        if_id.pc = self.pc
+        self.pc = branch_target if branch_taken else (self.pc + 4) & MASK32
+
+    def simulate_cycle(self, cycle_num):
+        """Simulate one clock cycle, returning the state at its start"""
+        cycle_data = self.snapshot(cycle_num)
+        self.step(cycle_num)
+        return cycle_data
+
+    def reset_state(self):
+        """Register and memory contents after reset, matching the RTL.
+
+        The RTL's reset clears the register file; Data_Memory preloads INITIAL_MEMORY.
+        """
+        for index, value in INITIAL_MEMORY.items():
+            self.memory[index] = value
+
+    def fast_forward(self, max_instructions=None, until_pc=None, check=None):
+        """Execute functionally from the current state, then resume here.
+
+        The pipeline restarts empty at the resulting PC, and reported cycle
+        numbers continue from the instructions executed, since the pipeline
+        issues one instruction per cycle. check is passed to
+        FunctionalSimulator.run. Returns (instructions, stop reason).
+        """
+        functional = FunctionalSimulator([instr.word for instr in self.instruction_memory],
+                                         self.registers, self.memory, self.pc)
+        reason = functional.run(max_instructions, until_pc, check)
+        self.pc = functional.pc
+        self.cycle_offset += functional.instructions
+        return functional.instructions, reason
+
+    def run(self, num_cycles=20):
+        """Run simulation for specified number of cycles, yielding each cycle"""
+        for cycle in range(num_cycles):
+            yield self.simulate_cycle(cycle + 1)
+
+    def run_records(self, num_cycles=20):
+        """Run like run(), yielding (record, memory writes) per cycle instead of dicts"""
+        record = self.record
+        step = self.step
+        take_dirty = self.memory.take_dirty
+        for cycle in range(1, num_cycles + 1):
+            yield record(cycle), take_dirty()
+            step(cycle)
+
+    def run_untraced(self, num_cycles):
+        """Run without building per-cycle snapshots, for throughput"""
+        step = self.step
+        for cycle in range(1, num_cycles + 1):
+            step(cycle)
+
+
+def _signed(value):
+    return value - 0x100000000 if value & 0x80000000 else value
+
+def _sign_extend(value, bits):
+    sign = 1 << (bits - 1)
+    return ((value & (sign - 1)) - (value & sign)) & MASK32
+
+
+# Shift the loaded word right by 8 * byte offset, then mask/sign-extend
+_LOAD_WIDTHS = {0: (8, True), 1: (16, True), 2: (32, False), 4: (8, False), 5: (16, False)}
+_STORE_MASKS = {0: 0xFF, 1: 0xFFFF, 2: MASK32}
+
+_BRANCH_CONDITIONS = {
+    0: lambda a, b: a == b,                      # BEQ
+    1: lambda a, b: a != b,                      # BNE
+    4: lambda a, b: _signed(a) < _signed(b),     # BLT
+    5: lambda a, b: _signed(a) >= _signed(b),    # BGE
+    6: lambda a, b: a < b,                       # BLTU
+    7: lambda a, b: a >= b,                      # BGEU
+}
+
+# Register-register operations by (funct3, funct7)
+_OP_FUNCTIONS = {
+    (0, 0x00): lambda a, b: (a + b) & MASK32,
+    (0, 0x20): lambda a, b: (a - b) & MASK32,
+    (1, 0x00): lambda a, b: (a << (b & 0x1F)) & MASK32,
+    (2, 0x00): lambda a, b: 1 if _signed(a) < _signed(b) else 0,
+    (3, 0x00): lambda a, b: 1 if a < b else 0,
+    (4, 0x00): lambda a, b: a ^ b,
+    (5, 0x00): lambda a, b: a >> (b & 0x1F),
+    (5, 0x20): lambda a, b: (_signed(a) >> (b & 0x1F)) & MASK32,
+    (6, 0x00): lambda a, b: a | b,
+    (7, 0x00): lambda a, b: a & b,
+}
+
+
+def compile_instruction(word):
+    """Build a function that executes one instruction word.
+
+    The function takes (registers, memory, pc) and returns the next PC, or
+    None for ECALL/EBREAK and illegal instructions, which stop execution.
+    """
+    opcode = word & 0x7F
+    rd = (word >> 7) & 0x1F
+    funct3 = (word >> 12) & 0x7
+    rs1 = (word >> 15) & 0x1F
+    rs2 = (word >> 20) & 0x1F
+    funct7 = (word >> 25) & 0x7F
+    imm_i = _sign_extend(word >> 20, 12)
+
+    if opcode == OPCODE_I_TYPE:
+        if funct3 == 1 or funct3 == 5:
+            # Shifts take shamt from the immediate and funct7 from its top bits
+            operation = _OP_FUNCTIONS.get((funct3, funct7))
+            operand = rs2
+        else:
+            operation = {
+                0: _OP_FUNCTIONS[(0, 0x00)], 2: _OP_FUNCTIONS[(2, 0x00)], 3: _OP_FUNCTIONS[(3, 0x00)],
+                4: _OP_FUNCTIONS[(4, 0x00)], 6: _OP_FUNCTIONS[(6, 0x00)], 7: _OP_FUNCTIONS[(7, 0x00)],
+            }[funct3]
+            operand = imm_i
+        if operation is None:
+            return _illegal
+
+        def execute(r, m, pc):
+            r[rd] = operation(r[rs1], operand)
+            return pc + 4
+        return execute
+
+    if opcode == OPCODE_R_TYPE:
+        operation = _OP_FUNCTIONS.get((funct3, funct7))
+        if operation is None:
+            return _illegal
+
+        def execute(r, m, pc):
+            r[rd] = operation(r[rs1], r[rs2])
+            return pc + 4
+        return execute
+
+    if opcode == OPCODE_LOAD:
+        if funct3 not in _LOAD_WIDTHS:
+            return _illegal
+        bits, signed = _LOAD_WIDTHS[funct3]
+
+        def execute(r, m, pc):
+            address = (r[rs1] + imm_i) & MASK32
+            value = (m[(address >> 2) % len(m)] >> (8 * (address & 3))) & ((1 << bits) - 1)
+            r[rd] = _sign_extend(value, bits) if signed else value
+            return pc + 4
+        return execute
+
+    if opcode == OPCODE_STORE:
+        if funct3 not in _STORE_MASKS:
+            return _illegal
+        mask = _STORE_MASKS[funct3]
+        imm_s = _sign_extend(((word >> 25) << 5) | rd, 12)
+
+        def execute(r, m, pc):
+            address = (r[rs1] + imm_s) & MASK32
+            index = (address >> 2) % len(m)
+            shift = 8 * (address & 3)
+            m[index] = (m[index] & ~(mask << shift) | ((r[rs2] & mask) << shift)) & MASK32
+            return pc + 4
+        return execute
+
+    if opcode == OPCODE_BRANCH:
+        condition = _BRANCH_CONDITIONS.get(funct3)
+        if condition is None:
+            return _illegal
+        offset = decode_immediate(word, OPCODE_BRANCH)
+
+        def execute(r, m, pc):
+            if condition(r[rs1], r[rs2]):
+                return (pc + offset) & MASK32
+            return pc + 4
+        return execute
+
+    if opcode == OPCODE_LUI:
+        value = word & 0xFFFFF000
+
+        def execute(r, m, pc):
+            r[rd] = value
+            return pc + 4
+        return execute
+
+    if opcode == OPCODE_AUIPC:
+        value = word & 0xFFFFF000
+
+        def execute(r, m, pc):
+            r[rd] = (pc + value) & MASK32
+            return pc + 4
+        return execute
+
+    if opcode == OPCODE_JAL:
+        offset = _sign_extend(((word >> 31) << 20) | (((word >> 12) & 0xFF) << 12)
+                              | (((word >> 20) & 0x1) << 11) | (((word >> 21) & 0x3FF) << 1), 21)
+
+        def execute(r, m, pc):
+            r[rd] = pc + 4
+            return (pc + offset) & MASK32
+        return execute
+
+    if opcode == OPCODE_JALR:
+        def execute(r, m, pc):
+            target = (r[rs1] + imm_i) & 0xFFFFFFFE
+            r[rd] = pc + 4
+            return target
+        return execute
+
+    if opcode == OPCODE_FENCE:
+        return _next_instruction
+
+    # ECALL, EBREAK and anything unrecognised stop the interpreter
+    return _illegal
+
+
+def _next_instruction(r, m, pc):
+    return pc + 4
+
+def _illegal(r, m, pc):
+    return None
+
+
+class FunctionalSimulator:
+    """Instruction-at-a-time RV32I interpreter without pipeline modelling.
+
+    Memory is word-addressed and wraps at its length, like the pipeline
+    models, so state can be handed to them directly. No per-instruction
+    snapshots are taken, which lets it run millions of instructions.
+    """
+
+    def __init__(self, program_words, registers, memory, pc=0):
+        compiled = {}
+        for word in program_words:
+            if word not in compiled:
+                compiled[word] = compile_instruction(word)
+        self.program = [compiled[word] for word in program_words]
+        self.registers = registers
+        self.memory = memory
+        self.pc = pc
+        self.instructions = 0
+
+    def run(self, max_instructions=None, until_pc=None, check=None):
+        """Execute until a stop condition, returning why it stopped.
+
+        Stops before executing the instruction at until_pc ('pc'), after
+        max_instructions ('limit'), on ECALL/EBREAK or an illegal instruction
+        ('halt'), or when the PC leaves instruction memory ('end'). check,
+        if given, is called every CHECK_INTERVAL instructions and may raise
+        to abandon the run, e.g. on cancellation or a deadline.
+        """
+        if check is None:
+            return self._execute(max_instructions, until_pc)
+        executed = 0
+        while True:
+            limit = CHECK_INTERVAL if max_instructions is None else min(CHECK_INTERVAL, max_instructions - executed)
+            before = self.instructions
+            reason = self._execute(limit, until_pc)
+            executed += self.instructions - before
+            if reason != 'limit' or (max_instructions is not None and executed >= max_instructions):
+                return reason
+            check()
+
+    def _execute(self, max_instructions, until_pc):
+        program = self.program
+        size = len(program)
+        registers = self.registers
+        memory = self.memory
+        pc = self.pc
+        remaining = max_instructions if max_instructions is not None else -1
+        executed = 0
+        reason = 'limit'
+
+        while remaining != 0:
+            if pc == until_pc:
+                reason = 'pc'
+                break
+            index = pc >> 2
+            if index >= size or pc & 3:
+                reason = 'end'
+                break
+            next_pc = program[index](registers, memory, pc)
+            if next_pc is None:
+                reason = 'halt'
+                break
+            registers[0] = 0
+            pc = next_pc
+            executed += 1
+            remaining -= 1
+
+        self.pc = pc
+        self.instructions += executed
+        return reason
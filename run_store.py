@@ -0,0 +1,240 @@
+"""Server-side storage for simulation traces.
+
+A run is stored as one flat array of packed trace records (see
+trace_format.py), so the engines can append cycles without building any
+dicts. Memory is kept as the words each cycle wrote, with full copies every
+keyframe_interval cycles so the memory view of any window can be rebuilt
+without replaying the whole trace. Cycle dicts are only built for the
+windows that are read. Runs are evicted least-recently-used first, or once
+they have not been read for ttl seconds.
+"""
+
+import json
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from trace_format import (RECORD_COUNTERS, RECORD_MEM_WRITE, TRACE_RECORD_WORDS, cycle_to_record,
+                          packed_record_to_cycle, record_writes, word_array)
+from riscv_simulator import PERF_COUNTERS
+
+# Word addresses materialized as each rebuilt cycle's 'memory' by default
+DEFAULT_MEMORY_VIEW = (0, 64)
+
+
+class StoredRun:
+    """Encoded trace of one simulation run"""
+
+    def __init__(self, run_id, keyframe_interval, metadata=None):
+        self.run_id = run_id
+        self.keyframe_interval = keyframe_interval
+        self.metadata = dict(metadata or {})
+        self.records = word_array()  # TRACE_RECORD_WORDS words per cycle
+        self.writes = {}             # position -> ((address, value), ...) if the cycle wrote memory
+        self.keyframes = []          # memory dict after every keyframe_interval-th cycle
+        self.last_access = time.monotonic()
+        self._count = 0
+        self._memory = {}            # nonzero words after the latest cycle
+
+    def __len__(self):
+        return self._count
+
+    def append(self, cycle):
+        """Encode one cycle dict.
+
+        Memory comes from the cycle's memory_writes; keys may be strings
+        when the cycle was read back from JSON.
+        """
+        self.append_record(cycle_to_record(cycle), cycle.get('memory_writes') or {})
+
+    def append_record(self, record, writes=None):
+        """Store one record's words; writes ({address: value}) default to the store it reports"""
+        if writes is None:
+            writes = record_writes(record)
+        elif writes:
+            writes = tuple((int(addr), value) for addr, value in writes.items())
+        else:
+            writes = ()
+        self._add_writes(self._count, writes)
+        self.records.extend(record)
+        self._count += 1
+
+    def extend_records(self, words, writes=None, initial_memory=None):
+        """Append a flat array of records at once.
+
+        writes maps a record's index within words to its ((address, value),
+        ...) pairs; other records report their own store. initial_memory is
+        reported as written by the first record, before its own writes.
+        """
+        count = len(words) // TRACE_RECORD_WORDS
+        writes = writes or {}
+        flags = words[RECORD_MEM_WRITE:count * TRACE_RECORD_WORDS:TRACE_RECORD_WORDS]
+        # Only cycles that write memory or start a keyframe need visiting
+        interval = self.keyframe_interval
+        first_keyframe = -self._count % interval
+        positions = {index for index, flag in enumerate(flags) if flag}
+        positions.update(writes, range(first_keyframe, count, interval))
+        if initial_memory and count:
+            positions.add(0)
+        for index in sorted(positions):
+            if index in writes:
+                cycle_writes = tuple(writes[index])
+            elif flags[index]:
+                base = index * TRACE_RECORD_WORDS + RECORD_MEM_WRITE
+                cycle_writes = ((words[base + 1], words[base + 2]),)
+            else:
+                cycle_writes = ()
+            if index == 0 and initial_memory:
+                cycle_writes = tuple({**initial_memory, **dict(cycle_writes)}.items())
+            self._add_writes(self._count + index, cycle_writes)
+        self.records.extend(words[:count * TRACE_RECORD_WORDS])
+        self._count += count
+
+    def _add_writes(self, position, writes):
+        memory = self._memory
+        for addr, value in writes:
+            if value:
+                memory[addr] = value
+            else:
+                memory.pop(addr, None)
+        if writes:
+            self.writes[position] = writes
+        if position % self.keyframe_interval == 0:
+            self.keyframes.append(dict(memory))
+
+    def record(self, position):
+        """Words of the record at a position"""
+        base = position * TRACE_RECORD_WORDS
+        return self.records[base:base + TRACE_RECORD_WORDS]
+
+    def window(self, start, stop, memory_view=DEFAULT_MEMORY_VIEW, counters=False):
+        """Rebuild cycle dicts for positions start <= i < stop.
+
+        Each cycle gets its memory_writes and, as 'memory', the nonzero
+        words whose addresses fall in memory_view = (first, end). Limiting
+        the view keeps the cost per cycle independent of memory size.
+        Per-cycle performance counters are only included if counters is set.
+        """
+        start = max(0, start)
+        stop = min(self._count, stop)
+        if start >= stop:
+            return []
+        low, high = memory_view
+
+        keyframe = start // self.keyframe_interval
+        view = None
+
+        result = []
+        for i in range(keyframe * self.keyframe_interval, stop):
+            writes = self.writes.get(i, ())
+            if i % self.keyframe_interval == 0:
+                memory = self.keyframes[i // self.keyframe_interval]
+                view = {addr: value for addr, value in memory.items() if low <= addr < high}
+            else:
+                for addr, value in writes:
+                    if low <= addr < high:
+                        if value:
+                            view[addr] = value
+                        else:
+                            view.pop(addr, None)
+            if i >= start:
+                cycle = packed_record_to_cycle(self.record(i))
+                if not counters:
+                    del cycle['counters']
+                cycle['memory'] = dict(sorted(view.items()))
+                cycle['memory_writes'] = dict(writes)
+                result.append(cycle)
+        return result
+
+    def final_counters(self):
+        """Performance counters of the last stored cycle, or None"""
+        if not self._count:
+            return None
+        return dict(zip(PERF_COUNTERS, self.record(self._count - 1)[RECORD_COUNTERS:]))
+
+    def info(self):
+        info = {'run_id': self.run_id, 'total_cycles': self._count}
+        if self._count:
+            info['first_cycle'] = self.records[0]
+            info['last_cycle'] = self.records[(self._count - 1) * TRACE_RECORD_WORDS]
+        info.update(self.metadata)
+        return info
+
+    def to_bytes(self):
+        """Serialize as a JSON header line (metadata, memory writes) and little-endian records"""
+        header = {
+            'metadata': self.metadata,
+            'writes': [[position, list(map(list, writes))] for position, writes in self.writes.items()]
+        }
+        words = self.records
+        if sys.byteorder != 'little':
+            words = word_array(words)
+            words.byteswap()
+        return json.dumps(header, separators=(',', ':')).encode() + b'\n' + words.tobytes()
+
+
+class RunStore:
+    """Thread-safe LRU/TTL store of encoded runs"""
+
+    def __init__(self, max_runs=64, ttl=3600, keyframe_interval=256):
+        self.max_runs = max_runs
+        self.ttl = ttl
+        self.keyframe_interval = keyframe_interval
+        self._runs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._runs)
+
+    def create(self, run_id=None, metadata=None):
+        """Start a new run; append cycles to it, then publish it with add()"""
+        return StoredRun(run_id or secrets.token_hex(8), self.keyframe_interval, metadata)
+
+    def add(self, run):
+        with self._lock:
+            self._runs[run.run_id] = run
+            self._runs.move_to_end(run.run_id)
+            run.last_access = time.monotonic()
+            self._evict()
+        return run.run_id
+
+    def put(self, cycles, run_id=None, metadata=None):
+        """Encode and store a complete list of cycles, returning the run ID"""
+        run = self.create(run_id, metadata)
+        for cycle in cycles:
+            run.append(cycle)
+        return self.add(run)
+
+    def load(self, data, run_id):
+        """Store a run serialized by StoredRun.to_bytes, returning the run ID"""
+        header, _, raw = data.partition(b'\n')
+        header = json.loads(header)
+        run = self.create(run_id, header['metadata'])
+        words = word_array()
+        words.frombytes(raw)
+        if sys.byteorder != 'little':
+            words.byteswap()
+        writes = {position: [tuple(write) for write in cycle_writes]
+                  for position, cycle_writes in header['writes']}
+        run.extend_records(words, writes)
+        return self.add(run)
+
+    def get(self, run_id):
+        with self._lock:
+            self._evict()
+            run = self._runs.get(run_id)
+            if run is not None:
+                self._runs.move_to_end(run_id)
+                run.last_access = time.monotonic()
+            return run
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [run_id for run_id, run in self._runs.items() if now - run.last_access > self.ttl]
+        for run_id in expired:
+            del self._runs[run_id]
+        while len(self._runs) > self.max_runs:
+            self._runs.popitem(last=False)
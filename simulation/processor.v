@@ -114,10 +114,20 @@ module ALU_Control(
                     10'b0000000_110: alu_control_output = 4'b0011; // OR
                     10'b0000000_100: alu_control_output = 4'b0100; // XOR
                     10'b0000000_001: alu_control_output = 4'b0101; // SLL
-                    default:         alu_control_output = 4'bxxxx; // Should not occur
+                    default:         alu_control_output = 4'b1111; // Unsupported: the ALU outputs zero
                 endcase
             end
-            default: alu_control_output = 4'bxxxx; // Should not occur
+            2'b11: begin // I-type: the immediate occupies funct7
+                case (funct3)
+                    3'b000:  alu_control_output = 4'b0000; // ADDI
+                    3'b111:  alu_control_output = 4'b0010; // ANDI
+                    3'b110:  alu_control_output = 4'b0011; // ORI
+                    3'b100:  alu_control_output = 4'b0100; // XORI
+                    3'b001:  alu_control_output = 4'b0101; // SLLI
+                    default: alu_control_output = 4'b1111; // Unsupported: the ALU outputs zero
+                endcase
+            end
+            default: alu_control_output = 4'b1111;
         endcase
     end
 endmodule
@@ -171,6 +181,7 @@ module Instruction_Memory(
     output wire [31:0] fetched_instruction
 );
     reg [31:0] instruction_memory_array [0:63];
+    reg [8*256-1:0] instruction_file;
     integer i;
 
     // Initialize instruction memory from file
@@ -180,7 +191,9 @@ module Instruction_Memory(
             instruction_memory_array[i] = 32'h00000013; // NOP
         
         // Load instructions from file if it exists
-        if ($test$plusargs("INSTRUCTION_FILE")) begin
+        if ($value$plusargs("INSTRUCTION_FILE=%s", instruction_file)) begin
+            $readmemh(instruction_file, instruction_memory_array);
+        end else if ($test$plusargs("INSTRUCTION_FILE")) begin
             $readmemh("simulation/instructions.hex", instruction_memory_array);
         end else begin
             // Default test instructions
@@ -197,6 +210,12 @@ module Instruction_Memory(
 endmodule
 
 //...............................datamemory..................................................//
+// Data memory depth in words. Override at compile time with
+// iverilog -DDMEM_WORDS=<n>; addresses wrap at this size.
+`ifndef DMEM_WORDS
+`define DMEM_WORDS 4096
+`endif
+
 module Data_Memory(
     input wire memory_clock,
     input wire memory_reset,
@@ -206,11 +225,12 @@ module Data_Memory(
     input wire [31:0] data_to_write,
     output wire [31:0] data_read_from_memory
 );
-    reg [31:0] data_memory_array [0:63];
+    reg [31:0] data_memory_array [0:`DMEM_WORDS-1];
+    wire [31:0] word_index = memory_address[31:2] % `DMEM_WORDS;
     integer i;
 
     initial begin
-        for (i = 0; i < 64; i = i + 1) begin
+        for (i = 0; i < `DMEM_WORDS; i = i + 1) begin
             data_memory_array[i] = 0;
         end
         // Pre-load some memory for testing lw
@@ -219,11 +239,11 @@ module Data_Memory(
 
     always @(posedge memory_clock) begin
         if (memory_write_enable) begin
-            data_memory_array[memory_address[7:2]] <= data_to_write;
+            data_memory_array[word_index] <= data_to_write;
         end
     end
 
-    assign data_read_from_memory = (memory_read_enable) ? data_memory_array[memory_address[7:2]] : 32'b0;
+    assign data_read_from_memory = (memory_read_enable) ? data_memory_array[word_index] : 32'b0;
 endmodule
 
 //
@@ -251,7 +271,7 @@ module main_control_unit(
             7'b0110011:  // R-type
                 {register_write_signal, memory_read_signal, memory_write_signal, memory_to_register_signal, alu_source_signal, branch_signal, alu_operation_signal} = {1'b1, 1'b0, 1'b0, 1'b0, 1'b0, 1'b0, 2'b10};
             7'b0010011:  // I-type (ALU immediate)
-                {register_write_signal, memory_read_signal, memory_write_signal, memory_to_register_signal, alu_source_signal, branch_signal, alu_operation_signal} = {1'b1, 1'b0, 1'b0, 1'b0, 1'b1, 1'b0, 2'b10}; // Note: Corrected ALUOp for I-type
+                {register_write_signal, memory_read_signal, memory_write_signal, memory_to_register_signal, alu_source_signal, branch_signal, alu_operation_signal} = {1'b1, 1'b0, 1'b0, 1'b0, 1'b1, 1'b0, 2'b11};
             7'b0000011:  // Load
                 {register_write_signal, memory_read_signal, memory_write_signal, memory_to_register_signal, alu_source_signal, branch_signal, alu_operation_signal} = {1'b1, 1'b1, 1'b0, 1'b1, 1'b1, 1'b0, 2'b00};
             7'b0100011:  // Store
@@ -277,7 +297,7 @@ module immediate_generator(
             7'b0100011:  // Store-type
                 immediate_value_output = {{20{current_instruction[31]}}, current_instruction[31:25], current_instruction[11:7]};
             7'b1100011:  // B-type
-                immediate_value_output = {{19{current_instruction[31]}}, current_instruction[7], current_instruction[30:25], current_instruction[11:8], 1'b0};
+                immediate_value_output = {{20{current_instruction[31]}}, current_instruction[7], current_instruction[30:25], current_instruction[11:8], 1'b0};
             default:
                 immediate_value_output = 32'b0;
         endcase
@@ -420,6 +440,64 @@ module MEM_WB_Reg(
     end
 endmodule
 
+//
+//-------------------------------------------------
+//-- Performance Counters
+//-------------------------------------------------
+//
+
+// Cumulative event counts, updated at each rising edge. The trace reports
+// them in the order of PERF_COUNTERS in riscv_simulator.py. Instruction
+// words are shadowed down the pipeline so NOPs and bubbles do not retire.
+module Performance_Counters(
+    input wire clk,
+    input wire rst,
+    input wire [31:0] if_id_instr, id_ex_instr,
+    input wire id_ex_reg_write, ex_mem_reg_write, mem_wb_reg_write,
+    input wire [4:0] id_ex_rd, ex_mem_rd, mem_wb_rd,
+    input wire ex_mem_mem_read, ex_mem_mem_write,
+    input wire stall, flush, forward, branch_taken,
+    output reg [31:0] retired, raw_hazards, stalls, forwards,
+    output reg [31:0] flushes, taken_branches, loads, stores
+);
+    reg [31:0] ex_mem_instr, mem_wb_instr;
+
+    // Source registers the instruction in decode actually reads
+    wire [6:0] opcode = if_id_instr[6:0];
+    wire [4:0] rs1 = if_id_instr[19:15];
+    wire [4:0] rs2 = if_id_instr[24:20];
+    wire reads_rs1 = (rs1 != 5'b0) && (opcode == 7'b0110011 || opcode == 7'b0010011 || opcode == 7'b0000011 ||
+                                       opcode == 7'b0100011 || opcode == 7'b1100011 || opcode == 7'b1100111);
+    wire reads_rs2 = (rs2 != 5'b0) && (opcode == 7'b0110011 || opcode == 7'b0100011 || opcode == 7'b1100011);
+
+    // An operand is stale while an older instruction has yet to write it.
+    // The register file has no write-through, so MEM/WB is still too late.
+    wire rs1_pending = (id_ex_reg_write && id_ex_rd == rs1) || (ex_mem_reg_write && ex_mem_rd == rs1) ||
+                       (mem_wb_reg_write && mem_wb_rd == rs1);
+    wire rs2_pending = (id_ex_reg_write && id_ex_rd == rs2) || (ex_mem_reg_write && ex_mem_rd == rs2) ||
+                       (mem_wb_reg_write && mem_wb_rd == rs2);
+    wire raw_hazard = (reads_rs1 && rs1_pending) || (reads_rs2 && rs2_pending);
+
+    always @(posedge clk or posedge rst) begin
+        if (rst) begin
+            {retired, raw_hazards, stalls, forwards} <= 128'b0;
+            {flushes, taken_branches, loads, stores} <= 128'b0;
+            {ex_mem_instr, mem_wb_instr} <= {2{32'h00000013}};
+        end else begin
+            ex_mem_instr <= id_ex_instr;
+            mem_wb_instr <= ex_mem_instr;
+            if (mem_wb_instr != 32'h00000013) retired <= retired + 1;
+            if (raw_hazard) raw_hazards <= raw_hazards + 1;
+            if (stall) stalls <= stalls + 1;
+            if (forward) forwards <= forwards + 1;
+            if (flush) flushes <= flushes + 1;
+            if (branch_taken) taken_branches <= taken_branches + 1;
+            if (ex_mem_mem_read) loads <= loads + 1;
+            if (ex_mem_mem_write) stores <= stores + 1;
+        end
+    end
+endmodule
+
 //
 //-------------------------------------------------
 //-- Top Level RISC-V Processor
@@ -474,6 +552,22 @@ module RISCV_Processor(
     // Memory data
     wire [31:0] mem_data;
 
+    // There is no hazard or forwarding unit yet: the pipeline never stalls,
+    // flushes or forwards. Counted by Performance_Counters all the same.
+    wire stall = 1'b0;
+    wire flush = 1'b0;
+    wire forward = 1'b0;
+
+    // Instruction word held in ID/EX. The pipeline itself only carries its
+    // decoded fields; this copy is for the trace and the counters.
+    reg [31:0] id_ex_instr;
+    always @(posedge clk or posedge rst) begin
+        if (rst || flush)
+            id_ex_instr <= 32'h00000013;
+        else
+            id_ex_instr <= if_id_instr;
+    end
+
     // Instruction fetch stage
     program_counter pc_reg(.clk(clk), .rst(rst), .pc_in(pc_next), .pc_out(pc_current));
     pc_adder pc_add(.current_pc(pc_current), .next_pc_value(pc_plus4));
@@ -481,7 +575,7 @@ module RISCV_Processor(
     pc_mux pc_mux_inst(.sequential_pc(pc_plus4), .branch_pc(ex_mem_branch_target), .pc_selection_signal(pc_src), .selected_pc(pc_next));
 
     // IF/ID pipeline register
-    IF_ID_Reg if_id_reg(.clk(clk), .rst(rst), .stall(1'b0), .pc_in(pc_current), .instr_in(instruction), .pc_out(if_id_pc), .instr_out(if_id_instr));
+    IF_ID_Reg if_id_reg(.clk(clk), .rst(rst), .stall(stall), .pc_in(pc_current), .instr_in(instruction), .pc_out(if_id_pc), .instr_out(if_id_instr));
 
     // Instruction decode
     assign rs1 = if_id_instr[19:15];
@@ -493,7 +587,7 @@ module RISCV_Processor(
     immediate_generator imm_gen(.current_instruction(if_id_instr), .immediate_value_output(immediate));
 
     // ID/EX pipeline register
-    ID_EX_Reg id_ex_reg(.clk(clk), .rst(rst), .flush(1'b0), .RegWrite_in(reg_write), .MemRead_in(mem_read), .MemWrite_in(mem_write), .MemtoReg_in(mem_to_reg), .ALUSrc_in(alu_src), .Branch_in(branch), .ALUOp_in(alu_op), .pc_in(if_id_pc), .read_data1_in(read_data1), .read_data2_in(read_data2), .imm_in(immediate), .rs1_in(rs1), .rs2_in(rs2), .rd_in(rd), .funct3_in(if_id_instr[14:12]), .funct7_in(if_id_instr[31:25]), .RegWrite_out(id_ex_reg_write), .MemRead_out(id_ex_mem_read), .MemWrite_out(id_ex_mem_write), .MemtoReg_out(id_ex_mem_to_reg), .ALUSrc_out(id_ex_alu_src), .Branch_out(id_ex_branch), .ALUOp_out(id_ex_alu_op), .pc_out(id_ex_pc), .read_data1_out(id_ex_read_data1), .read_data2_out(id_ex_read_data2), .imm_out(id_ex_imm), .rs1_out(id_ex_rs1), .rs2_out(id_ex_rs2), .rd_out(id_ex_rd), .funct3_out(id_ex_funct3), .funct7_out(id_ex_funct7));
+    ID_EX_Reg id_ex_reg(.clk(clk), .rst(rst), .flush(flush), .RegWrite_in(reg_write), .MemRead_in(mem_read), .MemWrite_in(mem_write), .MemtoReg_in(mem_to_reg), .ALUSrc_in(alu_src), .Branch_in(branch), .ALUOp_in(alu_op), .pc_in(if_id_pc), .read_data1_in(read_data1), .read_data2_in(read_data2), .imm_in(immediate), .rs1_in(rs1), .rs2_in(rs2), .rd_in(rd), .funct3_in(if_id_instr[14:12]), .funct7_in(if_id_instr[31:25]), .RegWrite_out(id_ex_reg_write), .MemRead_out(id_ex_mem_read), .MemWrite_out(id_ex_mem_write), .MemtoReg_out(id_ex_mem_to_reg), .ALUSrc_out(id_ex_alu_src), .Branch_out(id_ex_branch), .ALUOp_out(id_ex_alu_op), .pc_out(id_ex_pc), .read_data1_out(id_ex_read_data1), .read_data2_out(id_ex_read_data2), .imm_out(id_ex_imm), .rs1_out(id_ex_rs1), .rs2_out(id_ex_rs2), .rd_out(id_ex_rd), .funct3_out(id_ex_funct3), .funct7_out(id_ex_funct7));
 
     // Execute stage
     MUX2to1 alu_src_mux(.input_zero(id_ex_read_data2), .input_one(id_ex_imm), .select_signal(id_ex_alu_src), .mux_output(alu_input_b));
@@ -514,4 +608,7 @@ module RISCV_Processor(
     // Write back stage
     MUX2to1 wb_mux(.input_zero(mem_wb_alu_result), .input_one(mem_wb_mem_data), .select_signal(mem_wb_mem_to_reg), .mux_output(write_data));
 
+    // Performance counters
+    Performance_Counters perf(.clk(clk), .rst(rst), .if_id_instr(if_id_instr), .id_ex_instr(id_ex_instr), .id_ex_reg_write(id_ex_reg_write), .ex_mem_reg_write(ex_mem_reg_write), .mem_wb_reg_write(mem_wb_reg_write), .id_ex_rd(id_ex_rd), .ex_mem_rd(ex_mem_rd), .mem_wb_rd(mem_wb_rd), .ex_mem_mem_read(ex_mem_mem_read), .ex_mem_mem_write(ex_mem_mem_write), .stall(stall), .flush(flush), .forward(forward), .branch_taken(pc_src));
+
 endmodule
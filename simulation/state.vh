@@ -0,0 +1,25 @@
+// Architectural state hand-off shared by testbench.v and testbench_server.v.
+// Include inside a module that instantiates RISCV_Processor as `uut`.
+//
+// A state file holds one hex word per line: the PC and x1-x31, followed
+// by the nonzero data memory words, each preceded by an @<32 + index>
+// address line. Memory words not listed are zero. It is written by the
+// Python fast-forward interpreter so the pipeline can resume a
+// long-running program part way through.
+
+reg [31:0] resume_state [0:32+`DMEM_WORDS-1];
+
+task load_architectural_state;
+    input [8*256-1:0] state_file;
+    integer i;
+    begin
+        for (i = 0; i < 32 + `DMEM_WORDS; i = i + 1)
+            resume_state[i] = 0;
+        $readmemh(state_file, resume_state);
+        uut.pc_reg.pc_out = resume_state[0];
+        for (i = 1; i < 32; i = i + 1)
+            uut.reg_file.register_bank[i] = resume_state[i];
+        for (i = 0; i < `DMEM_WORDS; i = i + 1)
+            uut.dmem.data_memory_array[i] = resume_state[32 + i];
+    end
+endtask
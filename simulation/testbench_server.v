@@ -0,0 +1,106 @@
+`timescale 1ns / 1ps
+
+// Resident simulation server.
+//
+// Instead of running one program and exiting, this testbench waits for
+// commands on stdin so a single vvp process can simulate many programs:
+//
+//   RUN <instruction_file> <cycles> <packed> <state_file> <cycle_offset>
+//       reset, load program, trace N cycles
+//   QUIT
+//       end the simulation
+//
+// Every RUN is answered with a cycle trace followed by "DONE". The trace
+// uses the compact record format when <packed> is 1, text otherwise.
+// <state_file> is a fast-forwarded state to resume from (see state.vh), or
+// "-" to start from reset; traced cycles are numbered from <cycle_offset>.
+module testbench_server();
+    reg clk;
+    reg rst;
+    
+    // Instantiate the processor
+    RISCV_Processor uut (
+        .clk(clk),
+        .rst(rst)
+    );
+    
+    `include "trace.vh"
+    `include "state.vh"
+    
+    localparam STDIN = 32'h8000_0000;
+    localparam STDOUT = 32'h8000_0001;
+    
+    reg [8*16-1:0] command;
+    reg [8*256-1:0] instruction_file;
+    reg [8*256-1:0] state_file;
+    integer cycle_offset;
+    integer cycles;
+    integer trace_packed;
+    integer cycle_count;
+    integer status;
+    integer i;
+    
+    // One clock period, 10ns as in testbench.v
+    task tick;
+        begin
+            #5 clk = 1;
+            #5 clk = 0;
+        end
+    endtask
+    
+    // Restore both memories to their power-on contents and load a program
+    task load_program;
+        begin
+            for (i = 0; i < 64; i = i + 1)
+                uut.imem.instruction_memory_array[i] = 32'h00000013; // NOP
+            $readmemh(instruction_file, uut.imem.instruction_memory_array);
+            
+            // Match the initial block of Data_Memory
+            for (i = 0; i < `DMEM_WORDS; i = i + 1)
+                uut.dmem.data_memory_array[i] = 0;
+            uut.dmem.data_memory_array[10] = 32'd123;
+        end
+    endtask
+    
+    initial begin
+        clk = 0;
+        rst = 1;
+        $display("READY");
+        $fflush;
+        
+        forever begin
+            status = $fscanf(STDIN, "%s", command);
+            if (status != 1 || command == "QUIT") begin
+                $finish;
+            end else if (command == "RUN") begin
+                status = $fscanf(STDIN, "%s %d %d %s %d", instruction_file, cycles,
+                                 trace_packed, state_file, cycle_offset);
+                load_program;
+                
+                // Hold reset for two clock edges, as testbench.v does
+                rst = 1;
+                tick;
+                tick;
+                rst = 0;
+                if (state_file != "-")
+                    load_architectural_state(state_file);
+                reset_trace_writes;
+                
+                // Trace the state seen at each rising edge
+                for (cycle_count = 1; cycle_count <= cycles; cycle_count = cycle_count + 1) begin
+                    #5;
+                    if (trace_packed)
+                        write_cycle_record(STDOUT, cycle_offset + cycle_count);
+                    else
+                        display_cycle_state(cycle_offset + cycle_count);
+                    clk = 1;
+                    #5 clk = 0;
+                end
+                
+                $display("DONE");
+                $fflush;
+            end
+        end
+    end
+    
+endmodule
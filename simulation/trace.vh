@@ -0,0 +1,130 @@
+// Shared per-cycle trace for testbench.v and testbench_server.v.
+// Include inside a module that instantiates RISCV_Processor as `uut`.
+//
+// Instead of dumping data memory, each cycle reports the store committed
+// since the previous cycle (at most one per cycle). A trace is taken just
+// before a rising edge, so the store pending in EX/MEM at one trace has
+// been written by the next; it is held in trace_write_* until then.
+
+reg trace_write_valid;
+reg [31:0] trace_write_addr;
+reg [31:0] trace_write_data;
+initial trace_write_valid = 0;
+
+task reset_trace_writes;
+    begin
+        trace_write_valid = 0;
+        trace_write_addr = 0;
+        trace_write_data = 0;
+    end
+endtask
+
+// Remember the store that the coming rising edge will commit
+task capture_pending_write;
+    begin
+        trace_write_valid = uut.ex_mem_mem_write;
+        trace_write_addr = uut.ex_mem_alu_result[31:2] % `DMEM_WORDS;
+        trace_write_data = uut.ex_mem_read_data2;
+    end
+endtask
+
+task display_cycle_state;
+    input integer cycle;
+    begin
+        // Output cycle information in structured format
+        $display("CYCLE %0d: PC=0x%08h", cycle, uut.pc_current);
+
+        // Output register file contents
+        $display("REG[0]=0x%08h REG[1]=0x%08h REG[2]=0x%08h REG[3]=0x%08h", 
+                 uut.reg_file.register_bank[0], uut.reg_file.register_bank[1], 
+                 uut.reg_file.register_bank[2], uut.reg_file.register_bank[3]);
+        $display("REG[4]=0x%08h REG[5]=0x%08h REG[6]=0x%08h REG[7]=0x%08h", 
+                 uut.reg_file.register_bank[4], uut.reg_file.register_bank[5], 
+                 uut.reg_file.register_bank[6], uut.reg_file.register_bank[7]);
+        $display("REG[8]=0x%08h REG[9]=0x%08h REG[10]=0x%08h REG[11]=0x%08h", 
+                 uut.reg_file.register_bank[8], uut.reg_file.register_bank[9], 
+                 uut.reg_file.register_bank[10], uut.reg_file.register_bank[11]);
+        $display("REG[12]=0x%08h REG[13]=0x%08h REG[14]=0x%08h REG[15]=0x%08h", 
+                 uut.reg_file.register_bank[12], uut.reg_file.register_bank[13], 
+                 uut.reg_file.register_bank[14], uut.reg_file.register_bank[15]);
+        $display("REG[16]=0x%08h REG[17]=0x%08h REG[18]=0x%08h REG[19]=0x%08h", 
+                 uut.reg_file.register_bank[16], uut.reg_file.register_bank[17], 
+                 uut.reg_file.register_bank[18], uut.reg_file.register_bank[19]);
+        $display("REG[20]=0x%08h REG[21]=0x%08h REG[22]=0x%08h REG[23]=0x%08h", 
+                 uut.reg_file.register_bank[20], uut.reg_file.register_bank[21], 
+                 uut.reg_file.register_bank[22], uut.reg_file.register_bank[23]);
+        $display("REG[24]=0x%08h REG[25]=0x%08h REG[26]=0x%08h REG[27]=0x%08h", 
+                 uut.reg_file.register_bank[24], uut.reg_file.register_bank[25], 
+                 uut.reg_file.register_bank[26], uut.reg_file.register_bank[27]);
+        $display("REG[28]=0x%08h REG[29]=0x%08h REG[30]=0x%08h REG[31]=0x%08h", 
+                 uut.reg_file.register_bank[28], uut.reg_file.register_bank[29], 
+                 uut.reg_file.register_bank[30], uut.reg_file.register_bank[31]);
+
+        // Output pipeline stage information with more details
+        // IF/ID Stage
+        $display("IF_ID_INSTR=0x%08h IF_ID_PC=0x%08h", uut.if_id_instr, uut.if_id_pc);
+
+        // ID/EX Stage with register values
+        $display("ID_EX_INSTR=0x%08h ID_EX_PC=0x%08h", uut.id_ex_instr, uut.id_ex_pc);
+        $display("ID_EX_RS1=0x%02h ID_EX_RS1_VAL=0x%08h", uut.id_ex_rs1, uut.id_ex_read_data1);
+        $display("ID_EX_RS2=0x%02h ID_EX_RS2_VAL=0x%08h", uut.id_ex_rs2, uut.id_ex_read_data2);
+        $display("ID_EX_RD=0x%02h ID_EX_IMM=0x%08h", uut.id_ex_rd, uut.id_ex_imm);
+
+        // EX/MEM Stage with ALU result and destination register
+        $display("EX_MEM_ALU=0x%08h EX_MEM_PC=0x%08h", uut.ex_mem_alu_result, uut.ex_mem_pc);
+        $display("EX_MEM_RD=0x%02h EX_MEM_ZERO=%0d", uut.ex_mem_rd, uut.ex_mem_zero_flag);
+
+        // MEM/WB Stage with result and destination register
+        $display("MEM_WB_DATA=0x%08h MEM_WB_PC=0x%08h", uut.write_data, uut.mem_wb_pc);
+        $display("MEM_WB_RD=0x%02h", uut.mem_wb_rd);
+
+        // Output control signals
+        $display("CTRL_REGWRITE=%0d CTRL_MEMREAD=%0d CTRL_MEMWRITE=%0d", 
+                 uut.reg_write, uut.mem_read, uut.mem_write);
+        $display("CTRL_BRANCH=%0d CTRL_ALUSRC=%0d CTRL_MEMTOREG=%0d", 
+                 uut.branch, uut.alu_src, uut.mem_to_reg);
+
+        // Output the data memory word written since the previous cycle
+        $display("MEM_WRITE=%0d MEM_ADDR=0x%08h MEM_DATA=0x%08h",
+                 trace_write_valid, trace_write_addr, trace_write_data);
+        capture_pending_write;
+
+        // Output the performance counters
+        $display("PERF_RETIRED=%0d PERF_RAW_HAZARDS=%0d PERF_STALLS=%0d PERF_FORWARDS=%0d",
+                 uut.perf.retired, uut.perf.raw_hazards, uut.perf.stalls, uut.perf.forwards);
+        $display("PERF_FLUSHES=%0d PERF_TAKEN_BRANCHES=%0d PERF_LOADS=%0d PERF_STORES=%0d",
+                 uut.perf.flushes, uut.perf.taken_branches, uut.perf.loads, uut.perf.stores);
+
+        $display("----");
+    end
+endtask
+
+// Compact trace: one fixed-width line of 63 32-bit hex words per cycle, in
+// the order of TRACE_RECORD_FIELDS in trace_format.py. Control signals are packed
+// into a single word (bit 0 regwrite ... bit 5 memtoreg).
+task write_cycle_record;
+    input integer fd;
+    input integer cycle;
+    integer i;
+    begin
+        $fwrite(fd, "%h%h", cycle, uut.pc_current);
+        for (i = 0; i < 32; i = i + 1)
+            $fwrite(fd, "%h", uut.reg_file.register_bank[i]);
+        $fwrite(fd, "%h%h%h%h", uut.if_id_instr, uut.if_id_pc, uut.id_ex_instr, uut.id_ex_pc);
+        $fwrite(fd, "%h%h%h%h%h%h",
+                {27'b0, uut.id_ex_rs1}, uut.id_ex_read_data1,
+                {27'b0, uut.id_ex_rs2}, uut.id_ex_read_data2,
+                {27'b0, uut.id_ex_rd}, uut.id_ex_imm);
+        $fwrite(fd, "%h%h%h%h", uut.ex_mem_alu_result, uut.ex_mem_pc,
+                {27'b0, uut.ex_mem_rd}, {31'b0, uut.ex_mem_zero_flag});
+        $fwrite(fd, "%h%h%h", uut.write_data, uut.mem_wb_pc, {27'b0, uut.mem_wb_rd});
+        $fwrite(fd, "%h", {26'b0, uut.mem_to_reg, uut.alu_src, uut.branch,
+                           uut.mem_write, uut.mem_read, uut.reg_write});
+        $fwrite(fd, "%h%h%h", {31'b0, trace_write_valid}, trace_write_addr, trace_write_data);
+        $fwrite(fd, "%h%h%h%h%h%h%h%h", uut.perf.retired, uut.perf.raw_hazards, uut.perf.stalls,
+                uut.perf.forwards, uut.perf.flushes, uut.perf.taken_branches, uut.perf.loads,
+                uut.perf.stores);
+        $fwrite(fd, "\n");
+        capture_pending_write;
+    end
+endtask
@@ -1,11 +1,39 @@
+// Resolved while this script runs; currentScript is unset afterwards
+const TRACE_WORKER_URL = new URL('trace_worker.js', document.currentScript ? document.currentScript.src : '/static/').href;
+// Autoplay speeds by slider position, slowest first
+const PLAYBACK_SPEEDS = [
+    { rate: 1, label: '1.0s' }, { rate: 1.1, label: '0.9s' }, { rate: 1.25, label: '0.8s' },
+    { rate: 1 / 0.6, label: '0.6s' }, { rate: 2, label: '0.5s' }, { rate: 2.5, label: '0.4s' },
+    { rate: 1 / 0.3, label: '0.3s' }, { rate: 5, label: '0.2s' }, { rate: 1 / 0.15, label: '0.15s' },
+    { rate: 10, label: '0.1s' }, { rate: 30, label: '30/s' }, { rate: 100, label: '100/s' },
+    { rate: 500, label: '500/s' }, { rate: 2000, label: '2000/s' }, { rate: 5000, label: '5000/s' }
+];
+const HIGHLIGHT_MS = 1000;
+
 class RISCVVisualizer {
     constructor() {
-        this.simulationData = [];
+        // Decoded cycle windows (see trace_worker.js) by page number
+        this.pages = new Map();
+        this.totalCycles = 0;
         this.currentCycle = 0;
-        this.previousRegisters = new Array(32).fill(0);
-        this.previousMemory = {};
+        this.runId = null;
+        this.pageSize = 1024;
+        this.maxCachedPages = 16;
+        this.pageRequests = new Map();
+        this.worker = null;
+        this.workerRequests = new Map();
+        this.nextRequestId = 0;
+        // Values on screen, so rendering only touches cells that change
+        this.shownRegisters = new Uint32Array(TRACE_REGISTERS);
+        this.shownMemory = new Uint32Array(TRACE_MEMORY_CELLS.length);
+        this.shownPipeline = new Array(TRACE_PIPELINE_FIELDS.length).fill(null);
+        this.shownSignals = -1;
+        this.highlights = new Map();
+        this.highlightFrame = null;
         this.isAutoPlaying = false;
-        this.autoPlayInterval = null;
+        this.autoPlayFrame = null;
+        this.lastFrameTime = null;
+        this.cycleBudget = 0;
         this.statistics = {
             instructions: 0,
             cycles: 0,
@@ -17,6 +45,7 @@ class RISCVVisualizer {
         this.initializeEventListeners();
         this.initializeRegisterGrid();
         this.initializeMemoryGrid();
+        this.initializeTraceWorker();
         this.updateSpeedDisplay();
         this.handleExecutionModeChange();
     }
@@ -26,6 +55,7 @@ class RISCVVisualizer {
             instructionsInput: document.getElementById('instructionsInput'),
             fileInput: document.getElementById('fileInput'),
             exampleSelect: document.getElementById('exampleSelect'),
+            cycleInput: document.getElementById('cycleInput'),
             loadExampleBtn: document.getElementById('loadExampleBtn'),
             runBtn: document.getElementById('runBtn'),
             resetBtn: document.getElementById('resetBtn'),
@@ -54,6 +84,40 @@ class RISCVVisualizer {
             statStalls: document.getElementById('statStalls'),
             statIPC: document.getElementById('statIPC')
         };
+        this.pipelineElements = TRACE_PIPELINE_FIELDS.map(spec => document.getElementById(spec.id));
+        this.signalElements = TRACE_SIGNALS.map(signal => ({
+            indicator: document.getElementById(`${signal}-indicator`),
+            value: document.getElementById(`${signal}-value`)
+        }));
+    }
+
+    initializeTraceWorker() {
+        if (typeof Worker === 'undefined') return;
+        try {
+            this.worker = new Worker(TRACE_WORKER_URL);
+        } catch (error) {
+            return;
+        }
+        this.worker.onmessage = (event) => {
+            const { id, decoded, error } = event.data;
+            const pending = this.workerRequests.get(id);
+            if (!pending) return;
+            this.workerRequests.delete(id);
+            if (error === undefined) {
+                pending.resolve(decoded);
+            } else {
+                pending.reject(new Error(error));
+            }
+        };
+        this.worker.onerror = () => {
+            // The worker failed to load; decode on the main thread from now on
+            this.worker.terminate();
+            this.worker = null;
+            for (const pending of this.workerRequests.values()) {
+                fetchTraceWindow(...pending.args).then(pending.resolve, pending.reject);
+            }
+            this.workerRequests.clear();
+        };
     }
 
     initializeEventListeners() {
@@ -78,6 +142,8 @@ class RISCVVisualizer {
 
     initializeRegisterGrid() {
         this.elements.registerGrid.innerHTML = '';
+        this.registerCells = [];
+        this.shownRegisters.fill(0);
         for (let i = 0; i < 32; i++) {
             const registerCell = document.createElement('div');
             registerCell.id = `reg-${i}`;
@@ -101,11 +167,14 @@ class RISCVVisualizer {
             `;
             registerCell.addEventListener('mouseenter', () => this.showRegisterTooltip(i, registerCell));
             this.elements.registerGrid.appendChild(registerCell);
+            this.registerCells.push({ cell: registerCell, value: registerCell.querySelector('.font-mono') });
         }
     }
 
     initializeMemoryGrid() {
         this.elements.memoryGrid.innerHTML = '';
+        this.memoryCells = [];
+        this.shownMemory.fill(0);
         for (let i = 0; i < 16; i++) {
             const memoryCell = document.createElement('div');
             memoryCell.id = `mem-${i * 4}`;
@@ -117,6 +186,7 @@ class RISCVVisualizer {
                 <div class="text-xs font-mono text-white font-bold">0x00000000</div>
             `;
             this.elements.memoryGrid.appendChild(memoryCell);
+            this.memoryCells.push({ cell: memoryCell, value: memoryCell.querySelector('.font-mono') });
         }
     }
 
@@ -193,6 +263,14 @@ class RISCVVisualizer {
             return;
         }
 
+        const cycleInput = this.elements.cycleInput;
+        const cycles = Number(cycleInput.value);
+        const maxCycles = Number(cycleInput.max);
+        if (!Number.isInteger(cycles) || cycles < 1 || cycles > maxCycles) {
+            this.showError(`Cycles to simulate must be a whole number between 1 and ${maxCycles}`);
+            return;
+        }
+
         this.showLoading(true);
         this.hideError();
 
@@ -202,13 +280,18 @@ class RISCVVisualizer {
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ instructions })
+                body: JSON.stringify({ instructions, cycles, cycle_counters: true })
             });
 
             const result = await response.json();
 
             if (result.success) {
-                this.simulationData = result.data;
+                // Only the first page arrives inline; the rest is fetched on demand
+                this.runId = result.run_id || null;
+                this.totalCycles = result.total_cycles || result.data.length;
+                this.pages.clear();
+                this.pageRequests.clear();
+                this.storeWindow(decodeTraceWindow(0, result.data));
                 this.currentCycle = 0;
                 this.updateDisplay();
             } else {
@@ -221,119 +304,187 @@ class RISCVVisualizer {
         }
     }
 
-    updateDisplay() {
-        if (this.simulationData.length === 0) return;
-
-        const cycleData = this.simulationData[this.currentCycle] || {
-            cycle: this.currentCycle,
-            pc: 0,
-            registers: new Array(32).fill(0),
-            pipeline: {
-                if_id: { pc: 0, instruction: '00000013' },
-                id_ex: { pc: 0, instruction: '00000013' },
-                ex_mem: { pc: 0, alu_result: 0 },
-                mem_wb: { pc: 0, result: 0 }
-            },
-            memory: {}
-        };
+    storeWindow(decoded) {
+        if (decoded.count === 0) return;
+        this.pages.set(Math.floor(decoded.start / this.pageSize), decoded);
+    }
 
-        // Update cycle display
-        this.elements.cycleDisplay.textContent = `Cycle: ${cycleData.cycle}`;
-        this.elements.pcValue.textContent = `0x${cycleData.pc.toString(16).padStart(8, '0').toUpperCase()}`;
+    isPageLoaded(page) {
+        // The inline first page of /simulate may be shorter than a full page
+        const decoded = this.pages.get(page);
+        const end = Math.min((page + 1) * this.pageSize, this.totalCycles);
+        return decoded !== undefined && decoded.start + decoded.count >= end;
+    }
 
-        // Update pipeline stages
-        this.updatePipelineStage('if', cycleData.pipeline.if_id);
-        this.updatePipelineStage('id', cycleData.pipeline.id_ex);
-        this.updatePipelineStage('ex', cycleData.pipeline.ex_mem);
-        this.updatePipelineStage('mem', cycleData.pipeline.mem_wb);
-        this.updatePipelineStage('wb', cycleData.pipeline.mem_wb);
+    locateCycle(index) {
+        const decoded = this.pages.get(Math.floor(index / this.pageSize));
+        const row = decoded ? index - decoded.start : -1;
+        return row >= 0 && row < decoded.count ? { decoded, row } : null;
+    }
 
-        // Update registers
-        this.updateRegisters(cycleData.registers);
+    evictDistantPages() {
+        // Keep memory bounded on long runs by dropping pages far from the cursor
+        const currentPage = Math.floor(this.currentCycle / this.pageSize);
+        const keep = Math.floor(this.maxCachedPages / 2);
+        for (const page of [...this.pages.keys()]) {
+            if (Math.abs(page - currentPage) > keep) {
+                this.pages.delete(page);
+            }
+        }
+    }
 
-        // Update memory
-        this.updateMemory(cycleData.memory);
+    requestWindow(runId, start, end) {
+        if (!this.worker) {
+            return fetchTraceWindow(runId, start, end);
+        }
+        return new Promise((resolve, reject) => {
+            const id = this.nextRequestId++;
+            this.workerRequests.set(id, { resolve, reject, args: [runId, start, end] });
+            this.worker.postMessage({ id, runId, start, end });
+        });
+    }
 
-        // Update control signals
-        this.updateControlSignals(cycleData.control_signals || {});
+    loadPage(page) {
+        if (this.isPageLoaded(page) || !this.runId) return Promise.resolve();
+        if (this.pageRequests.has(page)) return this.pageRequests.get(page);
+
+        const runId = this.runId;
+        const start = page * this.pageSize;
+        const end = Math.min(start + this.pageSize, this.totalCycles);
+        const request = this.requestWindow(runId, start, end)
+            .then(decoded => {
+                // Ignore pages that arrive after a new run has started
+                if (runId === this.runId) this.storeWindow(decoded);
+            })
+            .catch(error => {
+                if (runId === this.runId) this.showError(`Network error: ${error.message}`);
+            })
+            .finally(() => this.pageRequests.delete(page));
+        this.pageRequests.set(page, request);
+        return request;
+    }
 
-        // Update statistics
-        this.updateStatistics();
+    prefetchAround(index) {
+        const page = Math.floor(index / this.pageSize);
+        const lastPage = Math.floor((this.totalCycles - 1) / this.pageSize);
+        if (this.isAutoPlaying) {
+            // Stay about a second of playback ahead of the cursor
+            const ahead = Math.min(Math.ceil(this.getCyclesPerSecond() / this.pageSize) + 1,
+                                   Math.floor(this.maxCachedPages / 2));
+            for (let next = page + 1; next <= Math.min(page + ahead, lastPage); next++) {
+                this.loadPage(next);
+            }
+            return;
+        }
+        const offset = index % this.pageSize;
+        if (offset > this.pageSize * 3 / 4 && page < lastPage) {
+            this.loadPage(page + 1);
+        } else if (offset < this.pageSize / 4 && page > 0) {
+            this.loadPage(page - 1);
+        }
+    }
+
+    updateDisplay() {
+        if (this.totalCycles === 0) return;
+
+        const located = this.locateCycle(this.currentCycle);
+        if (located === null) {
+            const cycle = this.currentCycle;
+            this.loadPage(Math.floor(cycle / this.pageSize)).then(() => {
+                if (this.currentCycle === cycle && this.locateCycle(cycle) !== null) {
+                    this.updateDisplay();
+                }
+            });
+            return;
+        }
+        this.prefetchAround(this.currentCycle);
+        this.evictDistantPages();
+
+        const { decoded, row } = located;
+        this.elements.cycleDisplay.textContent = `Cycle: ${decoded.cycle[row]}`;
+        this.elements.pcValue.textContent = this.formatWord(decoded.pc[row]);
+
+        this.updatePipeline(decoded, row);
+        this.updateRegisters(decoded, row);
+        this.updateMemory(decoded, row);
+        this.updateControlSignals(decoded.signals[row]);
+        this.updateStatistics(decoded, row);
 
         // Update navigation buttons
         this.elements.prevCycleBtn.disabled = this.currentCycle === 0;
-        this.elements.nextCycleBtn.disabled = this.currentCycle >= this.simulationData.length - 1;
-        
-        // Update auto mode controls
-        if (this.simulationData.length > 0) {
-            this.elements.playBtn.disabled = false;
-        }
+        this.elements.nextCycleBtn.disabled = this.currentCycle >= this.totalCycles - 1;
+        this.elements.playBtn.disabled = false;
     }
 
-    updatePipelineStage(stage, data) {
-        const pcElement = document.getElementById(`${stage}-pc`);
-        const instrElement = document.getElementById(`${stage}-instr`);
-        const aluElement = document.getElementById(`${stage}-alu`);
-        const dataElement = document.getElementById(`${stage}-data`);
-        const resultElement = document.getElementById(`${stage}-result`);
+    formatWord(value) {
+        return `0x${value.toString(16).padStart(8, '0').toUpperCase()}`;
+    }
 
-        if (pcElement) {
-            pcElement.textContent = `0x${(data.pc || 0).toString(16).padStart(8, '0').toUpperCase()}`;
+    updatePipeline(decoded, row) {
+        const fields = TRACE_PIPELINE_FIELDS.length;
+        TRACE_PIPELINE_FIELDS.forEach((spec, i) => {
+            const value = decoded.pipeline[row * fields + i];
+            const element = this.pipelineElements[i];
+            if (!element || value === this.shownPipeline[i]) return;
+            this.shownPipeline[i] = value;
+            element.textContent = spec.instruction
+                ? value.toString(16).padStart(8, '0').toUpperCase()
+                : this.formatWord(value);
+        });
+    }
+
+    updateRegisters(decoded, row) {
+        const base = row * TRACE_REGISTERS;
+        for (let i = 0; i < TRACE_REGISTERS; i++) {
+            const value = decoded.registers[base + i];
+            if (value === this.shownRegisters[i]) continue;
+            this.shownRegisters[i] = value;
+            this.registerCells[i].value.textContent = this.formatWord(value);
+            this.highlight(this.registerCells[i].cell);
         }
-        
-        if (instrElement) {
-            const instruction = data.instruction || '00000013';
-            instrElement.textContent = typeof instruction === 'string' ? instruction.toUpperCase() : instruction.toString(16).padStart(8, '0').toUpperCase();
+    }
+
+    updateMemory(decoded, row) {
+        const cells = TRACE_MEMORY_CELLS.length;
+        for (let i = 0; i < cells; i++) {
+            const value = decoded.memory[row * cells + i];
+            if (value === this.shownMemory[i]) continue;
+            this.shownMemory[i] = value;
+            this.memoryCells[i].value.textContent = this.formatWord(value);
+            this.highlight(this.memoryCells[i].cell);
         }
-        
-        if (aluElement) {
-            aluElement.textContent = `0x${(data.alu_result || 0).toString(16).padStart(8, '0').toUpperCase()}`;
+    }
+
+    highlight(cell) {
+        // Changed cells share one sweep per frame instead of a timer each
+        if (!this.highlights.has(cell)) {
+            cell.classList.add('changed');
         }
-        
-        if (dataElement) {
-            dataElement.textContent = `0x${(data.alu_result || 0).toString(16).padStart(8, '0').toUpperCase()}`;
-        }
-        
-        if (resultElement) {
-            resultElement.textContent = `0x${(data.result || 0).toString(16).padStart(8, '0').toUpperCase()}`;
+        this.highlights.set(cell, performance.now() + HIGHLIGHT_MS);
+        if (this.highlightFrame === null) {
+            this.highlightFrame = requestAnimationFrame(now => this.sweepHighlights(now));
         }
     }
 
-    updateRegisters(registers) {
-        for (let i = 0; i < 32; i++) {
-            const registerCell = document.getElementById(`reg-${i}`);
-            const valueElement = registerCell.querySelector('.font-mono');
-            const newValue = registers[i] || 0;
-            
-            valueElement.textContent = `0x${newValue.toString(16).padStart(8, '0').toUpperCase()}`;
-            
-            // Highlight changed registers
-            if (newValue !== this.previousRegisters[i]) {
-                registerCell.classList.add('changed');
-                setTimeout(() => registerCell.classList.remove('changed'), 1000);
+    sweepHighlights(now) {
+        this.highlightFrame = null;
+        for (const [cell, expires] of this.highlights) {
+            if (expires <= now) {
+                cell.classList.remove('changed');
+                this.highlights.delete(cell);
             }
         }
-        
-        this.previousRegisters = [...registers];
+        if (this.highlights.size > 0) {
+            this.highlightFrame = requestAnimationFrame(time => this.sweepHighlights(time));
+        }
     }
 
-    updateMemory(memory) {
-        for (let i = 0; i < 16; i++) {
-            const address = i * 4;
-            const memoryCell = document.getElementById(`mem-${address}`);
-            const valueElement = memoryCell.querySelector('.font-mono');
-            const newValue = memory[address] || 0;
-            
-            valueElement.textContent = `0x${newValue.toString(16).padStart(8, '0').toUpperCase()}`;
-            
-            // Highlight changed memory
-            if (newValue !== this.previousMemory[address]) {
-                memoryCell.classList.add('changed');
-                setTimeout(() => memoryCell.classList.remove('changed'), 1000);
-            }
+    clearHighlights() {
+        if (this.highlightFrame !== null) {
+            cancelAnimationFrame(this.highlightFrame);
+            this.highlightFrame = null;
         }
-        
-        this.previousMemory = { ...memory };
+        this.highlights.clear();
     }
 
     previousCycle() {
@@ -344,17 +495,19 @@ class RISCVVisualizer {
     }
 
     nextCycle() {
-        if (this.currentCycle < this.simulationData.length - 1) {
+        if (this.currentCycle < this.totalCycles - 1) {
             this.currentCycle++;
             this.updateDisplay();
         }
     }
 
     reset() {
-        this.simulationData = [];
+        this.pages.clear();
+        this.totalCycles = 0;
         this.currentCycle = 0;
-        this.previousRegisters = new Array(32).fill(0);
-        this.previousMemory = {};
+        this.runId = null;
+        this.pageRequests.clear();
+        this.clearHighlights();
         this.pauseAutoExecution(); // Stop any auto execution
         
         this.elements.instructionsInput.value = '';
@@ -373,6 +526,7 @@ class RISCVVisualizer {
             if (pcElement) pcElement.textContent = '0x00000000';
             if (instrElement) instrElement.textContent = '00000013';
         });
+        this.shownPipeline.fill(null);
         
         // Reset registers and memory
         this.initializeRegisterGrid();
@@ -401,14 +555,13 @@ class RISCVVisualizer {
     }
 
     updateControlSignals(signals) {
-        const signalNames = ['regwrite', 'memread', 'memwrite', 'branch', 'alusrc', 'memtoreg'];
-        
-        signalNames.forEach(signal => {
-            const indicator = document.getElementById(`${signal}-indicator`);
-            const value = document.getElementById(`${signal}-value`);
-            
+        // signals has bit i set when TRACE_SIGNALS[i] is asserted
+        if (signals === this.shownSignals) return;
+        this.shownSignals = signals;
+
+        this.signalElements.forEach(({ indicator, value }, bit) => {
             if (indicator && value) {
-                const isActive = signals[signal] || false;
+                const isActive = (signals >> bit) & 1;
                 value.textContent = isActive ? '1' : '0';
                 
                 if (isActive) {
@@ -421,7 +574,7 @@ class RISCVVisualizer {
     }
 
     showRegisterTooltip(regNum, element) {
-        const value = this.previousRegisters[regNum] || 0;
+        const value = this.shownRegisters[regNum];
         const regNames = {
             0: 'zero (always 0)',
             1: 'ra (return address)',
@@ -451,25 +604,20 @@ class RISCVVisualizer {
     }
 
     updateSpeedDisplay() {
-        const speed = this.elements.speedSlider.value;
-        const speedMap = {
-            1: '1.0s', 2: '0.9s', 3: '0.8s', 4: '0.6s', 5: '0.5s',
-            6: '0.4s', 7: '0.3s', 8: '0.2s', 9: '0.15s', 10: '0.1s'
-        };
-        this.elements.speedDisplay.textContent = `${speedMap[speed] || '0.5s'}`;
+        this.elements.speedDisplay.textContent = this.getPlaybackSpeed().label;
     }
 
-    getAutoExecutionSpeed() {
+    getPlaybackSpeed() {
         const speed = parseInt(this.elements.speedSlider.value);
-        const speedMap = {
-            1: 1000, 2: 900, 3: 800, 4: 600, 5: 500,
-            6: 400, 7: 300, 8: 200, 9: 150, 10: 100
-        };
-        return speedMap[speed] || 500;
+        return PLAYBACK_SPEEDS[speed - 1] || PLAYBACK_SPEEDS[4];
+    }
+
+    getCyclesPerSecond() {
+        return this.getPlaybackSpeed().rate;
     }
 
     startAutoExecution() {
-        if (!this.simulationData || this.simulationData.length === 0) {
+        if (this.totalCycles === 0) {
             this.showError('Please run simulation first');
             return;
         }
@@ -479,49 +627,76 @@ class RISCVVisualizer {
         this.elements.pauseBtn.classList.remove('hidden');
         this.elements.pipelineState.textContent = 'Auto Playing';
 
-        const speed = this.getAutoExecutionSpeed();
-        this.autoPlayInterval = setInterval(() => {
-            if (this.currentCycle < this.simulationData.length - 1) {
-                this.nextCycle();
+        this.lastFrameTime = null;
+        this.cycleBudget = 0;
+        this.autoPlayFrame = requestAnimationFrame(now => this.playFrame(now));
+    }
+
+    playFrame(now) {
+        // Advance by the cycles due since the last frame and draw only the
+        // newest one, so fast speeds skip cycles instead of falling behind
+        this.autoPlayFrame = null;
+        if (!this.isAutoPlaying) return;
+
+        if (this.lastFrameTime !== null) {
+            // Cap the step so a tab returning from the background does not leap ahead
+            const elapsed = Math.min(now - this.lastFrameTime, 250);
+            this.cycleBudget += elapsed * this.getCyclesPerSecond() / 1000;
+        }
+        this.lastFrameTime = now;
+
+        const steps = Math.floor(this.cycleBudget);
+        if (steps > 0) {
+            const target = Math.min(this.currentCycle + steps, this.totalCycles - 1);
+            if (this.locateCycle(target) !== null) {
+                this.cycleBudget -= steps;
+                this.currentCycle = target;
+                this.updateDisplay();
+                if (this.elements.pipelineState.textContent !== 'Auto Playing') {
+                    this.elements.pipelineState.textContent = 'Auto Playing';
+                }
             } else {
-                this.pauseAutoExecution();
-                this.elements.pipelineState.textContent = 'Completed';
+                // Hold until the page arrives rather than building up a backlog
+                this.cycleBudget = 0;
+                this.loadPage(Math.floor(target / this.pageSize));
+                this.elements.pipelineState.textContent = 'Buffering';
             }
-        }, speed);
+        }
+
+        if (this.currentCycle >= this.totalCycles - 1) {
+            this.pauseAutoExecution();
+            this.elements.pipelineState.textContent = 'Completed';
+            return;
+        }
+        this.autoPlayFrame = requestAnimationFrame(time => this.playFrame(time));
     }
 
     pauseAutoExecution() {
         this.isAutoPlaying = false;
-        if (this.autoPlayInterval) {
-            clearInterval(this.autoPlayInterval);
-            this.autoPlayInterval = null;
+        if (this.autoPlayFrame !== null) {
+            cancelAnimationFrame(this.autoPlayFrame);
+            this.autoPlayFrame = null;
         }
         this.elements.playBtn.classList.remove('hidden');
         this.elements.pauseBtn.classList.add('hidden');
         this.elements.pipelineState.textContent = 'Paused';
     }
 
-    updateStatistics() {
-        if (!this.simulationData || this.simulationData.length === 0) {
-            this.resetStatistics();
+    updateStatistics(decoded, row) {
+        if (!decoded.hasCounters[row]) {
             return;
         }
 
-        const currentData = this.simulationData[this.currentCycle];
-        
-        // Count instructions executed (non-NOP instructions)
-        const totalInstructions = this.simulationData.filter(cycle => 
-            cycle.pipeline && 
-            cycle.pipeline.WB && 
-            cycle.pipeline.WB.instruction && 
-            cycle.pipeline.WB.instruction !== '00000013'
-        ).length;
+        // The simulator's counters cover the clock cycles before this one
+        const base = row * TRACE_COUNTERS.length;
+        const totalInstructions = decoded.counters[base];
+        const elapsedCycles = this.currentCycle;
 
         // Calculate CPI (Cycles Per Instruction)
-        const cpi = totalInstructions > 0 ? (this.currentCycle + 1) / totalInstructions : 0;
+        const cpi = totalInstructions > 0 ? elapsedCycles / totalInstructions : 0;
         
         // Calculate IPC (Instructions Per Cycle)
-        const ipc = this.currentCycle > 0 ? totalInstructions / (this.currentCycle + 1) : 0;
+        const ipc = elapsedCycles > 0 ? totalInstructions / elapsedCycles : 0;
 
         // Update statistics display
         this.elements.statInstructions.textContent = totalInstructions;
@@ -529,12 +704,8 @@ class RISCVVisualizer {
         this.elements.statCPI.textContent = cpi.toFixed(2);
         this.elements.statIPC.textContent = ipc.toFixed(2);
         
-        // Simulate hazard and stall detection (placeholder values)
-        const hazards = Math.floor(totalInstructions * 0.1); // Assume 10% hazard rate
-        const stalls = Math.floor(totalInstructions * 0.05); // Assume 5% stall rate
-        
-        this.elements.statHazards.textContent = hazards;
-        this.elements.statStalls.textContent = stalls;
+        this.elements.statHazards.textContent = decoded.counters[base + 1];
+        this.elements.statStalls.textContent = decoded.counters[base + 2];
     }
 
     resetStatistics() {
@@ -0,0 +1,112 @@
+// Decoding of /runs/<id>/cycles windows into flat typed arrays.
+//
+// The visualizer runs this file as a Web Worker, so fetching, JSON parsing
+// and flattening of long traces stay off the main thread; the decoded
+// arrays are transferred back without copying. It is also loaded as a
+// plain script, so the page can decode on the main thread where workers
+// are unavailable.
+
+const TRACE_REGISTERS = 32;
+// Memory cells shown in the grid: words of the cycle's 'memory' view, which
+// is keyed by word address, so cell i shows byte address 4 * i
+const TRACE_MEMORY_CELLS = Array.from({ length: 16 }, (_, i) => i);
+const TRACE_SIGNALS = ['regwrite', 'memread', 'memwrite', 'branch', 'alusrc', 'memtoreg'];
+const TRACE_COUNTERS = ['retired', 'raw_hazards', 'stalls'];
+// Pipeline values shown, by element ID; instruction words have no 0x prefix
+const TRACE_PIPELINE_FIELDS = [
+    { id: 'if-pc', stage: 'if_id', field: 'pc' },
+    { id: 'if-instr', stage: 'if_id', field: 'instruction', instruction: true },
+    { id: 'id-pc', stage: 'id_ex', field: 'pc' },
+    { id: 'id-instr', stage: 'id_ex', field: 'instruction', instruction: true },
+    { id: 'ex-pc', stage: 'ex_mem', field: 'pc' },
+    { id: 'ex-alu', stage: 'ex_mem', field: 'alu_result' },
+    { id: 'mem-pc', stage: 'mem_wb', field: 'pc' },
+    { id: 'mem-data', stage: 'mem_wb', field: 'alu_result' },
+    { id: 'wb-pc', stage: 'mem_wb', field: 'pc' },
+    { id: 'wb-result', stage: 'mem_wb', field: 'result' }
+];
+const NOP_WORD = 0x00000013;
+
+function decodeTraceWindow(start, cycles) {
+    // One row per cycle in each array; values are unsigned 32-bit words
+    const count = cycles.length;
+    const fields = TRACE_PIPELINE_FIELDS.length;
+    const decoded = {
+        start,
+        count,
+        cycle: new Uint32Array(count),
+        pc: new Uint32Array(count),
+        registers: new Uint32Array(count * TRACE_REGISTERS),
+        memory: new Uint32Array(count * TRACE_MEMORY_CELLS.length),
+        pipeline: new Uint32Array(count * fields),
+        signals: new Uint8Array(count),
+        counters: new Uint32Array(count * TRACE_COUNTERS.length),
+        hasCounters: new Uint8Array(count)
+    };
+
+    cycles.forEach((cycle, row) => {
+        decoded.cycle[row] = cycle.cycle;
+        decoded.pc[row] = cycle.pc || 0;
+
+        const registers = cycle.registers || [];
+        for (let i = 0; i < TRACE_REGISTERS; i++) {
+            decoded.registers[row * TRACE_REGISTERS + i] = registers[i] || 0;
+        }
+
+        const memory = cycle.memory || {};
+        TRACE_MEMORY_CELLS.forEach((address, i) => {
+            decoded.memory[row * TRACE_MEMORY_CELLS.length + i] = memory[address] || 0;
+        });
+
+        const pipeline = cycle.pipeline || {};
+        TRACE_PIPELINE_FIELDS.forEach((spec, i) => {
+            const value = (pipeline[spec.stage] || {})[spec.field];
+            let word = value || 0;
+            if (spec.instruction) {
+                word = typeof value === 'string' ? parseInt(value, 16) : (value === undefined ? NOP_WORD : value);
+            }
+            decoded.pipeline[row * fields + i] = word;
+        });
+
+        const signals = cycle.control_signals || {};
+        TRACE_SIGNALS.forEach((signal, bit) => {
+            if (signals[signal]) decoded.signals[row] |= 1 << bit;
+        });
+
+        if (cycle.counters) {
+            decoded.hasCounters[row] = 1;
+            TRACE_COUNTERS.forEach((name, i) => {
+                decoded.counters[row * TRACE_COUNTERS.length + i] = cycle.counters[name] || 0;
+            });
+        }
+    });
+    return decoded;
+}
+
+function traceWindowBuffers(decoded) {
+    return Object.values(decoded)
+        .filter(value => ArrayBuffer.isView(value))
+        .map(value => value.buffer);
+}
+
+async function fetchTraceWindow(runId, start, end) {
+    const response = await fetch(`/runs/${runId}/cycles?from=${start}&to=${end}&counters=1`);
+    const result = await response.json();
+    if (!result.success) {
+        throw new Error(result.error);
+    }
+    return decodeTraceWindow(result.from, result.data);
+}
+
+// importScripts only exists in worker scope
+if (typeof importScripts === 'function') {
+    self.onmessage = async (event) => {
+        const { id, runId, start, end } = event.data;
+        try {
+            const decoded = await fetchTraceWindow(runId, start, end);
+            self.postMessage({ id, decoded }, traceWindowBuffers(decoded));
+        } catch (error) {
+            self.postMessage({ id, error: error.message });
+        }
+    };
+}
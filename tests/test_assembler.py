@@ -0,0 +1,54 @@
+import pytest
+
+from assembler import AssemblyError, assemble
+
+
+@pytest.mark.parametrize('source, words', [
+    ('add x3, x1, x2', ['002081b3']),
+    ('sub x3, x1, x2', ['402081b3']),
+    ('addi x1, x0, 10', ['00a00093']),
+    ('addi sp, sp, -16', ['ff010113']),
+    ('slli x1, x2, 3', ['00311093']),
+    ('srai x1, x2, 3', ['40315093']),
+    ('lw x5, 8(x2)', ['00812283']),
+    ('sw x5, 12(x2)', ['00512623']),
+    ('beq x1, x2, 8', ['00208463']),
+    ('jal x1, 16', ['010000ef']),
+    ('lui x5, 0x12345', ['123452b7']),
+    ('ecall', ['00000073']),
+    ('.word 0xdeadbeef', ['deadbeef']),
+])
+def test_base_instruction_encodings(source, words):
+    assert assemble(source).split() == words
+
+
+@pytest.mark.parametrize('source, words', [
+    ('nop', ['00000013']),
+    ('ret', ['00008067']),
+    ('li a0, -1', ['fff00513']),
+    ('li x1, 0x12345678', ['123450b7', '67808093']),
+])
+def test_pseudo_instruction_expansion(source, words):
+    assert assemble(source).split() == words
+
+
+def test_backward_label_resolves_to_negative_offset():
+    source = "loop:\naddi x1, x1, -1\nbne x1, x0, loop"
+    assert assemble(source).split() == ['fff08093', 'fe009ee3']
+
+
+def test_hex_lines_pass_through_between_assembly():
+    assert assemble("00a00093\naddi sp, sp, -16  # comment").split() == ['00a00093', 'ff010113']
+
+
+@pytest.mark.parametrize('source, line, message', [
+    ('foo x1', 1, "unknown instruction 'foo'"),
+    ('add x1, x2, x40', 1, "unknown register 'x40'"),
+    ('addi x1, x0, 5000', 1, 'out of range'),
+    ('addi x1, x0, 1\nbeq x1, x2, missing', 2, "undefined label 'missing'"),
+])
+def test_errors_report_line(source, line, message):
+    with pytest.raises(AssemblyError) as error:
+        assemble(source)
+    assert error.value.line == line
+    assert message in str(error.value)
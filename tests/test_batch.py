@@ -0,0 +1,116 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app
+import batch
+from assembler import assemble
+
+PROGRAM = assemble("""
+    addi x1, x0, 4
+    addi x2, x0, 6
+    sw x2, 0(x1)
+    add x3, x1, x2
+""")
+CYCLES = 20
+
+
+@pytest.fixture
+def python_only(monkeypatch):
+    monkeypatch.setattr(batch, 'get_simulation_model', lambda: None)
+    monkeypatch.setattr(app, 'get_simulation_model', lambda: None)
+
+
+@pytest.fixture
+def client(python_only, monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(batch, 'get_executor', lambda: executor)
+    yield app.app.test_client()
+    executor.shutdown()
+
+
+def traced_last_cycle(fast_forward=None):
+    cycles = list(app.stream_python_simulation(PROGRAM, CYCLES, fast_forward))
+    memory = {}
+    for cycle in cycles:
+        memory.update(cycle['memory_writes'])
+    return cycles[-1], {str(addr): value for addr, value in sorted(memory.items()) if value}
+
+
+@pytest.mark.parametrize('backend', ['python', 'auto'])
+def test_summary_matches_the_traced_run(python_only, backend):
+    summary = batch.summarize_program('p', PROGRAM, CYCLES, backend)
+    last, memory = traced_last_cycle()
+    assert summary['success'], summary
+    assert summary['backend'] == 'python'
+    assert summary['cycles'] == CYCLES
+    assert summary['pc'] == last['pc']
+    assert summary['registers'] == last['registers']
+    assert summary['memory'] == memory
+    assert summary['counters'] == app.performance_summary(last['counters'], CYCLES - 1)
+
+
+def test_summary_fast_forwards(python_only):
+    _, fast_forward = app.parse_run_options({'fast_forward': {'instructions': 2}})
+    summary = batch.summarize_program('p', PROGRAM, CYCLES, 'python', fast_forward)
+    last, _ = traced_last_cycle(fast_forward)
+    assert summary['fast_forward']['instructions'] == 2
+    assert summary['pc'] == last['pc']
+    assert summary['registers'] == last['registers']
+
+
+def test_missing_verilog_fails_before_simulating(python_only, monkeypatch):
+    def simulate(*args):
+        raise AssertionError("simulated without a Verilog model")
+
+    monkeypatch.setattr(batch, 'start_python_simulation', simulate)
+    monkeypatch.setattr(batch, 'stream_riscv_records', simulate)
+    summary = batch.summarize_program('p', PROGRAM, CYCLES, 'verilog')
+    assert not summary['success']
+    assert summary['error'] == batch.VERILOG_UNAVAILABLE
+    with pytest.raises(RuntimeError):
+        next(batch.run_batch([('p', PROGRAM)], CYCLES, 'verilog', executor=object()))
+
+
+def post_batch(client, **options):
+    response = client.post('/batch', json=dict({'cycles': CYCLES, 'backend': 'python'}, **options))
+    if response.mimetype != 'application/x-ndjson':
+        return response.get_json()
+    return [json.loads(line) for line in response.data.decode().splitlines()]
+
+
+def test_batch_endpoint_streams_summaries_then_the_aggregate(client):
+    records = post_batch(client, programs=[PROGRAM, {'name': 'second', 'instructions': PROGRAM}])
+    assert [record['type'] for record in records] == ['program', 'program', 'aggregate']
+    names = {record['data']['name'] for record in records[:2]}
+    assert names == {'program-0', 'second'}
+    aggregate = records[-1]['data']
+    assert aggregate['succeeded'] == 2
+    assert aggregate['total_cycles'] == 2 * CYCLES
+
+
+def test_batch_endpoint_accepts_fast_forward(client):
+    records = post_batch(client, programs=[PROGRAM], fast_forward={'instructions': 2})
+    assert records[0]['data']['fast_forward']['instructions'] == 2
+
+
+@pytest.mark.parametrize('options', [
+    {'programs': []},
+    {'programs': [PROGRAM], 'fast_forward': {'instructions': -1}},
+    {'programs': [PROGRAM], 'backend': 'verilog'},
+])
+def test_batch_endpoint_rejects_bad_requests(client, options):
+    result = post_batch(client, **options)
+    assert result['success'] is False
+
+
+def test_command_line_prints_ndjson(tmp_path, capsys):
+    path = tmp_path / 'program.hex'
+    path.write_text(PROGRAM)
+    assert batch.main([str(path), '--cycles', str(CYCLES), '--backend', 'python',
+                       '--workers', '1', '--json']) == 0
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [record['type'] for record in records] == ['program', 'aggregate']
+    assert records[0]['data']['name'] == str(path)
+    assert records[0]['data']['cycles'] == CYCLES
@@ -0,0 +1,131 @@
+import copy
+
+import pytest
+
+import app
+import cosim
+from assembler import assemble
+from cosim import COSIM_MODES, compare_traces, cosimulate, diff_cycle, python_states
+from riscv_simulator import RISCVSimulator
+
+PROGRAM = assemble("""
+    addi x1, x0, 5
+    addi x2, x0, 9
+    nop
+    nop
+    sw x1, 8(x0)
+    add x3, x1, x2
+    beq x0, x0, -24
+""")
+CYCLES = 40
+
+
+def states(mode):
+    sim = RISCVSimulator()
+    sim.load_instructions(PROGRAM)
+    return list(python_states(sim, CYCLES, mode))
+
+
+@pytest.mark.parametrize('mode', ['pipeline', 'architectural'])
+def test_identical_runs_match(mode):
+    report = compare_traces(states(mode), states(mode), mode)
+    assert report == {'mode': mode, 'match': True, 'cycles_compared': CYCLES, 'first_divergence': None}
+
+
+def test_architectural_states_follow_the_pipeline_model():
+    pipeline, architectural = states('pipeline'), states('architectural')
+    assert [(c['cycle'], c['pc'], c['registers']) for c in pipeline] == \
+        [(c['cycle'], c['pc'], c['registers']) for c in architectural]
+    assert [c['memory_writes'] for c in pipeline] == [c['memory_writes'] for c in architectural]
+
+
+def test_first_divergence_is_reported():
+    verilog = states('pipeline')
+    verilog[12]['registers'][3] += 1
+    verilog[12]['pipeline']['ex_mem']['alu_result'] += 1
+    verilog[12]['counters']['raw_hazards'] += 1
+    report = compare_traces(verilog, states('pipeline'))
+    divergence = report['first_divergence']
+    assert not report['match']
+    assert report['cycles_compared'] == 12
+    assert divergence['cycle'] == verilog[12]['cycle']
+    assert {d['field'] for d in divergence['differences']} == {
+        'x3', 'pipeline.ex_mem.alu_result', 'counters.raw_hazards'}
+    assert divergence['in_flight']['if_id'] == verilog[12]['pipeline']['if_id']['instruction']
+
+
+def test_architectural_mode_ignores_pipeline_fields():
+    verilog = states('pipeline')
+    verilog[5]['pipeline']['id_ex']['imm'] += 1
+    assert compare_traces(verilog, states('pipeline'), 'architectural')['match']
+    assert not compare_traces(verilog, states('pipeline'), 'pipeline')['match']
+
+
+def test_memory_is_compared_by_effect():
+    python = [{'cycle': 1, 'pc': 0, 'registers': [0] * 32, 'memory_writes': {10: 123}},
+              {'cycle': 2, 'pc': 4, 'registers': [0] * 32, 'memory_writes': {}}]
+    verilog = copy.deepcopy(python)
+    # Rewriting a word with its own value is not a divergence
+    verilog[1]['memory_writes'] = {'10': 123}
+    assert compare_traces(verilog, python, 'architectural')['match']
+    verilog[1]['memory_writes'] = {'10': 0, '11': 4}
+    memory = ({10: 123}, {10: 123})
+    assert diff_cycle(verilog[1], python[1], 'architectural', memory) == [
+        {'field': 'memory[10]', 'verilog': 0, 'python': 123},
+        {'field': 'memory[11]', 'verilog': 4, 'python': 0}]
+
+
+def test_trace_length_divergence():
+    report = compare_traces(states('architectural')[:10], states('architectural'), 'architectural')
+    assert report['cycles_compared'] == 10
+    assert report['first_divergence']['differences'] == [
+        {'field': 'trace_length', 'verilog': 10, 'python': 11}]
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        compare_traces([], [], 'registers')
+
+
+# Stores to word 75 (wraps to 11 in 64 words) and word 8190 (wraps to 62)
+WRAPPING_PROGRAM = assemble("""
+    addi x1, x0, 300
+    addi x2, x0, 7
+    addi x4, x0, 2047
+    nop
+    nop
+    nop
+    slli x4, x4, 4
+    nop
+    nop
+    nop
+    sw x2, 0(x1)
+    sw x2, 8(x4)
+    nop
+    nop
+    lw x3, 44(x0)
+    lw x5, 248(x0)
+""")
+
+
+@pytest.fixture
+def small_data_memory(monkeypatch):
+    """The Verilog model rebuilt with 64 words of data memory"""
+    monkeypatch.setattr(app, 'SIM_DMEM_WORDS', 64)
+    monkeypatch.setattr(cosim, 'SIM_DMEM_WORDS', 64)
+    monkeypatch.setattr(app, '_compiled_models', {})
+    if app.get_simulation_model() is None:
+        pytest.skip("Verilog simulation is unavailable")
+
+
+@pytest.mark.parametrize('mode', COSIM_MODES)
+def test_rtl_data_memory_wraps_like_python(small_data_memory, mode):
+    report = cosimulate(WRAPPING_PROGRAM, 30, None, mode)
+    assert report['match'], report['first_divergence']
+
+    run_info = {}
+    run = app.run_riscv_simulation(WRAPPING_PROGRAM, 30, None, run_info)
+    assert run_info['backend'] == 'verilog'
+    writes = sorted(write for writes in run.writes.values() for write in writes)
+    assert writes == [(10, 123), (11, 7), (62, 7)]
+    assert run.window(29, 30)[0]['registers'][3:6] == [7, 0x7FF0, 7]
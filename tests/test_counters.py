@@ -0,0 +1,70 @@
+import pytest
+
+import app
+from assembler import assemble
+from riscv_simulator import PERF_COUNTERS, RISCVSimulator
+
+# Each consumer's distance from its producer is in the comment. Without
+# write-through, producers one to three instructions ahead are hazards.
+PROGRAM = assemble("""
+    addi x1, x0, 5
+    addi x2, x1, 1      # 1: hazard
+    addi x6, x0, 1
+    nop
+    nop
+    addi x7, x6, 0      # 3: hazard, reads the stale zero
+    add x3, x1, x2      # 4 and 5: none
+    sw x3, 0(x0)        # 1: hazard
+    lw x4, 0(x0)
+    add x5, x4, x0      # 1: hazard
+    beq x0, x0, 64
+""")
+CYCLES = 30
+EXPECTED = {'retired': 9, 'raw_hazards': 4, 'stalls': 0, 'forwards': 0, 'flushes': 0,
+            'taken_branches': 1, 'loads': 1, 'stores': 1}
+
+
+def python_cycles():
+    sim = RISCVSimulator()
+    sim.load_instructions(PROGRAM)
+    return list(sim.run(CYCLES)), sim
+
+
+def test_python_counters():
+    cycles, sim = python_cycles()
+    assert sim.counters.as_dict() == EXPECTED
+    # Reported counters cover the clock edges before each cycle
+    assert cycles[0]['counters'] == dict.fromkeys(PERF_COUNTERS, 0)
+    assert cycles[-1]['counters'] == EXPECTED
+    # addi x7, x6, 0 read x6 before it was written back
+    assert sim.registers[6:8] == [1, 0]
+
+
+def test_python_counters_are_cumulative():
+    cycles, _ = python_cycles()
+    for name in PERF_COUNTERS:
+        values = [cycle['counters'][name] for cycle in cycles]
+        assert values == sorted(values)
+
+
+def test_stored_run_reports_final_counters():
+    run = app.fallback_python_simulation(PROGRAM, CYCLES + 1)
+    assert run.final_counters() == EXPECTED
+    summary = app.run_performance(run)
+    assert summary['retired'] == 9
+    assert summary['cycles'] == CYCLES
+
+
+@pytest.fixture(scope='module')
+def model_path():
+    path = app.get_simulation_model()
+    if path is None:
+        pytest.skip("Verilog simulation is unavailable")
+    return path
+
+
+def test_rtl_counters_match_python(model_path):
+    with app.verilog_run(model_path, PROGRAM, CYCLES, None, {}) as run:
+        verilog = [cycle['counters'] for cycle in app.iter_verilog_cycles(run)]
+    assert verilog == [cycle['counters'] for cycle in python_cycles()[0]]
+    assert verilog[-1] == EXPECTED
@@ -0,0 +1,139 @@
+import json
+
+import pytest
+
+import app
+from assembler import assemble
+from riscv_simulator import RISCVSimulator
+
+# No forwarding in the pipeline, so dependent instructions are three NOPs
+# apart and the pipelined and functional results agree
+PROGRAM = assemble("""
+    addi x1, x0, 5
+    addi x2, x0, 9
+    nop
+    nop
+    nop
+    add x3, x1, x2
+    nop
+    nop
+    nop
+    sw x3, 8(x0)
+    addi x4, x3, 1
+""")
+LENGTH = len(PROGRAM.split())
+ADD_PC = 20
+SPIN = assemble("beq x0, x0, 0")
+
+
+@pytest.fixture
+def python_only(monkeypatch):
+    monkeypatch.setattr(app, 'get_simulation_model', lambda: None)
+
+
+def limits(fast_forward):
+    return app.parse_run_options({'fast_forward': fast_forward})[1]
+
+
+@pytest.mark.parametrize('fast_forward, expected', [
+    ({'pc': '0x14'}, {'max_instructions': app.SIM_MAX_FAST_FORWARD, 'until_pc': ADD_PC}),
+    ({'pc': ADD_PC, 'instructions': 3}, {'max_instructions': 3, 'until_pc': ADD_PC}),
+    ({'instructions': 4}, {'max_instructions': 4, 'until_pc': None}),
+    ({'cycles': '7'}, {'max_instructions': 7, 'until_pc': None}),
+    ({}, None),
+])
+def test_run_options_read_the_fast_forward_target(fast_forward, expected):
+    assert limits(fast_forward) == expected
+
+
+@pytest.mark.parametrize('data', [
+    {'cycles': 0},
+    {'fast_forward': 5},
+    {'fast_forward': {'instructions': -1}},
+    {'fast_forward': {'instructions': app.SIM_MAX_FAST_FORWARD + 1}},
+    {'fast_forward': {'steps': 5}},
+    {'fast_forward': {'pc': 'start'}},
+])
+def test_run_options_reject_bad_targets(data):
+    with pytest.raises(ValueError):
+        app.parse_run_options(data)
+
+
+def test_rtl_state_after_fast_forwarding_to_a_pc(tmp_path):
+    state_path, summary, image = app.fast_forward_rtl_state(PROGRAM, limits({'pc': 36}), str(tmp_path))
+    assert summary == {'instructions': 9, 'pc': 36, 'stop_reason': 'pc'}
+    assert image == app.RTL_INITIAL_MEMORY
+    lines = open(state_path).read().split()
+    # PC, then x1..x31, then each nonzero memory word at its @address
+    assert [int(word, 16) for word in lines[:32]] == [36, 5, 9, 14] + [0] * 28
+    assert lines[32:] == ['@2a', '0000007b']
+
+
+def test_rtl_state_after_fast_forwarding_an_instruction_count(tmp_path):
+    state_path, summary, image = app.fast_forward_rtl_state(PROGRAM, limits({'instructions': LENGTH}),
+                                                            str(tmp_path))
+    assert summary == {'instructions': LENGTH, 'pc': 4 * LENGTH, 'stop_reason': 'limit'}
+    assert image == {2: 14, **app.RTL_INITIAL_MEMORY}
+    lines = open(state_path).read().split()
+    assert [int(word, 16) for word in lines[1:5]] == [5, 9, 14, 15]
+    assert lines[32:] == ['@22', '0000000e', '@2a', '0000007b']
+
+
+def test_stopping_while_fast_forwarding_is_raised(python_only, tmp_path):
+    def stop():
+        raise app.SimulationStopped("stopped")
+
+    with pytest.raises(app.SimulationStopped):
+        app.fast_forward_rtl_state(SPIN, limits({'instructions': app.SIM_MAX_FAST_FORWARD}), str(tmp_path),
+                                   stop)
+    with pytest.raises(app.SimulationStopped):
+        next(app.stream_riscv_simulation(SPIN, 10, limits({'pc': 4}), check=stop))
+
+
+def test_pipeline_resumes_empty_at_the_functional_pc():
+    sim = RISCVSimulator()
+    sim.load_instructions(PROGRAM)
+    assert sim.fast_forward(until_pc=ADD_PC) == (5, 'pc')
+    assert sim.pc == ADD_PC
+    assert sim.registers[:4] == [0, 5, 9, 0]
+
+    fresh = RISCVSimulator()
+    fresh.load_instructions(PROGRAM)
+    first, = fresh.run(1)
+    resumed = next(sim.run(1))
+    assert resumed['cycle'] == 6
+    assert resumed['pc'] == ADD_PC
+    assert resumed['pipeline'] == first['pipeline']
+    assert resumed['memory_writes'] == first['memory_writes']
+
+
+def test_fast_forwarded_run_ends_like_the_full_run():
+    full = RISCVSimulator()
+    full.load_instructions(PROGRAM)
+    expected = list(full.run(LENGTH + 5))[-1]
+
+    sim = RISCVSimulator()
+    sim.load_instructions(PROGRAM)
+    sim.fast_forward(max_instructions=7)
+    last = list(sim.run(LENGTH - 7 + 5))[-1]
+    assert last['cycle'] == expected['cycle']
+    assert last['registers'] == expected['registers']
+    assert dict(sim.memory.nonzero()) == dict(full.memory.nonzero())
+
+
+def test_stream_fast_forwards_on_the_python_engine(python_only):
+    run_info = {}
+    cycles = list(app.stream_riscv_simulation(PROGRAM, 4, limits({'pc': ADD_PC}), run_info))
+    assert run_info == {'backend': 'python',
+                        'fast_forward': {'instructions': 5, 'pc': ADD_PC, 'stop_reason': 'pc'}}
+    assert [cycle['cycle'] for cycle in cycles] == [6, 7, 8, 9]
+    assert cycles[0]['pc'] == ADD_PC
+
+
+def test_stream_endpoint_reports_the_fast_forward_first(python_only):
+    response = app.app.test_client().post('/simulate/stream', json={
+        'instructions': PROGRAM, 'cycles': 3, 'fast_forward': {'instructions': 5}})
+    events = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [event['type'] for event in events] == ['fast_forward', 'cycle', 'cycle', 'cycle', 'done']
+    assert events[0]['data'] == {'instructions': 5, 'pc': ADD_PC, 'stop_reason': 'limit'}
+    assert events[1]['data']['cycle'] == 6
@@ -0,0 +1,169 @@
+import threading
+import time
+
+import pytest
+
+import app
+import jobs
+from assembler import assemble
+from jobs import JobQueue
+
+PROGRAM = assemble("""
+    addi x1, x0, 1
+    addi x2, x0, 2
+    add x3, x1, x2
+""")
+# Never leaves its first instruction, so fast-forwarding it only ends at a limit
+SPIN = assemble("jal x0, 0")
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(workers=1, max_queue=1)
+    yield queue
+    queue.shutdown()
+
+
+def finish(job, timeout=10):
+    """Wait for a job to reach a final state"""
+    deadline = time.monotonic() + timeout
+    version = job.version
+    while not job.is_finished:
+        assert time.monotonic() < deadline, job.info()
+        version = job.wait(version, 0.1)
+    return job.info()
+
+
+def gated_stream(gate, calls=None):
+    """stream_riscv_records on the Python engine, held back until gate is set"""
+    def stream(hex_instructions, cycles, fast_forward, run_info, timeout, check):
+        if calls is not None:
+            calls.append(timeout)
+        assert gate.wait(10)
+        yield from app.stream_python_records(hex_instructions, cycles, fast_forward, run_info, check)
+    return stream
+
+
+def test_job_moves_from_queued_to_running_to_done(queue, monkeypatch):
+    gate = threading.Event()
+    monkeypatch.setattr(jobs, 'stream_riscv_records', gated_stream(gate))
+    first = queue.submit(PROGRAM, 301)
+    second = queue.submit(PROGRAM, 302)
+    deadline = time.monotonic() + 10
+    while first.state != 'running':
+        assert time.monotonic() < deadline
+        first.wait(first.version, 0.1)
+    assert second.state == 'queued'
+    assert queue.counts()['running'] == 1
+    gate.set()
+
+    info = finish(first)
+    assert info['state'] == 'done'
+    assert info['progress'] == {'cycles': 301, 'total_cycles': 301}
+    assert info['backend'] == 'python'
+    assert info['counters']['cycles'] == 300
+    assert app.get_run(info['run_id']) is not None
+    assert finish(second)['state'] == 'done'
+
+
+def test_full_queue_is_rejected(queue, monkeypatch):
+    gate = threading.Event()
+    monkeypatch.setattr(jobs, 'stream_riscv_records', gated_stream(gate))
+    running = queue.submit(PROGRAM, 311)
+    while running.state != 'running':
+        running.wait(running.version, 0.1)
+    queue.submit(PROGRAM, 312)
+    with pytest.raises(app.SimulatorBusyError):
+        queue.submit(PROGRAM, 313)
+    gate.set()
+
+
+def test_timeout_is_validated(queue):
+    with pytest.raises(ValueError):
+        queue.submit(PROGRAM, 10, timeout=0)
+    with pytest.raises(ValueError):
+        queue.submit(PROGRAM, 10, timeout=jobs.SIM_JOB_MAX_TIMEOUT + 1)
+
+
+def test_cancel_queued_job(queue, monkeypatch):
+    gate = threading.Event()
+    monkeypatch.setattr(jobs, 'stream_riscv_records', gated_stream(gate))
+    running = queue.submit(PROGRAM, 321)
+    queued = queue.submit(PROGRAM, 322)
+    assert queue.cancel(queued.job_id) is queued
+    assert queued.info()['state'] == 'cancelled'
+    assert queued.future.cancelled()
+    gate.set()
+    assert finish(running)['state'] == 'done'
+    assert queue.cancel('no-such-job') is None
+
+
+def test_cancel_running_job(queue):
+    job = queue.submit(PROGRAM, 10 ** 8)
+    while job.cycles_done == 0:
+        job.wait(job.version, 0.1)
+    queue.cancel(job.job_id)
+    info = finish(job)
+    assert info['state'] == 'cancelled'
+    assert info['error'] == "Job was cancelled"
+    assert 'run_id' not in info
+
+
+def test_job_times_out_while_tracing(queue):
+    info = finish(queue.submit(PROGRAM, 10 ** 8, timeout=0.2))
+    assert info['state'] == 'timed_out'
+    assert 0 < info['progress']['cycles'] < 10 ** 8
+
+
+def test_job_times_out_while_fast_forwarding(queue):
+    fast_forward = {'max_instructions': 10 ** 12, 'until_pc': None}
+    info = finish(queue.submit(SPIN, 100, fast_forward, timeout=0.2))
+    assert info['state'] == 'timed_out'
+    assert info['progress']['cycles'] == 0
+
+
+def test_vvp_watchdog_kill_times_the_job_out(queue, monkeypatch):
+    calls = []
+
+    def stream(hex_instructions, cycles, fast_forward, run_info, timeout, check):
+        calls.append(timeout)
+        yield from app.stream_python_records(hex_instructions, 10, fast_forward, run_info, check)
+        raise app.VerilogTimeoutError("Verilog simulation exceeded its time limit.")
+
+    monkeypatch.setattr(jobs, 'stream_riscv_records', stream)
+    info = finish(queue.submit(PROGRAM, 331, timeout=5))
+    assert info['state'] == 'timed_out'
+    assert info['error'] == "Job exceeded its 5s time limit"
+    # vvp was given what was left of the job's own limit
+    assert 0 < calls[0] <= 5
+
+
+def test_busy_simulator_is_retried(queue, monkeypatch):
+    gate = threading.Event()
+    gate.set()
+    calls = []
+    stream = gated_stream(gate, calls)
+
+    def busy_once(*args):
+        if not calls:
+            calls.append(None)
+            raise app.SimulatorBusyError("Simulation queue is full, please retry shortly")
+        return stream(*args)
+
+    monkeypatch.setattr(jobs, 'SIM_QUEUE_TIMEOUT', 0.01)
+    monkeypatch.setattr(jobs, 'stream_riscv_records', busy_once)
+    info = finish(queue.submit(PROGRAM, 341))
+    assert info['state'] == 'done'
+    assert len(calls) == 2
+
+
+def test_busy_pool_is_reported_before_fast_forwarding(monkeypatch):
+    pool = app.SimulationPool(1, 0, 0.01)
+    monkeypatch.setattr(app, 'simulation_pool', pool)
+    calls = []
+    monkeypatch.setattr(app, 'fast_forward_rtl_state', lambda *args: calls.append(args))
+    with pool.slot():
+        with pytest.raises(app.SimulatorBusyError):
+            with app.verilog_run('model.vvp', SPIN, 10, {'max_instructions': 5, 'until_pc': None}, {}):
+                pass
+    assert calls == []
@@ -0,0 +1,151 @@
+import pytest
+
+from assembler import assemble
+from riscv_simulator import PAGE_WORDS, PagedMemory, RISCVSimulator
+
+
+def simulate(source, cycles):
+    sim = RISCVSimulator()
+    sim.load_instructions(assemble(source))
+    return sim, list(sim.run(cycles))
+
+
+def test_decode_reads_the_register_before_write_back():
+    # x1 is written back in the cycle sub decodes, so sub still sees zero;
+    # one instruction later add sees the new value
+    sim, _ = simulate("""
+        addi x1, x0, 7
+        nop
+        nop
+        sub x2, x0, x1
+        add x3, x0, x1
+    """, 12)
+    assert sim.registers[1:4] == [7, 0, 7]
+
+
+def test_stores_and_branches_do_not_write_rd():
+    # The rd field of sw and beq holds immediate bits (x4 and x8 here)
+    sim, _ = simulate("""
+        addi x1, x0, 5
+        nop
+        nop
+        nop
+        sw x1, 4(x0)
+        beq x0, x1, 8
+    """, 12)
+    assert sim.registers[4] == 0
+    assert sim.registers[8] == 0
+    assert sim.memory[1] == 5
+
+
+def test_taken_branch_redirects_in_mem_without_flushing():
+    sim, cycles = simulate("""
+        beq x0, x0, 24
+        addi x1, x0, 1
+        addi x2, x0, 2
+        addi x3, x0, 3
+        addi x4, x0, 4
+        addi x5, x0, 5
+        addi x6, x0, 6
+    """, 12)
+    # The branch reaches MEM after three more fetches, which all complete
+    assert [cycle['pc'] for cycle in cycles[:6]] == [0, 4, 8, 12, 24, 28]
+    assert sim.registers[1:7] == [1, 2, 3, 0, 0, 6]
+    assert sim.counters.taken_branches == 1
+
+
+def test_alu_decodes_like_the_rtl():
+    # I-type operations ignore the immediate's top bits; slt and slti are
+    # not implemented and give zero
+    sim, _ = simulate("""
+        addi x1, x0, 160
+        andi x2, x0, -1
+        ori x3, x0, 1365
+        addi x4, x0, 3
+        nop
+        nop
+        slt x5, x0, x4
+        slti x6, x0, 1
+        sll x7, x4, x4
+    """, 16)
+    assert sim.registers[1:8] == [160, 0, 1365, 3, 0, 0, 24]
+
+
+def test_instruction_memory_wraps():
+    sim, cycles = simulate("addi x1, x1, 1", 70)
+    assert cycles[64]['pipeline']['if_id']['pc'] == 252
+    assert cycles[65]['pipeline']['if_id'] == {'pc': 256, 'instruction': '00108093'}
+    assert sim.registers[1] == 2
+
+
+def test_paged_memory_allocates_pages_on_nonzero_writes():
+    memory = PagedMemory(4 * PAGE_WORDS)
+    memory[5] = 0
+    assert memory.pages == {}
+    memory[PAGE_WORDS + 3] = 9
+    memory[5] = 7
+    assert sorted(memory.pages) == [0, 1]
+    assert memory[5] == 7
+    assert memory[PAGE_WORDS + 3] == 9
+    assert memory[3 * PAGE_WORDS] == 0
+    assert list(memory.nonzero()) == [(5, 7), (PAGE_WORDS + 3, 9)]
+
+
+def test_paged_memory_reads_slices_like_a_list():
+    memory = PagedMemory(4 * PAGE_WORDS)
+    memory[PAGE_WORDS - 1] = 1
+    memory[PAGE_WORDS] = 2
+    assert memory[PAGE_WORDS - 2:PAGE_WORDS + 2] == [0, 1, 2, 0]
+    assert memory[PAGE_WORDS - 1:PAGE_WORDS + 1:-1] == []
+    assert len(memory[:]) == 4 * PAGE_WORDS
+    with pytest.raises(TypeError, match="slice assignment"):
+        memory[0:2] = [1, 2]
+
+
+def test_take_dirty_reports_only_changed_words():
+    memory = PagedMemory()
+    memory[4] = 3
+    memory[2] = 1
+    memory[4] = 3
+    assert memory.take_dirty() == {2: 1, 4: 3}
+    assert memory.take_dirty() == {}
+    memory[2] = 1
+    memory[4] = 0
+    assert memory.take_dirty() == {4: 0}
+
+
+def test_memory_writes_report_each_store_once():
+    _, cycles = simulate("""
+        addi x1, x0, 5
+        nop
+        nop
+        nop
+        sw x1, 4(x0)
+        sw x1, 4(x0)
+        sw x0, 8(x0)
+        sw x0, 4(x0)
+    """, 14)
+    writes = [(cycle['cycle'], cycle['memory_writes']) for cycle in cycles if cycle['memory_writes']]
+    # Cycle 1 reports the initial memory image. A store writes memory in
+    # MEM and is reported by the next cycle; the second sw x1 and sw x0, 8
+    # change nothing
+    assert writes[0][0] == 1
+    assert writes[1:] == [(9, {1: 5}), (12, {1: 0})]
+
+
+def test_data_memory_wraps_at_its_size():
+    sim = RISCVSimulator(64)
+    sim.load_instructions(assemble("""
+        addi x1, x0, 300
+        addi x2, x0, 7
+        nop
+        nop
+        nop
+        sw x2, 0(x1)
+        nop
+        nop
+        lw x3, 44(x0)
+    """))
+    list(sim.run(16))
+    assert list(sim.memory.nonzero())[-1] == (11, 7)
+    assert sim.registers[3] == 7
@@ -0,0 +1,154 @@
+import pytest
+
+from assembler import assemble
+from riscv_simulator import RISCVSimulator
+from run_store import RunStore
+from trace_format import cycle_to_record, word_array
+
+# The pipeline model has no forwarding, so the program is straight-line
+# with NOPs between producers and consumers. It stores to a
+# few words, including one outside the default memory view, then clears
+# some of them again (word 10 starts at 123).
+PROGRAM = """
+    addi x1, x0, 11
+    addi x2, x0, 22
+    addi x3, x0, 33
+    nop
+    nop
+    nop
+    sw x1, 0(x0)
+    sw x2, 4(x0)
+    sw x3, 8(x0)
+    sw x1, 40(x0)
+    sw x2, 200(x0)
+    sw x3, 400(x0)
+    sw x0, 4(x0)
+    sw x0, 40(x0)
+    sw x1, 12(x0)
+"""
+CYCLES = 120
+KEYFRAME_INTERVAL = 4
+
+
+def trace():
+    sim = RISCVSimulator()
+    sim.load_instructions(assemble(PROGRAM))
+    return list(sim.run(CYCLES))
+
+
+def expected_window(cycles, start, stop, memory_view, counters=False):
+    """Cycles start..stop with their memory views, replaying every write from the start"""
+    low, high = memory_view
+    memory = {}
+    result = []
+    for position, cycle in enumerate(cycles[:stop]):
+        for addr, value in cycle['memory_writes'].items():
+            memory[addr] = value
+        if position >= start:
+            cycle = dict(cycle, memory={addr: value for addr, value in sorted(memory.items())
+                                        if value and low <= addr < high})
+            if not counters:
+                del cycle['counters']
+            result.append(cycle)
+    return result
+
+
+@pytest.fixture(scope='module')
+def cycles():
+    return trace()
+
+
+@pytest.fixture
+def store():
+    return RunStore(keyframe_interval=KEYFRAME_INTERVAL)
+
+
+def stored(store, cycles):
+    run = store.create()
+    for cycle in cycles:
+        run.append(cycle)
+    return run
+
+
+def test_trace_writes_and_clears_memory(cycles):
+    writes = [value for cycle in cycles for value in cycle['memory_writes'].values()]
+    assert 0 in writes and len(writes) >= 10
+
+
+@pytest.mark.parametrize('start, stop', [(0, 5), (3, 5), (4, 12), (9, 10), (13, 27), (40, 120), (115, 130)])
+def test_window_matches_replayed_trace(store, cycles, start, stop):
+    run = stored(store, cycles)
+    assert run.window(start, stop, (0, 64)) == expected_window(cycles, start, stop, (0, 64))
+
+
+def test_window_memory_view_and_counters(store, cycles):
+    run = stored(store, cycles)
+    window = run.window(5, 30, (1, 11), counters=True)
+    assert window == expected_window(cycles, 5, 30, (1, 11), counters=True)
+    assert all(set(cycle['memory']) <= set(range(1, 11)) for cycle in window)
+    assert window[-1]['memory'] == {2: 33, 3: 11}
+
+
+def test_empty_and_out_of_range_windows(store, cycles):
+    run = stored(store, cycles)
+    assert run.window(CYCLES, CYCLES + 10) == []
+    assert run.window(30, 20) == []
+    assert run.window(-5, 2) == expected_window(cycles, 0, 2, (0, 64))
+
+
+def test_records_match_cycle_dicts(store, cycles):
+    sim = RISCVSimulator()
+    sim.load_instructions(assemble(PROGRAM))
+    run = store.create()
+    for record, writes in sim.run_records(CYCLES):
+        run.append_record(record, writes)
+    reference = stored(store, cycles)
+    assert run.records == reference.records
+    assert run.window(0, CYCLES, (0, 64), True) == reference.window(0, CYCLES, (0, 64), True)
+
+
+def test_extend_records_reads_packed_stores(store, cycles):
+    # A packed trace reports one store per record; the first carries the memory image
+    words = word_array()
+    for cycle in cycles:
+        record = list(cycle_to_record(cycle))
+        for addr, value in list(cycle['memory_writes'].items())[-1:]:
+            record[-11:-8] = [1, addr, value]
+        words.extend(record)
+    run = store.create()
+    run.extend_records(words, initial_memory=cycles[0]['memory_writes'])
+    reference = stored(store, cycles)
+    assert run.window(0, CYCLES, (0, 64)) == reference.window(0, CYCLES, (0, 64))
+
+
+def test_final_counters_and_info(store, cycles):
+    run = stored(store, cycles)
+    assert len(run) == CYCLES
+    assert run.final_counters() == cycles[-1]['counters']
+    info = run.info()
+    assert (info['first_cycle'], info['last_cycle'], info['total_cycles']) == (1, CYCLES, CYCLES)
+
+
+def test_serialized_run_round_trips(store, cycles):
+    run = stored(store, cycles)
+    run.metadata = {'backend': 'python'}
+    run_id = store.load(run.to_bytes(), 'reloaded')
+    reloaded = store.get(run_id)
+    assert reloaded.metadata == {'backend': 'python'}
+    assert reloaded.records == run.records
+    assert reloaded.window(0, CYCLES, (0, 64), True) == run.window(0, CYCLES, (0, 64), True)
+
+
+def test_store_evicts_least_recently_used():
+    store = RunStore(max_runs=2)
+    first, second = (store.add(store.create()) for _ in range(2))
+    store.get(first)
+    third = store.add(store.create())
+    assert store.get(second) is None
+    assert store.get(first) is not None and store.get(third) is not None
+
+
+def test_store_expires_idle_runs():
+    store = RunStore(ttl=0)
+    run_id = store.add(store.create())
+    assert store.get(run_id) is None
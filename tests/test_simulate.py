@@ -0,0 +1,62 @@
+import pytest
+
+import app
+from assembler import assemble
+
+PROGRAM = assemble("""
+    addi x1, x0, 4
+    addi x2, x0, 6
+    sw x2, 0(x1)
+""")
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+def simulate(client, headers=None, **options):
+    return client.post('/simulate', json=dict({'instructions': PROGRAM, 'cycles': 24}, **options),
+                       headers=headers or {})
+
+
+def test_repeat_request_gets_304(client):
+    first = simulate(client)
+    assert first.status_code == 200
+    assert first.get_json()['success']
+    etag = first.headers['ETag']
+
+    again = simulate(client, {'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == etag
+    assert again.data == b''
+
+    assert simulate(client, {'If-None-Match': '"something-else"'}).status_code == 200
+
+
+def test_cycle_counters_change_the_etag_but_not_the_run(client):
+    plain = simulate(client)
+    etag = plain.headers['ETag']
+    counted = simulate(client, {'If-None-Match': etag}, cycle_counters=True)
+    assert counted.status_code == 200
+    assert counted.headers['ETag'] != etag
+    assert 'counters' in counted.get_json()['data'][0]
+    assert 'counters' not in plain.get_json()['data'][0]
+    assert counted.get_json()['run_id'] == plain.get_json()['run_id']
+
+    assert simulate(client, {'If-None-Match': counted.headers['ETag']}, cycle_counters=True).status_code == 304
+
+
+def test_result_cache_key():
+    key = app.result_cache_key(PROGRAM, 24, None, 'python:1')
+    # Case and blank lines do not change the program
+    assert app.result_cache_key('\n' + PROGRAM.lower() + '\n\n', 24, None, 'python:1') == key
+    variants = [
+        app.result_cache_key(PROGRAM + '\n00000013', 24, None, 'python:1'),
+        app.result_cache_key(PROGRAM, 25, None, 'python:1'),
+        app.result_cache_key(PROGRAM, 24, {'max_instructions': 2, 'until_pc': None}, 'python:1'),
+        app.result_cache_key(PROGRAM, 24, {'max_instructions': None, 'until_pc': 8}, 'python:1'),
+        app.result_cache_key(PROGRAM, 24, None, 'python:2'),
+        app.result_cache_key(PROGRAM, 24, None, 'verilog:processor_sim-batch-0.vvp'),
+    ]
+    assert len({key, *variants}) == len(variants) + 1
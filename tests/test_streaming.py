@@ -0,0 +1,189 @@
+import json
+import os
+import stat
+
+import pytest
+
+import app
+from assembler import assemble
+from riscv_simulator import PERF_COUNTERS, RISCVSimulator
+
+PROGRAM = assemble("""
+    addi x1, x0, 5
+    addi x2, x0, 9
+    nop
+    nop
+    sw x1, 8(x0)
+    add x3, x1, x2
+    beq x0, x0, -24
+""")
+CYCLES = 30
+
+
+@pytest.fixture
+def python_only(monkeypatch):
+    monkeypatch.setattr(app, 'get_simulation_model', lambda: None)
+
+
+def python_cycles(cycles=CYCLES):
+    sim = RISCVSimulator()
+    sim.load_instructions(PROGRAM)
+    return list(sim.run(cycles))
+
+
+def text_trace(cycle):
+    """The text trace block simulation/trace.vh prints for a cycle"""
+    registers = cycle['registers']
+    pipeline = cycle['pipeline']
+    if_id, id_ex, ex_mem, mem_wb = (pipeline[stage] for stage in ('if_id', 'id_ex', 'ex_mem', 'mem_wb'))
+    signals = {name: int(value) for name, value in cycle['control_signals'].items()}
+    counters = cycle['counters']
+    (write_addr, write_data), = cycle['memory_writes'].items() or [(0, 0)]
+    lines = [f"CYCLE {cycle['cycle']}: PC=0x{cycle['pc']:08x}"]
+    for row in range(0, 32, 4):
+        lines.append(' '.join(f'REG[{i}]=0x{registers[i]:08x}' for i in range(row, row + 4)))
+    lines += [
+        f"IF_ID_INSTR=0x{if_id['instruction']} IF_ID_PC=0x{if_id['pc']:08x}",
+        f"ID_EX_INSTR=0x{id_ex['instruction']} ID_EX_PC=0x{id_ex['pc']:08x}",
+        f"ID_EX_RS1=0x{id_ex['rs1']:02x} ID_EX_RS1_VAL=0x{id_ex['rs1_val']:08x}",
+        f"ID_EX_RS2=0x{id_ex['rs2']:02x} ID_EX_RS2_VAL=0x{id_ex['rs2_val']:08x}",
+        f"ID_EX_RD=0x{id_ex['rd']:02x} ID_EX_IMM=0x{id_ex['imm']:08x}",
+        f"EX_MEM_ALU=0x{ex_mem['alu_result']:08x} EX_MEM_PC=0x{ex_mem['pc']:08x}",
+        f"EX_MEM_RD=0x{ex_mem['rd']:02x} EX_MEM_ZERO={ex_mem['zero_flag']}",
+        f"MEM_WB_DATA=0x{mem_wb['result']:08x} MEM_WB_PC=0x{mem_wb['pc']:08x}",
+        f"MEM_WB_RD=0x{mem_wb['rd']:02x}",
+        f"CTRL_REGWRITE={signals['regwrite']} CTRL_MEMREAD={signals['memread']} "
+        f"CTRL_MEMWRITE={signals['memwrite']}",
+        f"CTRL_BRANCH={signals['branch']} CTRL_ALUSRC={signals['alusrc']} "
+        f"CTRL_MEMTOREG={signals['memtoreg']}",
+        f"MEM_WRITE={int(bool(cycle['memory_writes']))} MEM_ADDR=0x{write_addr:08x} "
+        f"MEM_DATA=0x{write_data:08x}",
+        ' '.join(f'PERF_{name.upper()}={counters[name]}' for name in PERF_COUNTERS[:4]),
+        ' '.join(f'PERF_{name.upper()}={counters[name]}' for name in PERF_COUNTERS[4:]),
+        '----',
+    ]
+    return [line + '\n' for line in lines]
+
+
+def test_text_trace_parses_back_into_the_cycles():
+    cycles = python_cycles()
+    lines = [line for cycle in cycles for line in text_trace(cycle)]
+    assert list(app.iter_simulation_cycles(lines)) == cycles
+    assert app.parse_simulation_lines(lines) == cycles
+
+
+def test_each_cycle_is_yielded_when_its_block_ends():
+    cycles = python_cycles(3)
+    consumed = []
+
+    def lines():
+        for cycle in cycles:
+            for line in text_trace(cycle):
+                consumed.append(line)
+                yield line
+
+    parsed = app.iter_simulation_cycles(lines())
+    assert next(parsed) == cycles[0]
+    assert consumed[-1] == '----\n'
+    assert len(consumed) == len(text_trace(cycles[0]))
+
+
+def test_a_trace_cut_short_still_yields_its_last_cycle():
+    cycles = python_cycles(2)
+    lines = text_trace(cycles[0]) + text_trace(cycles[1])[:-1]
+    # Warnings and blank lines between blocks are skipped
+    lines.insert(0, 'VCD info: dumpfile opened\n')
+    assert list(app.iter_simulation_cycles(lines)) == cycles
+
+
+def fake_vvp(tmp_path, monkeypatch, script):
+    """Put a vvp on PATH that runs script instead of a model"""
+    path = tmp_path / 'vvp'
+    path.write_text('#!/bin/sh\n' + script)
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv('PATH', f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    return app.VerilogRun('model.vvp', str(tmp_path), str(tmp_path / 'instructions.hex'), timeout=5)
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="needs a POSIX shell")
+def test_vvp_lines_arrive_before_the_process_exits(tmp_path, monkeypatch):
+    # The script only exits once the test has read its first line
+    release = tmp_path / 'release'
+    run = fake_vvp(tmp_path, monkeypatch,
+                   f'echo first\nwhile [ ! -e {release} ]; do sleep 0.01; done\necho second\n')
+    lines = app.iter_vvp_lines(run)
+    assert next(lines) == 'first\n'
+    release.touch()
+    assert list(lines) == ['second\n']
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="needs a POSIX shell")
+def test_vvp_errors_and_timeouts_are_raised(tmp_path, monkeypatch):
+    run = fake_vvp(tmp_path, monkeypatch, 'echo partial\necho broken >&2\nexit 3\n')
+    with pytest.raises(app.VerilogRunError, match='broken'):
+        list(app.iter_vvp_lines(run))
+
+    run = fake_vvp(tmp_path, monkeypatch, 'exec sleep 10\n')
+    run.timeout = 0.2
+    with pytest.raises(app.VerilogTimeoutError):
+        list(app.iter_vvp_lines(run))
+
+
+def test_stream_falls_back_to_the_python_engine(python_only):
+    run_info = {}
+    cycles = app.stream_riscv_simulation(PROGRAM, CYCLES, None, run_info)
+    # Nothing runs until the first cycle is asked for
+    assert run_info == {}
+    assert list(cycles) == python_cycles()
+    assert run_info == {'backend': 'python'}
+
+
+def test_verilog_failure_before_the_first_cycle_falls_back(monkeypatch):
+    def failing(run):
+        raise app.VerilogRunError("Verilog simulation failed")
+        yield
+
+    monkeypatch.setattr(app, 'get_simulation_model', lambda: 'model.vvp')
+    monkeypatch.setattr(app, 'iter_verilog_cycles', failing)
+    run_info = {}
+    assert list(app.stream_riscv_simulation(PROGRAM, CYCLES, None, run_info)) == python_cycles()
+    assert run_info['backend'] == 'python'
+
+
+def test_verilog_failure_after_the_first_cycle_is_raised(monkeypatch):
+    def failing(run):
+        yield python_cycles(1)[0]
+        raise app.VerilogRunError("Verilog simulation failed")
+
+    monkeypatch.setattr(app, 'get_simulation_model', lambda: 'model.vvp')
+    monkeypatch.setattr(app, 'iter_verilog_cycles', failing)
+    cycles = app.stream_riscv_simulation(PROGRAM, CYCLES)
+    next(cycles)
+    with pytest.raises(app.VerilogRunError):
+        next(cycles)
+
+
+def test_stream_endpoint_sends_ndjson_cycles_then_done(python_only):
+    response = app.app.test_client().post('/simulate/stream',
+                                          json={'instructions': PROGRAM, 'cycles': CYCLES})
+    assert response.mimetype == 'application/x-ndjson'
+    events = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [event['type'] for event in events] == ['cycle'] * CYCLES + ['done']
+    expected = python_cycles()
+    for cycle in expected:
+        del cycle['counters']
+    # JSON turns the memory write addresses into strings
+    assert [event['data'] for event in events[:-1]] == json.loads(json.dumps(expected))
+    done = events[-1]['data']
+    assert done['cycles'] == CYCLES
+    assert app.get_run(done['run_id']).window(0, CYCLES, counters=True)[-1]['counters'] == \
+        python_cycles()[-1]['counters']
+
+
+def test_stream_endpoint_speaks_server_sent_events(python_only):
+    response = app.app.test_client().post('/simulate/stream', json={'instructions': PROGRAM, 'cycles': 3},
+                                          headers={'Accept': 'text/event-stream'})
+    assert response.mimetype == 'text/event-stream'
+    events = response.data.decode().split('\n\n')[:-1]
+    assert [event.splitlines()[0] for event in events] == ['event: cycle'] * 3 + ['event: done']
+    assert json.loads(events[0].splitlines()[1][len('data: '):])['cycle'] == 1
@@ -0,0 +1,94 @@
+import pytest
+
+from riscv_simulator import RISCVSimulator
+from run_store import RunStore
+from trace_export import (CYCLE_SIGNALS, MEMORY_WRITE_SIGNALS, TraceReader, iter_vcd, run_columns,
+                          np, npz_bytes, trace_columns, write_npy, write_npz)
+
+requires_numpy = pytest.mark.skipif(np is None, reason="NumPy not installed")
+
+PROGRAM = '\n'.join([
+    '00b00093',  # addi x1, x0, 11
+    '01600113',  # addi x2, x0, 22
+    '00000013', '00000013', '00000013',
+    '00102023',  # sw x1, 0(x0)
+    '00202223',  # sw x2, 4(x0)
+    '02102423',  # sw x1, 40(x0)
+    '00002223',  # sw x0, 4(x0)
+])
+CYCLES = 300
+
+
+@pytest.fixture(scope='module')
+def cycles():
+    sim = RISCVSimulator()
+    sim.load_instructions(PROGRAM)
+    return list(sim.run(CYCLES))
+
+
+@pytest.fixture(scope='module')
+def columns(cycles):
+    return trace_columns(cycles)
+
+
+def test_columns_follow_the_trace(cycles, columns):
+    assert list(columns['cycle']) == list(range(1, CYCLES + 1))
+    assert list(columns['x1']) == [cycle['registers'][1] for cycle in cycles]
+    assert list(columns['if_id_instr']) == [int(cycle['pipeline']['if_id']['instruction'], 16) for cycle in cycles]
+    writes = [(row, addr, value) for row, cycle in enumerate(cycles)
+              for addr, value in cycle['memory_writes'].items()]
+    assert list(zip(*(columns[name] for name in MEMORY_WRITE_SIGNALS))) == writes
+
+
+def test_stored_run_exports_the_same_columns(cycles, columns):
+    run = RunStore().create()
+    for cycle in cycles:
+        run.append(cycle)
+    assert run_columns(run) == columns
+
+
+def assert_reader_matches(reader, columns):
+    assert len(reader) == CYCLES
+    for name in CYCLE_SIGNALS + MEMORY_WRITE_SIGNALS:
+        assert reader[name].tolist() == list(columns[name]), name
+    window = reader.slice(100, 110, ['pc', 'x2'])
+    assert window['pc'].tolist() == list(columns['pc'][100:110])
+    assert reader.registers(0, 20).shape == (20, 32)
+    rows, addrs, values = reader.memory_writes(1, CYCLES)
+    assert rows.tolist() == [row for row in columns['mem_write_cycle'] if row >= 1]
+
+
+@requires_numpy
+def test_npz_round_trip(tmp_path, columns):
+    path = tmp_path / 'trace.npz'
+    write_npz(columns, str(path), {'backend': 'python'})
+    with TraceReader(str(path)) as reader:
+        assert reader.manifest['metadata'] == {'backend': 'python'}
+        assert isinstance(reader['pc'], np.memmap)
+        assert_reader_matches(reader, columns)
+
+
+@requires_numpy
+def test_npz_bytes_match_file_layout(tmp_path, columns):
+    path = tmp_path / 'trace.npz'
+    path.write_bytes(npz_bytes(columns))
+    with TraceReader(str(path)) as reader:
+        assert_reader_matches(reader, columns)
+
+
+@requires_numpy
+def test_npy_directory_round_trip(tmp_path, columns):
+    write_npy(columns, str(tmp_path / 'trace'))
+    with TraceReader(str(tmp_path / 'trace')) as reader:
+        assert_reader_matches(reader, columns)
+
+
+def test_vcd_dumps_only_changes(columns):
+    text = ''.join(iter_vcd(columns))
+    header, body = text.split('$enddefinitions $end\n')
+    assert '$var wire 32' in header and ' pc $end' in header
+    timestamps = [line for line in body.splitlines() if line.startswith('#')]
+    assert timestamps == [f'#{cycle}' for cycle in columns['cycle']]
+    # The program ends in NOPs, so later cycles change only a few signals
+    last = body.split(f'#{CYCLES}\n')[1].splitlines()
+    assert 0 < len(last) < 10
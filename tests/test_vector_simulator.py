@@ -0,0 +1,119 @@
+import glob
+import os
+import random
+
+import pytest
+
+from assembler import assemble
+from riscv_simulator import parse_program
+from vector_simulator import VectorSimulator, np, run_programs, scalar_result
+
+pytestmark = pytest.mark.skipif(np is None, reason="NumPy not installed")
+
+EXAMPLES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), os.pardir, 'examples', '*.hex')))
+
+LOOP = """
+    li x1, 100
+    li x2, 0
+loop:
+    sw x1, 64(x2)
+    lw x3, 64(x2)
+    add x4, x4, x3
+    addi x2, x2, 4
+    addi x1, x1, -1
+    bnez x1, loop
+    ecall
+"""
+
+R_TYPE = ('add', 'sub', 'sll', 'slt', 'sltu', 'xor', 'srl', 'sra', 'or', 'and')
+I_TYPE = ('addi', 'slti', 'sltiu', 'xori', 'ori', 'andi')
+SHIFTS = ('slli', 'srli', 'srai')
+LOADS = ('lb', 'lh', 'lw', 'lbu', 'lhu')
+STORES = ('sb', 'sh', 'sw')
+BRANCHES = ('beq', 'bne', 'blt', 'bge', 'bltu', 'bgeu')
+
+
+def random_instruction(rng, index, length):
+    """One random instruction; branches and jumps stay near the program"""
+    rd, rs1, rs2 = (f'x{rng.randrange(8)}' for _ in range(3))
+    offset = 4 * rng.randrange(-index, length - index + 1)
+    kind = rng.randrange(8)
+    if kind == 0:
+        return f'{rng.choice(R_TYPE)} {rd}, {rs1}, {rs2}'
+    if kind == 1:
+        return f'{rng.choice(I_TYPE)} {rd}, {rs1}, {rng.randrange(-2048, 2048)}'
+    if kind == 2:
+        return f'{rng.choice(SHIFTS)} {rd}, {rs1}, {rng.randrange(32)}'
+    if kind == 3:
+        return f'{rng.choice(LOADS)} {rd}, {rng.randrange(-2048, 2048)}({rs1})'
+    if kind == 4:
+        return f'{rng.choice(STORES)} {rs2}, {rng.randrange(-2048, 2048)}({rs1})'
+    if kind == 5:
+        return f'{rng.choice(BRANCHES)} {rs1}, {rs2}, {offset}'
+    if kind == 6:
+        return f'{rng.choice(("lui", "auipc"))} {rd}, {rng.randrange(1 << 20)}'
+    return f'jal {rd}, {offset}' if rng.random() < 0.8 else f'jalr {rd}, {rng.randrange(64)}({rs1})'
+
+
+def random_program(rng, length=24):
+    return assemble('\n'.join(random_instruction(rng, index, length) for index in range(length)))
+
+
+def assert_same(programs, max_instructions):
+    for program, result in zip(programs, run_programs(programs, max_instructions)):
+        assert result == scalar_result(program, max_instructions), program
+
+
+def test_examples_match_functional_simulator():
+    programs = [open(path).read() for path in EXAMPLES]
+    assert programs
+    assert_same(programs, 1000)
+
+
+def test_loop_program_runs_to_halt():
+    program = assemble(LOOP)
+    result = run_programs([program])[0]
+    assert result['stop_reason'] == 'halt'
+    assert result['registers'][4] == sum(range(1, 101))
+    assert result == scalar_result(program)
+
+
+def test_stop_reasons_are_per_program():
+    programs = [assemble('ecall'), assemble(LOOP), assemble('j 0')]
+    results = run_programs(programs, 50)
+    assert [result['stop_reason'] for result in results] == ['halt', 'limit', 'limit']
+    assert results[0]['instructions'] == 0
+    assert_same(programs, 50)
+
+
+def test_random_programs_match_functional_simulator():
+    rng = random.Random(1234)
+    programs = [random_program(rng) for _ in range(300)]
+    assert_same(programs, 200)
+
+
+def test_repeated_programs_and_nop_tails_match_functional_simulator():
+    # Identical programs share decode tables, and NOP tails collapse to one
+    # word; both must still run to the end of instruction memory
+    rng = random.Random(99)
+    distinct = [random_program(rng, length) for length in (1, 5, 24)]
+    programs = distinct * 4 + [assemble('addi x1, x1, 1'), assemble('nop')]
+    assert_same(programs, 1500)
+
+
+def test_unpadded_programs_end_at_their_own_length():
+    words = parse_program(assemble('addi x1, x0, 3\naddi x2, x1, 1'))[:2]
+    simulator = VectorSimulator([words, words + [0x00000013]])
+    simulator.run(10)
+    results = simulator.results()
+    assert [result['stop_reason'] for result in results] == ['end', 'end']
+    assert [result['instructions'] for result in results] == [2, 3]
+    assert results[0]['registers'][1:3] == [3, 4]
+
+
+def test_misaligned_jump_ends_the_program():
+    program = assemble('addi x1, x0, 6\njalr x2, 0(x1)')
+    result = run_programs([program], 10)[0]
+    assert result['stop_reason'] == 'end'
+    assert result['pc'] == 6
+    assert result == scalar_result(program, 10)
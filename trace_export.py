@@ -0,0 +1,415 @@
+"""Columnar export of simulation traces for offline analysis.
+
+A run is written as one array per signal instead of a list of cycle dicts:
+the PC, each register, each pipeline latch field, each control signal and
+each performance counter is a column with one entry per cycle, named as in
+TRACE_RECORD_FIELDS. Memory writes are ragged, so they are stored as three
+parallel arrays: the row of the cycle that carried the write, the word
+address and the value.
+
+Layouts:
+  npy  a directory of <signal>.npy files plus manifest.json
+  npz  the same members in one uncompressed zip archive
+  vcd  a Value Change Dump for waveform viewers such as GTKWave
+
+TraceReader memory-maps either columnar layout, so reading a range of
+cycles or a few signals does not load the whole trace. The npy and npz
+layouts need NumPy; VCD export does not.
+
+    python trace_export.py export examples/branch_control.hex --cycles 5000 -o branch
+    python trace_export.py show branch --signals pc,x1 --from 100 --to 110
+"""
+
+import argparse
+import io
+import json
+import os
+import struct
+import sys
+import time
+import zipfile
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # only the VCD layout is available without NumPy
+    np = None
+
+from riscv_simulator import CONTROL_SIGNAL_NAMES, PERF_COUNTERS
+from trace_format import (RECORD_CTRL, RECORD_REGISTERS, TRACE_RECORD_FIELDS, cycle_to_record,
+                          packed_trace_columns, word_array)
+
+TRACE_FORMAT = 'riscv-columnar-trace'
+TRACE_FORMAT_VERSION = 1
+EXPORT_FORMATS = ('npy', 'npz', 'vcd')
+MANIFEST_NAME = 'manifest.json'
+
+REGISTER_SIGNALS = tuple(TRACE_RECORD_FIELDS[RECORD_REGISTERS:RECORD_REGISTERS + 32])
+# The pipeline latch fields of a trace record, in record order
+PIPELINE_SIGNALS = tuple(TRACE_RECORD_FIELDS[RECORD_REGISTERS + 32:RECORD_CTRL])
+# Bit i of a record's ctrl word is CONTROL_SIGNAL_NAMES[i]
+CONTROL_SIGNALS = tuple(f'ctrl_{name}' for name in CONTROL_SIGNAL_NAMES)
+COUNTER_SIGNALS = tuple(f'perf_{name}' for name in PERF_COUNTERS)
+MEMORY_WRITE_SIGNALS = ('mem_write_cycle', 'mem_write_addr', 'mem_write_data')
+
+SIGNAL_GROUPS = {
+    'cycle': ('cycle', 'pc'),
+    'registers': REGISTER_SIGNALS,
+    'pipeline': PIPELINE_SIGNALS,
+    'control': CONTROL_SIGNALS,
+    'counters': COUNTER_SIGNALS,
+    'memory_writes': MEMORY_WRITE_SIGNALS
+}
+# Signals with one entry per cycle; the memory write arrays are not
+CYCLE_SIGNALS = tuple(name for group, names in SIGNAL_GROUPS.items() if group != 'memory_writes'
+                      for name in names)
+
+# Bit widths in VCD output; everything else is a 32-bit word
+SIGNAL_WIDTHS = dict.fromkeys(('id_ex_rs1', 'id_ex_rs2', 'id_ex_rd', 'ex_mem_rd', 'mem_wb_rd'), 5)
+SIGNAL_WIDTHS.update(dict.fromkeys(CONTROL_SIGNALS + ('ex_mem_zero',), 1))
+
+
+def record_columns(words, writes=None):
+    """Split a flat array of packed trace records into one array per signal.
+
+    writes maps a record's index to its ((address, value), ...) pairs, as
+    StoredRun.writes does; records not in it wrote nothing. Columns are
+    strided slices of words, so no per-cycle objects are built.
+    """
+    fields = packed_trace_columns(words)
+    columns = {name: fields[name] for name in ('cycle', 'pc') + REGISTER_SIGNALS + PIPELINE_SIGNALS}
+    columns['ex_mem_zero'] = array('B', columns['ex_mem_zero'])
+    ctrl = fields['ctrl']
+    for bit, signal in enumerate(CONTROL_SIGNALS):
+        columns[signal] = array('B', [(value >> bit) & 1 for value in ctrl])
+    for signal in COUNTER_SIGNALS:
+        columns[signal] = fields[signal]
+
+    write_rows, write_addrs, write_data = (word_array() for _ in MEMORY_WRITE_SIGNALS)
+    for row in sorted(writes or ()):
+        for addr, value in writes[row]:
+            write_rows.append(row)
+            write_addrs.append(int(addr) & 0xFFFFFFFF)
+            write_data.append(value & 0xFFFFFFFF)
+    columns.update(zip(MEMORY_WRITE_SIGNALS, (write_rows, write_addrs, write_data)))
+    return columns
+
+
+def run_columns(run):
+    """Columns of every cycle of a StoredRun, sliced from its packed records"""
+    return record_columns(run.records, run.writes)
+
+
+def trace_columns(cycles):
+    """Split an iterable of cycle dicts into one array per signal"""
+    words = word_array()
+    writes = {}
+    for row, cycle in enumerate(cycles):
+        words.extend(cycle_to_record(cycle))
+        cycle_writes = cycle.get('memory_writes')
+        if cycle_writes:
+            writes[row] = cycle_writes.items()
+    return record_columns(words, writes)
+
+
+def build_manifest(columns, metadata=None):
+    cycles = len(columns['cycle'])
+    manifest = {
+        'format': TRACE_FORMAT,
+        'version': TRACE_FORMAT_VERSION,
+        'cycles': cycles,
+        'first_cycle': columns['cycle'][0] if cycles else None,
+        'last_cycle': columns['cycle'][-1] if cycles else None,
+        'memory_writes': len(columns['mem_write_cycle']),
+        'groups': {group: list(names) for group, names in SIGNAL_GROUPS.items()},
+        'signals': {name: {'dtype': 'uint8' if SIGNAL_WIDTHS.get(name) == 1 else 'uint32',
+                           'width': SIGNAL_WIDTHS.get(name, 32)} for name in columns},
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    }
+    if metadata:
+        manifest['metadata'] = metadata
+    return manifest
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("The npy and npz trace layouts require NumPy (pip install numpy)")
+
+
+def _as_ndarray(column, signal):
+    dtype = np.uint8 if SIGNAL_WIDTHS.get(signal) == 1 else np.uint32
+    return np.asarray(column).astype(dtype, copy=False)
+
+
+def write_npy(columns, path, metadata=None):
+    """Write one <signal>.npy per column plus manifest.json into directory path"""
+    _require_numpy()
+    os.makedirs(path, exist_ok=True)
+    for name, column in columns.items():
+        np.save(os.path.join(path, f'{name}.npy'), _as_ndarray(column, name))
+    with open(os.path.join(path, MANIFEST_NAME), 'w') as f:
+        json.dump(build_manifest(columns, metadata), f, indent=2)
+
+
+def write_npz(columns, fileobj, metadata=None):
+    """Write the npy layout as one zip archive to a path or binary file object.
+
+    Members are stored uncompressed, as numpy.savez does, so TraceReader can
+    memory-map them in place.
+    """
+    _require_numpy()
+    with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name, column in columns.items():
+            with archive.open(f'{name}.npy', 'w', force_zip64=True) as member:
+                np.lib.format.write_array(member, _as_ndarray(column, name))
+        archive.writestr(MANIFEST_NAME, json.dumps(build_manifest(columns, metadata), indent=2))
+
+
+def _vcd_identifier(index):
+    # Identifiers are short strings of printable ASCII characters
+    identifier = ''
+    while True:
+        index, digit = divmod(index, 94)
+        identifier += chr(33 + digit)
+        if index == 0:
+            return identifier
+        index -= 1
+
+
+def iter_vcd(columns, metadata=None):
+    """Yield a Value Change Dump of the columns in chunks of text.
+
+    One time unit is one cycle, stamped with the cycle number. The memory
+    write arrays are shown as mem_write, mem_write_addr and mem_write_data,
+    holding the last word each cycle wrote.
+    """
+    cycles = len(columns['cycle'])
+    last_write = {}
+    for row, addr, value in zip(*(columns[name] for name in MEMORY_WRITE_SIGNALS)):
+        last_write[row] = (addr, value)
+    columns = {name: column for name, column in columns.items() if name not in MEMORY_WRITE_SIGNALS}
+    columns['mem_write'] = [int(row in last_write) for row in range(cycles)]
+    columns['mem_write_addr'] = [last_write.get(row, (0, 0))[0] for row in range(cycles)]
+    columns['mem_write_data'] = [last_write.get(row, (0, 0))[1] for row in range(cycles)]
+    scopes = dict(SIGNAL_GROUPS, memory_writes=('mem_write', 'mem_write_addr', 'mem_write_data'))
+    widths = dict(SIGNAL_WIDTHS, mem_write=1)
+
+    header = [f'$date {time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())} UTC $end',
+              f'$version RISC-V pipeline visualizer {TRACE_FORMAT} v{TRACE_FORMAT_VERSION} $end']
+    if metadata:
+        header.append(f'$comment {json.dumps(metadata)} $end')
+    header += ['$timescale 1ns $end', '$scope module riscv $end']
+    signals = []
+    for scope, names in scopes.items():
+        header.append(f'$scope module {scope} $end')
+        for name in names:
+            identifier = _vcd_identifier(len(signals))
+            header.append(f'$var wire {widths.get(name, 32)} {identifier} {name} $end')
+            signals.append((columns[name], widths.get(name, 32), identifier))
+        header.append('$upscope $end')
+    header += ['$upscope $end', '$enddefinitions $end']
+    yield '\n'.join(header) + '\n'
+
+    def change(value, width, identifier):
+        return f'{value}{identifier}' if width == 1 else f'b{value:b} {identifier}'
+
+    previous = [None] * len(signals)
+    time_column = columns['cycle']
+    for row in range(cycles):
+        lines = [f'#{time_column[row]}']
+        if row == 0:
+            lines.append('$dumpvars')
+        for index, (column, width, identifier) in enumerate(signals):
+            value = column[row]
+            if value != previous[index]:
+                previous[index] = value
+                lines.append(change(value, width, identifier))
+        if row == 0:
+            lines.append('$end')
+        yield '\n'.join(lines) + '\n'
+
+
+def write_vcd(columns, path, metadata=None):
+    with open(path, 'w') as f:
+        for chunk in iter_vcd(columns, metadata):
+            f.write(chunk)
+
+
+def npz_bytes(columns, metadata=None):
+    buffer = io.BytesIO()
+    write_npz(columns, buffer, metadata)
+    return buffer.getvalue()
+
+
+def export_trace(columns, path, fmt, metadata=None):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    if fmt == 'npy':
+        write_npy(columns, path, metadata)
+    elif fmt == 'npz':
+        write_npz(columns, path, metadata)
+    else:
+        write_vcd(columns, path, metadata)
+
+
+_ZIP_LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+
+
+class TraceReader:
+    """Memory-mapped reader for the npy and npz layouts.
+
+    Columns are mapped on first use, so opening a trace reads only its
+    manifest and slicing touches only the pages of the cycles asked for.
+    Members of a compressed npz cannot be mapped and are loaded whole.
+    """
+
+    def __init__(self, path):
+        _require_numpy()
+        self.path = path
+        self._columns = {}
+        self._members = None
+        if os.path.isdir(path):
+            with open(os.path.join(path, MANIFEST_NAME)) as f:
+                self.manifest = json.load(f)
+        else:
+            with zipfile.ZipFile(path) as archive:
+                self._members = {info.filename: info for info in archive.infolist()}
+                self.manifest = json.loads(archive.read(MANIFEST_NAME))
+        if self.manifest.get('format') != TRACE_FORMAT:
+            raise ValueError(f"{path} is not a {TRACE_FORMAT} export")
+
+    def __len__(self):
+        return self.manifest['cycles']
+
+    def __contains__(self, signal):
+        return signal in self.manifest['signals']
+
+    def __getitem__(self, signal):
+        """The whole column of a signal as a read-only memory-mapped array"""
+        if signal not in self:
+            raise KeyError(f"Unknown signal {signal!r}")
+        column = self._columns.get(signal)
+        if column is None:
+            column = self._columns[signal] = self._map(f'{signal}.npy')
+        return column
+
+    @property
+    def signals(self):
+        return list(self.manifest['signals'])
+
+    def _map(self, member):
+        if self._members is None:
+            return np.load(os.path.join(self.path, member), mmap_mode='r')
+        info = self._members[member]
+        if info.compress_type != zipfile.ZIP_STORED:
+            with zipfile.ZipFile(self.path) as archive, archive.open(member) as f:
+                return np.lib.format.read_array(f)
+        with open(self.path, 'rb') as f:
+            # The member's data follows its local header, whose name and
+            # extra field lengths may differ from the central directory's
+            f.seek(info.header_offset)
+            local_header = _ZIP_LOCAL_HEADER.unpack(f.read(_ZIP_LOCAL_HEADER.size))
+            f.seek(info.header_offset + _ZIP_LOCAL_HEADER.size + local_header[-2] + local_header[-1])
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            offset = f.tell()
+        if 0 in shape:
+            return np.empty(shape, dtype)
+        return np.memmap(self.path, dtype=dtype, mode='r', offset=offset, shape=shape,
+                         order='F' if fortran_order else 'C')
+
+    def slice(self, start=0, stop=None, signals=None):
+        """{signal: array} for cycle rows start <= row < stop; views, not copies"""
+        names = signals or [name for name in self.signals if name not in MEMORY_WRITE_SIGNALS]
+        return {name: self[name][start:stop] for name in names}
+
+    def registers(self, start=0, stop=None):
+        """Register file per cycle as a (cycles, 32) array"""
+        return np.stack([self[name][start:stop] for name in REGISTER_SIGNALS], axis=1)
+
+    def memory_writes(self, start=0, stop=None):
+        """(row, address, value) arrays of the writes carried by rows start <= row < stop"""
+        rows = self['mem_write_cycle']
+        stop = len(self) if stop is None else stop
+        # Rows are ascending, so the range is found without scanning
+        low, high = np.searchsorted(rows, [start, stop])
+        return tuple(self[name][low:high] for name in MEMORY_WRITE_SIGNALS)
+
+    def close(self):
+        self._columns.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def simulate_columns(instructions, cycles, fast_forward=None):
+    """Simulate a source program and return its columns and run information"""
+    from app import process_instructions, run_riscv_simulation
+
+    run_info = {}
+    run = run_riscv_simulation(process_instructions(instructions), cycles, fast_forward, run_info)
+    return run_columns(run), run_info
+
+
+def _parse_signals(text):
+    return [name.strip() for name in text.split(',') if name.strip()] if text else None
+
+
+def main(argv=None):
+    from app import SIM_CYCLES
+
+    parser = argparse.ArgumentParser(description="Export simulation traces as columns and read them back")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help="simulate a program and export its trace")
+    export.add_argument('file', nargs='?', help="program file (hex or assembly)")
+    export.add_argument('--run-id', help="export a cached run instead of simulating")
+    export.add_argument('--cycles', type=int, default=SIM_CYCLES, help="cycles to simulate")
+    export.add_argument('--format', choices=EXPORT_FORMATS, default='npy')
+    export.add_argument('-o', '--output', required=True, help="output directory (npy) or file")
+
+    show = commands.add_parser('show', help="print a range of cycles from an npy or npz export")
+    show.add_argument('path')
+    show.add_argument('--signals', help="comma-separated signals (default: cycle,pc,x1..x31)")
+    show.add_argument('--from', dest='start', type=int, default=0, help="first row")
+    show.add_argument('--to', dest='stop', type=int, help="row after the last")
+    args = parser.parse_args(argv)
+
+    if args.command == 'show':
+        with TraceReader(args.path) as reader:
+            names = _parse_signals(args.signals) or ['cycle', 'pc'] + list(REGISTER_SIGNALS[1:])
+            stop = len(reader) if args.stop is None else args.stop
+            window = reader.slice(args.start, stop, names)
+            print('\t'.join(names))
+            for row in range(len(window[names[0]])):
+                print('\t'.join(str(window[name][row]) for name in names))
+        return 0
+
+    started = time.perf_counter()
+    if args.run_id:
+        from app import get_run
+        run = get_run(args.run_id)
+        if run is None:
+            print(f"Run {args.run_id} not found in the result cache", file=sys.stderr)
+            return 1
+        columns, metadata = run_columns(run), dict(run.metadata, run_id=run.run_id)
+    elif args.file:
+        with open(args.file) as f:
+            columns, metadata = simulate_columns(f.read(), args.cycles)
+        metadata['source'] = args.file
+    else:
+        parser.error("export needs a program file or --run-id")
+    export_trace(columns, args.output, args.format, metadata)
+    print(f"Wrote {len(columns['cycle'])} cycles to {args.output} ({args.format}) "
+          f"in {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""Packed per-cycle trace records shared by the engines and the run store.
+
+A record is TRACE_RECORD_WORDS unsigned 32-bit words in the order of
+TRACE_RECORD_FIELDS, mirrored by write_cycle_record in simulation/trace.vh.
+The Verilog model prints one record per line as hex; runs are stored as
+flat arrays of records, and the nested cycle dicts the frontend uses are
+only built for the windows that are read.
+"""
+
+import re
+import struct
+import sys
+from array import array
+
+from riscv_simulator import CONTROL_SIGNAL_NAMES, MASK32, NOP, PERF_COUNTERS
+
+TRACE_RECORD_FIELDS = (
+    ['cycle', 'pc']
+    + [f'x{i}' for i in range(32)]
+    + ['if_id_instr', 'if_id_pc', 'id_ex_instr', 'id_ex_pc',
+       'id_ex_rs1', 'id_ex_rs1_val', 'id_ex_rs2', 'id_ex_rs2_val', 'id_ex_rd', 'id_ex_imm',
+       'ex_mem_alu', 'ex_mem_pc', 'ex_mem_rd', 'ex_mem_zero',
+       'mem_wb_data', 'mem_wb_pc', 'mem_wb_rd', 'ctrl',
+       'mem_write', 'mem_write_addr', 'mem_write_data']
+    + [f'perf_{name}' for name in PERF_COUNTERS]
+)
+TRACE_RECORD_WORDS = len(TRACE_RECORD_FIELDS)
+TRACE_RECORD = struct.Struct(f'>{TRACE_RECORD_WORDS}I')
+
+# Word positions within a record
+RECORD_REGISTERS = TRACE_RECORD_FIELDS.index('x0')
+RECORD_CTRL = TRACE_RECORD_FIELDS.index('ctrl')
+RECORD_MEM_WRITE = TRACE_RECORD_FIELDS.index('mem_write')
+RECORD_COUNTERS = TRACE_RECORD_FIELDS.index(f'perf_{PERF_COUNTERS[0]}')
+
+
+def word_array(words=()):
+    """array of unsigned 32-bit words"""
+    typecode = 'I' if array('I').itemsize == 4 else 'L'
+    return array(typecode, words)
+
+
+def _unhex(text):
+    try:
+        return bytes.fromhex(text)
+    except ValueError:
+        # Undriven (x/z) signals print as letters; treat them as zero
+        return bytes.fromhex(re.sub(r'[xXzZ]', '0', text))
+
+
+def decode_packed_trace(text):
+    """Decode packed trace records into a flat array of 32-bit words.
+
+    Record i occupies words[i * TRACE_RECORD_WORDS:(i + 1) * TRACE_RECORD_WORDS].
+    Whitespace (the record separators) is skipped by bytes.fromhex.
+    """
+    raw = _unhex(text)
+    usable = len(raw) - len(raw) % (4 * TRACE_RECORD_WORDS)
+    words = word_array()
+    words.frombytes(raw[:usable])
+    if sys.byteorder == 'little':
+        words.byteswap()
+    return words
+
+
+def decode_packed_line(line):
+    """Word tuple of one packed trace line, or None if the line is not a record"""
+    line = line.strip()
+    if len(line) != 8 * TRACE_RECORD_WORDS:
+        return None
+    return TRACE_RECORD.unpack(_unhex(line))
+
+
+def packed_trace_columns(words):
+    """Split decoded records into one array per TRACE_RECORD_FIELDS entry"""
+    return {name: words[i::TRACE_RECORD_WORDS] for i, name in enumerate(TRACE_RECORD_FIELDS)}
+
+
+def record_writes(record):
+    """((address, value),) for the store a record reports, or ()"""
+    if record[RECORD_MEM_WRITE]:
+        return ((record[RECORD_MEM_WRITE + 1], record[RECORD_MEM_WRITE + 2]),)
+    return ()
+
+
+def packed_record_to_cycle(record):
+    """Build the frontend cycle dict from one record's words"""
+    ctrl = record[51]
+    return {
+        'cycle': record[0],
+        'pc': record[1],
+        'registers': list(record[2:34]),
+        'pipeline': {
+            'if_id': {'pc': record[35], 'instruction': format(record[34], '08x')},
+            'id_ex': {
+                'pc': record[37],
+                'instruction': format(record[36], '08x'),
+                'rs1': record[38],
+                'rs2': record[40],
+                'rd': record[42],
+                'rs1_val': record[39],
+                'rs2_val': record[41],
+                'imm': record[43]
+            },
+            'ex_mem': {
+                'pc': record[45],
+                'alu_result': record[44],
+                'rd': record[46],
+                'zero_flag': record[47]
+            },
+            'mem_wb': {
+                'pc': record[49],
+                'result': record[48],
+                'rd': record[50]
+            }
+        },
+        'memory_writes': {record[53]: record[54]} if record[52] else {},
+        'counters': dict(zip(PERF_COUNTERS, record[55:])),
+        'control_signals': {
+            'regwrite': bool(ctrl & 0x01),
+            'memread': bool(ctrl & 0x02),
+            'memwrite': bool(ctrl & 0x04),
+            'branch': bool(ctrl & 0x08),
+            'alusrc': bool(ctrl & 0x10),
+            'memtoreg': bool(ctrl & 0x20)
+        }
+    }
+
+
+def _word(value, default=0):
+    if value is None:
+        return default
+    if isinstance(value, str):
+        return int(value, 16)
+    return int(value) & MASK32
+
+
+def cycle_to_record(cycle):
+    """Record words for a cycle dict, e.g. one parsed from a text trace.
+
+    Missing fields become zero (a NOP for instructions). Memory writes are
+    not part of the result; a cycle may carry several.
+    """
+    pipeline = cycle.get('pipeline') or {}
+    if_id = pipeline.get('if_id') or {}
+    id_ex = pipeline.get('id_ex') or {}
+    ex_mem = pipeline.get('ex_mem') or {}
+    mem_wb = pipeline.get('mem_wb') or {}
+    registers = [_word(value) for value in (cycle.get('registers') or ())[:32]]
+    registers += [0] * (32 - len(registers))
+    signals = cycle.get('control_signals') or {}
+    counters = cycle.get('counters') or {}
+    return (
+        _word(cycle.get('cycle')), _word(cycle.get('pc')), *registers,
+        _word(if_id.get('instruction'), NOP), _word(if_id.get('pc')),
+        _word(id_ex.get('instruction'), NOP), _word(id_ex.get('pc')),
+        _word(id_ex.get('rs1')), _word(id_ex.get('rs1_val')),
+        _word(id_ex.get('rs2')), _word(id_ex.get('rs2_val')),
+        _word(id_ex.get('rd')), _word(id_ex.get('imm')),
+        _word(ex_mem.get('alu_result')), _word(ex_mem.get('pc')),
+        _word(ex_mem.get('rd')), _word(ex_mem.get('zero_flag')),
+        _word(mem_wb.get('result')), _word(mem_wb.get('pc')), _word(mem_wb.get('rd')),
+        sum(1 << bit for bit, name in enumerate(CONTROL_SIGNAL_NAMES) if signals.get(name)),
+        0, 0, 0,
+        *(_word(counters.get(name)) for name in PERF_COUNTERS)
+    )
+
+
+def iter_packed_cycles(lines):
+    """Decode packed records one line at a time, for streaming"""
+    for line in lines:
+        record = decode_packed_line(line)
+        if record is not None:
+            yield packed_record_to_cycle(record)
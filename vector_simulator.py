@@ -0,0 +1,476 @@
+"""Vectorized RV32I interpreter that runs many independent programs in lockstep.
+
+Meant for fuzzing and regression runs over thousands of small programs.
+Register files, PCs and data memories of N programs are NumPy arrays, and
+each step executes one instruction of every program still running. Programs
+are grouped by operation (each ALU operation, load/store width, branch
+condition, jump and LUI/AUIPC), and each group is one array operation.
+
+Semantics match FunctionalSimulator: no pipeline timing, ECALL/EBREAK and
+illegal instructions halt ('halt'), leaving instruction memory ends the
+program ('end'), and programs still running after max_instructions stop
+with 'limit'. Programs halt independently; finished ones drop out of later
+steps. Each program's data memory is a dense array of memory_words words,
+and addresses wrap at that size like a PagedMemory of the same size.
+
+NumPy is optional for the rest of the simulator and required only here:
+
+    python vector_simulator.py examples/*.hex --max-instructions 10000 --check
+"""
+
+import argparse
+import json
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:  # the vector engine is unavailable without NumPy
+    np = None
+
+from riscv_simulator import (INITIAL_MEMORY, NOP, OPCODE_AUIPC, OPCODE_BRANCH, OPCODE_FENCE, OPCODE_I_TYPE,
+                             OPCODE_JAL, OPCODE_JALR, OPCODE_LOAD, OPCODE_LUI, OPCODE_R_TYPE, OPCODE_STORE,
+                             FunctionalSimulator, PagedMemory, decode_immediate, parse_program)
+
+DEFAULT_MEMORY_WORDS = 1024
+
+# Operation codes: one per ALU operation and form, load/store width and
+# branch condition, so each step handles every operation as one group
+ALU_OPERATIONS = ('add', 'sub', 'sll', 'slt', 'sltu', 'xor', 'srl', 'sra', 'or', 'and')
+_ALU_CODES = {
+    (0, 0x00): 'add', (0, 0x20): 'sub', (1, 0x00): 'sll', (2, 0x00): 'slt',
+    (3, 0x00): 'sltu', (4, 0x00): 'xor', (5, 0x00): 'srl', (5, 0x20): 'sra',
+    (6, 0x00): 'or', (7, 0x00): 'and',
+}
+OPERATIONS = (
+    [f'{name}' for name in ALU_OPERATIONS]
+    + [f'{name}i' for name in ALU_OPERATIONS]
+    + ['lb', 'lh', 'lw', 'lbu', 'lhu', 'sb', 'sh', 'sw',
+       'beq', 'bne', 'blt', 'bge', 'bltu', 'bgeu',
+       'lui', 'auipc', 'jal', 'jalr', 'fence', 'halt']
+)
+OP = {name: code for code, name in enumerate(OPERATIONS)}
+_LOADS = {0: 'lb', 1: 'lh', 2: 'lw', 4: 'lbu', 5: 'lhu'}
+_STORES = {0: 'sb', 1: 'sh', 2: 'sw'}
+_BRANCHES = {0: 'beq', 1: 'bne', 4: 'blt', 5: 'bge', 6: 'bltu', 7: 'bgeu'}
+
+# Register column that absorbs writes to x0 and from instructions without rd
+SINK = 32
+
+# Per-program states; everything but RUNNING is a stop reason
+RUNNING = 0
+STOP_REASONS = {1: 'halt', 2: 'end', 3: 'limit'}
+_HALT, _END, _LIMIT = 1, 2, 3
+
+
+def decode_fields(word):
+    """(operation, destination, rs1, rs2, imm) for one instruction word.
+
+    destination is SINK when the instruction writes no register or writes x0.
+    """
+    opcode = word & 0x7F
+    rd = (word >> 7) & 0x1F
+    funct3 = (word >> 12) & 0x7
+    rs1 = (word >> 15) & 0x1F
+    rs2 = (word >> 20) & 0x1F
+    funct7 = (word >> 25) & 0x7F
+    dest = rd or SINK
+    imm_i = decode_immediate(word, OPCODE_I_TYPE)
+    halt = (OP['halt'], SINK, 0, 0, 0)
+
+    if opcode == OPCODE_I_TYPE:
+        if funct3 == 1 or funct3 == 5:
+            # Shifts take shamt from the immediate and funct7 from its top bits
+            name = _ALU_CODES.get((funct3, funct7))
+            imm = rs2
+        else:
+            name = _ALU_CODES[(funct3, 0x00)]
+            imm = imm_i
+        if name is None:
+            return halt
+        return OP[name + 'i'], dest, rs1, 0, imm
+    if opcode == OPCODE_R_TYPE:
+        name = _ALU_CODES.get((funct3, funct7))
+        if name is None:
+            return halt
+        return OP[name], dest, rs1, rs2, 0
+    if opcode == OPCODE_LOAD:
+        if funct3 not in _LOADS:
+            return halt
+        return OP[_LOADS[funct3]], dest, rs1, 0, imm_i
+    if opcode == OPCODE_STORE:
+        if funct3 not in _STORES:
+            return halt
+        return OP[_STORES[funct3]], SINK, rs1, rs2, decode_immediate(word, OPCODE_STORE)
+    if opcode == OPCODE_BRANCH:
+        if funct3 not in _BRANCHES:
+            return halt
+        return OP[_BRANCHES[funct3]], SINK, rs1, rs2, decode_immediate(word, OPCODE_BRANCH)
+    if opcode == OPCODE_LUI:
+        return OP['lui'], dest, 0, 0, word & 0xFFFFF000
+    if opcode == OPCODE_AUIPC:
+        return OP['auipc'], dest, 0, 0, word & 0xFFFFF000
+    if opcode == OPCODE_JAL:
+        offset = (((word >> 31) << 20) | (((word >> 12) & 0xFF) << 12)
+                  | (((word >> 20) & 0x1) << 11) | (((word >> 21) & 0x3FF) << 1))
+        if offset & 0x100000:
+            offset |= 0xFFE00000
+        return OP['jal'], dest, 0, 0, offset
+    if opcode == OPCODE_JALR:
+        return OP['jalr'], dest, rs1, 0, imm_i
+    if opcode == OPCODE_FENCE:
+        return OP['fence'], SINK, 0, 0, 0
+    # ECALL, EBREAK and anything unrecognised stop the program
+    return halt
+
+
+class VectorSimulator:
+    """N RV32I programs executed in lockstep on NumPy arrays"""
+
+    def __init__(self, programs, memory_words=DEFAULT_MEMORY_WORDS, initial_memory=INITIAL_MEMORY):
+        """programs is a list of instruction word lists, e.g. from parse_program"""
+        if np is None:
+            raise RuntimeError("The vector engine requires NumPy (pip install numpy)")
+        count = len(programs)
+        self.count = count
+        self.memory_words = memory_words
+
+        # Instruction memories are concatenated; program i starts at offsets[i].
+        # Every word after a program's last non-NOP is a NOP, so only one of
+        # them is kept (at lasts[i]) and the word index is clamped to it.
+        # Identical programs share one copy. Both keep the decode tables
+        # small enough to stay in cache.
+        self.lengths = np.array([len(words) for words in programs], dtype=np.int64)
+        images = {}
+        offsets = []
+        lasts = []
+
+        # Decode each distinct word once. Register fields are stored as
+        # indices into the column-major register file (register * count)
+        decoded = {NOP: 0}
+        slots = []
+        for words in programs:
+            used = len(words)
+            while used and words[used - 1] == NOP:
+                used -= 1
+            image = tuple(words[:used])
+            if image not in images:
+                images[image] = len(slots)
+                for word in image + (NOP,):
+                    if word not in decoded:
+                        decoded[word] = len(decoded)
+                    slots.append(decoded[word])
+            offsets.append(images[image])
+            lasts.append(used)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.lasts = np.array(lasts, dtype=np.int64)
+        operations, destinations, rs1, rs2, imm = zip(*map(decode_fields, decoded))
+        slots = np.array(slots, dtype=np.int64)
+        self.operations = np.array(operations, dtype=np.uint8)[slots]
+        self.destinations = np.array(destinations, dtype=np.int64)[slots] * count
+        self.rs1 = np.array(rs1, dtype=np.int64)[slots] * count
+        self.rs2 = np.array(rs2, dtype=np.int64)[slots] * count
+        self.imm = np.array(imm, dtype=np.uint32)[slots]
+
+        # Column-major: one register or memory word of every program is
+        # contiguous, so programs in step touch neighbouring words
+        self._registers = np.zeros((SINK + 1, count), dtype=np.uint32)
+        self._memory = np.zeros((memory_words, count), dtype=np.uint32)
+        for index, value in initial_memory.items():
+            self._memory[index % memory_words] = value
+        self.pc = np.zeros(count, dtype=np.uint32)
+        self.status = np.zeros(count, dtype=np.int8)
+        self.steps = 0
+        # Instructions of stopped programs; running ones have executed one per step
+        self._instructions = np.zeros(count, dtype=np.int64)
+        # Only branches and jumps can leave the PC misaligned
+        self._jumped = False
+        self._refresh()
+
+    @classmethod
+    def from_hex(cls, hex_programs, **kwargs):
+        """Build from hex program texts, padded with NOPs like the other engines"""
+        return cls([parse_program(text) for text in hex_programs], **kwargs)
+
+    @property
+    def registers(self):
+        """(N, 32) register files"""
+        return self._registers[:SINK].T
+
+    @property
+    def memory(self):
+        """(N, memory_words) data memories"""
+        return self._memory.T
+
+    @property
+    def instructions(self):
+        """Instructions each program has executed"""
+        return np.where(self.status == RUNNING, self.steps, self._instructions)
+
+    @property
+    def running(self):
+        return int(np.count_nonzero(self.status == RUNNING))
+
+    def _refresh(self):
+        """Cache the rows still running and their per-row constants"""
+        active = np.flatnonzero(self.status == RUNNING)
+        if active.size == self.count:
+            # Everyone is running: a slice indexes without copying
+            rows = slice(None)
+            active = np.arange(self.count)
+        else:
+            rows = active
+        self._rows = rows if active.size else None
+        self._active = active
+        self._offsets = self.offsets[rows]
+        self._lasts = self.lasts[rows]
+        self._limits = (self.lengths[rows] * 4).astype(np.uint32)
+
+    def _stop(self, positions, reason):
+        """Stop the running rows at the given positions within the active set"""
+        rows = self._active[positions]
+        self.status[rows] = reason
+        self._instructions[rows] = self.steps
+        self._refresh()
+
+    def run(self, max_instructions=None):
+        """Step until every program has stopped or max_instructions steps have run.
+
+        Programs still running at the limit stop with 'limit'. Returns the
+        total number of instructions executed across all programs.
+        """
+        executed = 0
+        while max_instructions is None or self.steps < max_instructions:
+            if self._rows is None:
+                break
+            executed += self.step()
+        if self._rows is not None:
+            self._stop(slice(None), _LIMIT)
+        return executed
+
+    def step(self):
+        """Execute one instruction of every running program; returns how many ran"""
+        if self._rows is None:
+            return 0
+        pc = self.pc[self._rows]
+        outside = pc >= self._limits
+        if self._jumped:
+            outside |= (pc & 3) != 0
+            self._jumped = False
+        if outside.any():
+            self._stop(np.flatnonzero(outside), _END)
+            if self._rows is None:
+                return 0
+            pc = self.pc[self._rows]
+
+        slot = self._offsets + np.minimum(pc >> 2, self._lasts)
+        op = self.operations.take(slot)
+        rows = self._rows
+        active = self._active
+        positions = None
+
+        # Group rows by operation. Permuting the operands once makes each
+        # group a contiguous slice; a stable sort of uint8 codes is a radix sort
+        counts = np.bincount(op, minlength=len(OPERATIONS))
+        present = np.flatnonzero(counts)
+        if present.size > 1:
+            positions = np.argsort(op, kind='stable')
+            slot, pc = slot.take(positions), pc.take(positions)
+            rows = active = active.take(positions)
+        ends = np.cumsum(counts)
+
+        # Word (register, row) of the column-major register file is at
+        # register * count + row, and the decode tables hold register * count
+        imm = self.imm.take(slot)
+        registers = self._registers.reshape(-1)
+        a = registers.take(self.rs1.take(slot) + active)
+        b = registers.take(self.rs2.take(slot) + active)
+        destination = self.destinations.take(slot) + active
+        memory = self._memory.reshape(-1)
+        count = self.count
+        # Instructions that write no register write the sink, so any value will do
+        result = np.empty(pc.size, dtype=np.uint32)
+        next_pc = pc + np.uint32(4)
+
+        halted = None
+        for code in present:
+            group = slice(ends[code] - counts[code], ends[code])
+            name = OPERATIONS[code]
+            if name == 'halt':
+                halted = group
+                next_pc[group] = pc[group]
+            elif code < len(ALU_OPERATIONS):
+                result[group] = _ALU[name](a[group], b[group])
+            elif code < 2 * len(ALU_OPERATIONS):
+                result[group] = _ALU[name[:-1]](a[group], imm[group])
+            elif name in _LOAD_WIDTHS:
+                address = a[group] + imm[group]
+                index = ((address >> 2) % self.memory_words).astype(np.int64) * count + active[group]
+                word = memory.take(index) >> ((address & 3) * 8)
+                result[group] = _LOAD_WIDTHS[name](word)
+            elif name in _STORE_MASKS:
+                address = a[group] + imm[group]
+                index = ((address >> 2) % self.memory_words).astype(np.int64) * count + active[group]
+                mask = np.uint32(_STORE_MASKS[name])
+                shift = (address & 3) * 8
+                memory.put(index, (memory.take(index) & ~(mask << shift)) | ((b[group] & mask) << shift))
+            elif name in _BRANCH_CONDITIONS:
+                taken = _BRANCH_CONDITIONS[name](a[group], b[group])
+                next_pc[group] = np.where(taken, pc[group] + imm[group], next_pc[group])
+                self._jumped = True
+            elif name == 'lui':
+                result[group] = imm[group]
+            elif name == 'auipc':
+                result[group] = pc[group] + imm[group]
+            elif name == 'jal':
+                result[group] = next_pc[group]
+                next_pc[group] = pc[group] + imm[group]
+                self._jumped = True
+            elif name == 'jalr':
+                result[group] = next_pc[group]
+                next_pc[group] = (a[group] + imm[group]) & np.uint32(0xFFFFFFFE)
+                self._jumped = True
+
+        # Every operand has been read, so results can land; x0 and
+        # instructions without rd write the sink column
+        registers.put(destination, result)
+        self.pc[rows] = next_pc
+        self.steps += 1
+        executed = pc.size
+        if halted is not None:
+            # The halting instruction is not executed and the PC stays on it
+            stopped = np.arange(pc.size)[halted] if positions is None else positions[halted]
+            stopped_rows = self._active[stopped]
+            executed -= stopped.size
+            self._stop(stopped, _HALT)
+            self._instructions[stopped_rows] -= 1
+        return executed
+
+    def result(self, index):
+        """Final state of one program, in the shape of a batch summary"""
+        memory = self.memory[index]
+        nonzero = np.flatnonzero(memory)
+        return {
+            'pc': int(self.pc[index]),
+            'registers': self.registers[index].tolist(),
+            'memory': {int(address): int(memory[address]) for address in nonzero},
+            'instructions': int(self.instructions[index]),
+            'stop_reason': STOP_REASONS.get(int(self.status[index]), 'running')
+        }
+
+    def results(self):
+        return [self.result(index) for index in range(self.count)]
+
+
+def _shift(b):
+    return b & np.uint32(0x1F)
+
+def _signed(values):
+    return values.view(np.int32)
+
+def _sign_extend(values, dtype):
+    return values.astype(dtype).astype(np.int32).view(np.uint32)
+
+
+_ALU = {
+    'add': lambda a, b: a + b,
+    'sub': lambda a, b: a - b,
+    'sll': lambda a, b: a << _shift(b),
+    'slt': lambda a, b: (_signed(a) < _signed(b)).astype(np.uint32),
+    'sltu': lambda a, b: (a < b).astype(np.uint32),
+    'xor': lambda a, b: a ^ b,
+    'srl': lambda a, b: a >> _shift(b),
+    'sra': lambda a, b: (_signed(a) >> _shift(b).astype(np.int32)).view(np.uint32),
+    'or': lambda a, b: a | b,
+    'and': lambda a, b: a & b,
+}
+
+# Loaded word shifted right by 8 * byte offset, then masked/sign-extended
+_LOAD_WIDTHS = {
+    'lb': lambda word: _sign_extend(word, np.int8),
+    'lh': lambda word: _sign_extend(word, np.int16),
+    'lw': lambda word: word,
+    'lbu': lambda word: word & np.uint32(0xFF),
+    'lhu': lambda word: word & np.uint32(0xFFFF),
+}
+_STORE_MASKS = {'sb': 0xFF, 'sh': 0xFFFF, 'sw': 0xFFFFFFFF}
+
+_BRANCH_CONDITIONS = {
+    'beq': lambda a, b: a == b,
+    'bne': lambda a, b: a != b,
+    'blt': lambda a, b: _signed(a) < _signed(b),
+    'bge': lambda a, b: _signed(a) >= _signed(b),
+    'bltu': lambda a, b: a < b,
+    'bgeu': lambda a, b: a >= b,
+}
+
+
+def run_programs(hex_programs, max_instructions=None, memory_words=DEFAULT_MEMORY_WORDS):
+    """Run hex programs to completion together, returning each one's final state"""
+    simulator = VectorSimulator.from_hex(hex_programs, memory_words=memory_words)
+    simulator.run(max_instructions)
+    return simulator.results()
+
+
+def scalar_result(hex_program, max_instructions=None, memory_words=DEFAULT_MEMORY_WORDS):
+    """The same program on FunctionalSimulator, for checking the vector engine"""
+    memory = PagedMemory(memory_words)
+    for index, value in INITIAL_MEMORY.items():
+        memory[index % memory_words] = value
+    functional = FunctionalSimulator(parse_program(hex_program), [0] * 32, memory)
+    reason = functional.run(max_instructions)
+    return {
+        'pc': functional.pc,
+        'registers': functional.registers,
+        'memory': dict(memory.nonzero()),
+        'instructions': functional.instructions,
+        'stop_reason': reason
+    }
+
+
+def main(argv=None):
+    # Imported here so the engine itself does not depend on the web app
+    from app import process_instructions
+
+    parser = argparse.ArgumentParser(description="Run many RV32I programs in lockstep with NumPy")
+    parser.add_argument('files', nargs='+', help="program files (hex or assembly)")
+    parser.add_argument('--max-instructions', type=int, default=100000, help="instructions per program")
+    parser.add_argument('--memory-words', type=int, default=DEFAULT_MEMORY_WORDS,
+                        help="data memory words per program")
+    parser.add_argument('--check', action='store_true', help="compare every result with FunctionalSimulator")
+    parser.add_argument('--json', action='store_true', help="print NDJSON records instead of a table")
+    args = parser.parse_args(argv)
+
+    names, programs = [], []
+    for path in args.files:
+        with open(path) as f:
+            names.append(path)
+            programs.append(process_instructions(f.read()))
+
+    started = time.perf_counter()
+    simulator = VectorSimulator.from_hex(programs, memory_words=args.memory_words)
+    executed = simulator.run(args.max_instructions)
+    seconds = time.perf_counter() - started
+
+    mismatches = 0
+    for index, name in enumerate(names):
+        result = dict(simulator.result(index), name=name)
+        if args.check:
+            result['matches_scalar'] = (scalar_result(programs[index], args.max_instructions, args.memory_words)
+                                        == simulator.result(index))
+            mismatches += not result['matches_scalar']
+        if args.json:
+            print(json.dumps(result), flush=True)
+        else:
+            check = '' if not args.check else (' [ok]' if result['matches_scalar'] else ' [MISMATCH]')
+            print(f"{name}: {result['instructions']} instructions, stopped on {result['stop_reason']} "
+                  f"at PC 0x{result['pc']:08x}{check}", flush=True)
+    if not args.json:
+        rate = executed / seconds if seconds else 0
+        print(f"\n{len(names)} programs, {executed} instructions in {seconds:.3f}s "
+              f"({rate:,.0f} instructions/s)")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())